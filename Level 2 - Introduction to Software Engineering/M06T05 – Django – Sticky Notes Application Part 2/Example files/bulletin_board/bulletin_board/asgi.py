@@ -3,6 +3,12 @@ ASGI config for bulletin_board project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the site through this entry point (for example with
+``uvicorn bulletin_board.asgi:application``) to use the live post_events
+stream: each open stream then costs a coroutine instead of a worker thread.
+Set POSTS_LIVE_UPDATES = True in the settings as well, so the post list
+loads live.js and connects to the stream.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
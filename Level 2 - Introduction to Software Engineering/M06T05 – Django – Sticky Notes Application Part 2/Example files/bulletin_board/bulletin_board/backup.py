@@ -0,0 +1,290 @@
+# bulletin_board/backup.py
+"""
+Online backup and restore of the SQLite database.
+
+Copying db.sqlite3 with cp while the site is running can catch a write
+half way and produce a torn file, and in WAL mode the newest commits are
+not even in the main file yet. SQLite's backup API copies a consistent
+snapshot instead, a batch of pages at a time: between batches other
+connections keep reading and writing, and if another connection writes
+to the database the copy starts over from a fresh snapshot.
+
+Backups are checked with PRAGMA integrity_check before they are kept,
+can be compressed with any of the standard library's gzip, bz2 or lzma,
+and get a ``.sha256`` file (in sha256sum format) so a damaged copy is
+caught before it is restored. The backup_db and restore_db management
+commands wrap these functions.
+"""
+import bz2
+import gzip
+import hashlib
+import lzma
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib import closing
+
+# Compression name to (opener, file extension)
+COMPRESSIONS = {
+    "none": (open, ""),
+    "gzip": (gzip.open, ".gz"),
+    "bz2": (bz2.open, ".bz2"),
+    "xz": (lzma.open, ".xz"),
+}
+
+# Leading bytes that identify each kind of backup file
+_SIGNATURES = {
+    "gzip": b"\x1f\x8b",
+    "bz2": b"BZh",
+    "xz": b"\xfd7zXZ\x00",
+    "none": b"SQLite format 3\x00",
+}
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+class BackupError(Exception):
+    """
+    A backup could not be made or a backup file is unusable.
+    """
+
+
+def format_size(size):
+    """
+    Format a byte count for people.
+
+    :param size: Number of bytes.
+    :return: String such as "4.2 MB".
+    """
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def connect(name):
+    """
+    Open a plain sqlite3 connection to a database file.
+
+    :param name: File path, or a "file:" URI such as Django's in-memory test database.
+    :return: sqlite3.Connection.
+    """
+    return sqlite3.connect(name, uri=str(name).startswith("file:"))
+
+
+def copy_database(source, target, pages=256, pause=0.0):
+    """
+    Copy one SQLite database into another with the online backup API.
+
+    :param source: Name of the database to copy (see connect).
+    :param target: Name of the database to overwrite.
+    :param pages: Pages copied per step; -1 copies everything in one step.
+    :param pause: Seconds to wait between steps so other connections can write.
+    :return: Dictionary with "pages" (size of the source), "steps" and
+        "restarts" (times the copy started over because the source changed).
+    """
+    result = {"pages": 0, "steps": 0, "restarts": 0}
+    remaining_before = None
+
+    def progress(status, remaining, total):
+        nonlocal remaining_before
+        result["pages"] = total
+        result["steps"] += 1
+        if remaining_before is not None and remaining > remaining_before:
+            result["restarts"] += 1
+        remaining_before = remaining
+        if pause and remaining:
+            time.sleep(pause)
+
+    with closing(connect(source)) as src, closing(connect(target)) as dst:
+        src.backup(dst, pages=pages, progress=progress)
+    return result
+
+
+def integrity_problems(name, quick=False):
+    """
+    Run SQLite's integrity check on a database.
+
+    :param name: Name of the database (see connect).
+    :param quick: Use quick_check, which skips checking that indexes match their tables.
+    :return: List of problems reported; empty if the database is sound.
+    """
+    pragma = "quick_check" if quick else "integrity_check"
+    try:
+        with closing(connect(name)) as conn:
+            rows = [row[0] for row in conn.execute(f"PRAGMA {pragma}")]
+    except sqlite3.DatabaseError as exc:
+        return [str(exc)]
+    return [] if rows == ["ok"] else rows
+
+
+def file_sha256(path):
+    """
+    SHA-256 of a file, read in chunks.
+
+    :param path: File path.
+    :return: Hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def checksum_path(path):
+    """
+    Path of the checksum file written next to a backup.
+
+    :param path: Backup file path.
+    :return: The path with ".sha256" added.
+    """
+    return f"{path}.sha256"
+
+
+def detect_compression(path):
+    """
+    Work out how a backup file was compressed from its first bytes.
+
+    :param path: Backup file path.
+    :return: Key of COMPRESSIONS.
+    :raises BackupError: If the file is neither a database nor a known archive.
+    """
+    with open(path, "rb") as f:
+        head = f.read(16)
+    for name, signature in _SIGNATURES.items():
+        if head.startswith(signature):
+            return name
+    raise BackupError(f"{path} is not a SQLite database or a gzip, bz2 or xz file.")
+
+
+def backup_database(source, output, compression="none", pages=256, pause=0.0, check=True):
+    """
+    Write a checked, optionally compressed backup of a live database.
+
+    The copy is made and checked in a temporary file next to the output
+    and only moved into place once it is complete, so a failed or
+    interrupted backup never leaves a partial file under the output name.
+
+    :param source: Name of the database to back up (see connect).
+    :param output: Path of the backup file to write.
+    :param compression: Key of COMPRESSIONS.
+    :param pages: Pages copied per step.
+    :param pause: Seconds to wait between steps.
+    :param check: Run PRAGMA integrity_check on the copy before keeping it.
+    :return: Dictionary with the copy_database counts plus "database_bytes",
+        "backup_bytes", "sha256", and the seconds taken by each stage in
+        "copy_seconds", "check_seconds" and "compress_seconds".
+    :raises BackupError: If the copy fails its integrity check.
+    """
+    opener, extension = COMPRESSIONS[compression]
+    directory = os.path.dirname(os.path.abspath(output))
+    os.makedirs(directory, exist_ok=True)
+    fd, copy_path = tempfile.mkstemp(suffix=".sqlite3", dir=directory)
+    os.close(fd)
+    packed_path = f"{copy_path}{extension}"
+    try:
+        start = time.perf_counter()
+        result = copy_database(source, copy_path, pages=pages, pause=pause)
+        with closing(connect(copy_path)) as conn:
+            # A single-file copy is easier to move around than a WAL database
+            conn.execute("PRAGMA journal_mode = DELETE")
+        result["copy_seconds"] = time.perf_counter() - start
+        result["database_bytes"] = os.path.getsize(copy_path)
+
+        start = time.perf_counter()
+        if check:
+            problems = integrity_problems(copy_path)
+            if problems:
+                raise BackupError("The backup failed its integrity check: " + "; ".join(problems[:5]))
+        result["check_seconds"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if compression == "none":
+            os.replace(copy_path, output)
+        else:
+            with open(copy_path, "rb") as src, opener(packed_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, _CHUNK_SIZE)
+            os.replace(packed_path, output)
+        result["compress_seconds"] = time.perf_counter() - start
+    finally:
+        for path in (copy_path, packed_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    # Backups hold all of the site's data, so only the owner may read them
+    os.chmod(output, 0o600)
+    result["backup_bytes"] = os.path.getsize(output)
+    result["sha256"] = file_sha256(output)
+    with open(checksum_path(output), "w") as f:
+        f.write(f"{result['sha256']}  {os.path.basename(output)}\n")
+    return result
+
+
+def unpack_backup(backup, directory):
+    """
+    Verify a backup file and unpack it into a temporary database.
+
+    :param backup: Path of the backup file.
+    :param directory: Directory for the temporary database.
+    :return: Path of the unpacked database; the caller removes it.
+    :raises BackupError: If the checksum doesn't match, the file can't be
+        read, or the database fails its integrity check.
+    """
+    if os.path.exists(checksum_path(backup)):
+        with open(checksum_path(backup)) as f:
+            expected = f.read().split()[0]
+        if file_sha256(backup) != expected:
+            raise BackupError(f"{backup} does not match its checksum in {checksum_path(backup)}.")
+
+    opener, _ = COMPRESSIONS[detect_compression(backup)]
+    fd, path = tempfile.mkstemp(suffix=".sqlite3", dir=directory)
+    os.close(fd)
+    try:
+        with opener(backup, "rb") as src, open(path, "wb") as dst:
+            shutil.copyfileobj(src, dst, _CHUNK_SIZE)
+        problems = integrity_problems(path)
+    except (OSError, EOFError, lzma.LZMAError) as exc:
+        os.remove(path)
+        raise BackupError(f"Could not read {backup}: {exc}")
+    if problems:
+        os.remove(path)
+        raise BackupError(f"{backup} failed its integrity check: " + "; ".join(problems[:5]))
+    return path
+
+
+def restore_database(backup, target, pages=256, pause=0.0):
+    """
+    Replace a database's contents with a backup.
+
+    The backup is verified and unpacked before the target is touched, then
+    copied in with the backup API, so connections that stay open see the
+    restored data rather than a file swapped out from under them.
+
+    :param backup: Path of the backup file.
+    :param target: Name of the database to overwrite (see connect).
+    :param pages: Pages copied per step.
+    :param pause: Seconds to wait between steps.
+    :return: Dictionary with the copy_database counts plus "backup_bytes",
+        "database_bytes", "unpack_seconds" and "copy_seconds".
+    :raises BackupError: If the backup is unusable.
+    """
+    directory = os.path.dirname(os.path.abspath(target)) if not str(target).startswith("file:") else None
+    start = time.perf_counter()
+    path = unpack_backup(backup, directory)
+    unpack_seconds = time.perf_counter() - start
+    try:
+        database_bytes = os.path.getsize(path)
+        start = time.perf_counter()
+        result = copy_database(path, target, pages=pages, pause=pause)
+        result["copy_seconds"] = time.perf_counter() - start
+    finally:
+        os.remove(path)
+    result.update(
+        backup_bytes=os.path.getsize(backup),
+        database_bytes=database_bytes,
+        unpack_seconds=unpack_seconds,
+    )
+    return result
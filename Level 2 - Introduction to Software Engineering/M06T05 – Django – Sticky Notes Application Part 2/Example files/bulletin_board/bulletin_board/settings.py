@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .sqlite import sqlite_options
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -76,13 +79,26 @@ WSGI_APPLICATION = 'bulletin_board.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# SQLite pragmas applied to every connection (see bulletin_board/sqlite.py).
+# Override single pragmas here, e.g. {"mmap_size": 0}; None drops a pragma.
+SQLITE_PRAGMAS = {}
+
+# Set BULLETIN_BOARD_SQLITE_TUNING=off to use SQLite's defaults instead.
+# Note that WAL mode is stored in the database file and stays on until
+# "PRAGMA journal_mode = DELETE" is run.
+SQLITE_TUNING = os.environ.get("BULLETIN_BOARD_SQLITE_TUNING", "on") != "off"
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': sqlite_options(SQLITE_PRAGMAS) if SQLITE_TUNING else {},
     }
 }
 
+# Where `manage.py backup_db` writes backups when no path is given
+BACKUP_DIR = BASE_DIR / "backups"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -121,15 +137,56 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = 'static/'
 
-# Add static files directories
-STATICFILES_DIRS = [
-    BASE_DIR / "posts/static",
-    # Add other app static directories if needed
-]
+# App static folders (such as posts/static) are found automatically by the
+# app directories finder. Add extra, non-app directories here if needed.
+STATICFILES_DIRS = []
 
-# Define the root directory for static files
+# Define the root directory for static files (built by `manage.py build_static`)
 STATIC_ROOT = BASE_DIR / "static"
 
+# Collected files get content-hashed names plus .gz/.br siblings, and are served
+# with far-future cache headers by bulletin_board.staticfiles.StaticFilesMiddleware
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "bulletin_board.staticfiles.CompressedManifestStaticFilesStorage",
+    },
+}
+
+# Caches: rendered post_detail pages live in their own cache. It is kept on disk
+# so that every worker process, and management commands such as import_posts and
+# purge_deleted_posts, see the same pages and the same invalidations; a per-process
+# cache would keep serving a page another process had changed for the full TIMEOUT.
+# Point it at Redis or Memcached instead when the workers run on several machines.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "post_detail": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache" / "post_detail",
+        "TIMEOUT": 60 * 60,
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+}
+
+# Cache alias used for rendered post_detail pages (None turns the cache off)
+POSTS_DETAIL_CACHE = "post_detail"
+
+# Load live.js on the post list so it follows the post_events stream. Only turn
+# this on when serving through bulletin_board/asgi.py: under WSGI (runserver,
+# wsgi.py) post_events refuses the stream with 204 No Content.
+POSTS_LIVE_UPDATES = False
+
+# Cache alias used for tag facet counts on filtered pages (None turns the cache off)
+POSTS_TAG_CACHE = "default"
+
+# Read author post counts from the Author.post_count/last_posted_at columns
+# (kept up to date by posts/signals.py) instead of counting posts on every request
+POSTS_DENORMALIZED_AUTHOR_COUNTS = False
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
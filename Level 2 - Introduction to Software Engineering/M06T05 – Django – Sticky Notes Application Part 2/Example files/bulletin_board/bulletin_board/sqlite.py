@@ -0,0 +1,68 @@
+# bulletin_board/sqlite.py
+"""
+SQLite tuning applied to every new database connection.
+
+By default SQLite uses a rollback journal: a writer locks the whole file
+while it commits, so requests reading posts wait behind post_create and
+post_update. In write-ahead-log (WAL) mode readers keep reading the last
+committed data while a write is in progress, and with synchronous=NORMAL a
+commit no longer waits for an fsync of the database file.
+
+``sqlite_options()`` turns a set of pragmas into the OPTIONS for a
+``django.db.backends.sqlite3`` database: the pragmas run through
+``init_command`` when a connection opens, and write transactions start
+with BEGIN IMMEDIATE so two requests upgrading a read lock to a write lock
+cannot fail each other with "database is locked".
+"""
+import re
+
+# Pragmas used unless overridden. Negative cache_size is in KiB.
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -20000,
+    "mmap_size": 128 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
+# Pragma names and values end up in SQL, so only plain words and numbers are allowed
+_PRAGMA_NAME_RE = re.compile(r"^[a-z_]+$")
+_PRAGMA_VALUE_RE = re.compile(r"^-?\w+$")
+
+
+def pragma_statements(pragmas):
+    """
+    Build the PRAGMA statements for a set of pragmas.
+
+    :param pragmas: Dictionary of pragma name to value. A value of None
+        leaves that pragma at SQLite's default.
+    :return: List of "PRAGMA name = value" strings.
+    :raises ValueError: If a name or value is not a plain word or number.
+    """
+    statements = []
+    for name, value in pragmas.items():
+        if value is None:
+            continue
+        if not _PRAGMA_NAME_RE.match(name) or not _PRAGMA_VALUE_RE.match(str(value)):
+            raise ValueError(f"Invalid SQLite pragma: {name} = {value!r}")
+        statements.append(f"PRAGMA {name} = {value}")
+    return statements
+
+
+def sqlite_options(overrides=None):
+    """
+    OPTIONS for a Django SQLite database using the tuned pragmas.
+
+    :param overrides: Dictionary of pragmas to change or (with None) drop.
+    :return: Dictionary for DATABASES[...]["OPTIONS"].
+    """
+    pragmas = {**DEFAULT_PRAGMAS, **(overrides or {})}
+    options = {
+        "init_command": ";".join(pragma_statements(pragmas)),
+        "transaction_mode": "IMMEDIATE",
+    }
+    if pragmas.get("busy_timeout") is not None:
+        # sqlite3's own timeout would otherwise reset the busy timeout to 5 s
+        options["timeout"] = int(pragmas["busy_timeout"]) / 1000
+    return options
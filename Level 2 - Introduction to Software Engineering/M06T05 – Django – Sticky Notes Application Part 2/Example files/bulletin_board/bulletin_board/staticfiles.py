@@ -0,0 +1,231 @@
+# bulletin_board/staticfiles.py
+"""
+Static asset pipeline for production.
+
+``collectstatic`` copies every asset into STATIC_ROOT under a content-hashed
+name (``styles.3f2a9c1b7e4d.css``) and writes ``.gz`` and, when the optional
+``brotli`` package is installed, ``.br`` siblings next to it.
+``StaticFilesMiddleware`` then serves those files straight from the WSGI
+entry point, picking the smallest encoding the client accepts and marking
+hashed files as cacheable forever. Other files carry ``ETag`` and
+``Last-Modified`` headers so browsers can revalidate them with a 304.
+"""
+import gzip
+import mimetypes
+import os
+import re
+from pathlib import Path
+from wsgiref.util import FileWrapper
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.utils.http import http_date, parse_http_date_safe
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+
+# Only text formats shrink enough to be worth compressing
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".map", ".svg", ".txt", ".html", ".json", ".xml"}
+
+# Files smaller than this are sent as they are
+MIN_COMPRESS_SIZE = 256
+
+# ManifestStaticFilesStorage inserts a 12 character hash before the extension
+HASHED_NAME_RE = re.compile(r"\.[0-9a-f]{12}\.")
+
+# One year, the longest lifetime browsers reliably honour
+FAR_FUTURE_MAX_AGE = 60 * 60 * 24 * 365
+
+# Bytes read from a file at a time when the server has no wsgi.file_wrapper
+BLOCK_SIZE = 64 * 1024
+
+
+def compress_file(path):
+    """
+    Write precompressed siblings for a single file.
+
+    Each sibling is only kept if it is actually smaller than the original.
+
+    :param path: Path of the file to compress.
+    :return: Dictionary mapping encoding ("gzip", "br") to compressed size.
+    """
+    path = Path(path)
+    if path.suffix not in COMPRESSIBLE_EXTENSIONS:
+        return {}
+    data = path.read_bytes()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return {}
+
+    candidates = {"gzip": (".gz", gzip.compress(data, compresslevel=9, mtime=0))}
+    if brotli is not None:
+        candidates["br"] = (".br", brotli.compress(data))
+
+    sizes = {}
+    for encoding, (suffix, compressed) in candidates.items():
+        if len(compressed) < len(data):
+            Path(f"{path}{suffix}").write_bytes(compressed)
+            sizes[encoding] = len(compressed)
+    return sizes
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest storage that also precompresses the hashed files.
+
+    ``manifest_strict`` is off, so a file missing from the manifest (for
+    example one added since the last ``collectstatic``) is hashed on the
+    fly instead of raising.
+    """
+
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for hashed_name in set(self.hashed_files.values()):
+            compress_file(self.path(hashed_name))
+
+
+class StaticFilesMiddleware:
+    """
+    WSGI middleware that serves files from STATIC_ROOT.
+
+    Requests outside STATIC_URL, and files that do not exist, are passed on
+    to the wrapped Django application.
+
+    :param application: The WSGI application to wrap.
+    :param root: Directory to serve from (defaults to STATIC_ROOT).
+    :param prefix: URL prefix to serve under (defaults to STATIC_URL).
+    """
+
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        self.root = Path(root or settings.STATIC_ROOT).resolve()
+        prefix = prefix or settings.STATIC_URL
+        self.prefix = "/" + prefix.strip("/") + "/"
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if not path.startswith(self.prefix) or environ["REQUEST_METHOD"] not in ("GET", "HEAD"):
+            return self.application(environ, start_response)
+
+        file_path = self.find_file(path[len(self.prefix):])
+        if file_path is None:
+            return self.application(environ, start_response)
+
+        served_path, encoding = self.choose_encoding(file_path, environ.get("HTTP_ACCEPT_ENCODING", ""))
+        stat = served_path.stat()
+        # The served file's own size and time, so each encoding gets its own ETag
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        validators = [
+            ("Cache-Control", self.cache_control(file_path.name)),
+            ("Vary", "Accept-Encoding"),
+            ("ETag", etag),
+            ("Last-Modified", http_date(stat.st_mtime)),
+        ]
+        if self.not_modified(environ, etag, stat.st_mtime):
+            start_response("304 Not Modified", validators)
+            return []
+
+        content_type, _ = mimetypes.guess_type(file_path.name)
+        headers = [
+            ("Content-Type", content_type or "application/octet-stream"),
+            ("Content-Length", str(stat.st_size)),
+        ] + validators
+        if encoding:
+            headers.append(("Content-Encoding", encoding))
+        start_response("200 OK", headers)
+
+        if environ["REQUEST_METHOD"] == "HEAD":
+            return []
+        f = open(served_path, "rb")
+        # Both wrappers have a close() the server calls when it is done, which closes the file
+        file_wrapper = environ.get("wsgi.file_wrapper", FileWrapper)
+        return file_wrapper(f, BLOCK_SIZE)
+
+    def not_modified(self, environ, etag, mtime):
+        """
+        Check the request's conditional headers against the file.
+
+        If-None-Match takes precedence over If-Modified-Since, as RFC 9110 asks.
+
+        :param environ: WSGI environ of the request.
+        :param etag: ETag of the file that would be sent.
+        :param mtime: Modification time of that file.
+        :return: True if the client's copy is current and a 304 can be sent.
+        """
+        if_none_match = environ.get("HTTP_IF_NONE_MATCH")
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags
+        if_modified_since = parse_http_date_safe(environ.get("HTTP_IF_MODIFIED_SINCE", ""))
+        return if_modified_since is not None and int(mtime) <= if_modified_since
+
+    def find_file(self, relative_path):
+        """
+        Resolve a URL path to a file inside the static root.
+
+        :param relative_path: Path after the static prefix.
+        :return: The file's Path, or None if it is missing or outside the root.
+        """
+        candidate = (self.root / relative_path).resolve()
+        if self.root not in candidate.parents or not candidate.is_file():
+            return None
+        return candidate
+
+    def choose_encoding(self, file_path, accept_encoding):
+        """
+        Pick the smallest precompressed sibling the client accepts.
+
+        :param file_path: Path of the uncompressed file.
+        :param accept_encoding: Value of the Accept-Encoding request header.
+        :return: Tuple of (path to send, Content-Encoding value or None).
+        """
+        accepted = {part.split(";")[0].strip() for part in accept_encoding.split(",")}
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            sibling = Path(f"{file_path}{suffix}")
+            if encoding in accepted and sibling.is_file():
+                return sibling, encoding
+        return file_path, None
+
+    def cache_control(self, name):
+        """
+        Build the Cache-Control header for a file.
+
+        Hashed names change whenever their content does, so they can be cached
+        forever; anything else is revalidated with its ETag or Last-Modified.
+
+        :param name: File name.
+        :return: Cache-Control header value.
+        """
+        if HASHED_NAME_RE.search(name):
+            return f"public, max-age={FAR_FUTURE_MAX_AGE}, immutable"
+        return "public, max-age=0, must-revalidate"
+
+
+def static_report(root):
+    """
+    Summarise the size of the collected assets and their compressed siblings.
+
+    :param root: STATIC_ROOT directory.
+    :return: Dictionary with file count and raw, gzip and brotli byte totals
+        for the compressible hashed files ("br" is None without brotli).
+    """
+    encodings = [("gzip", ".gz")] + ([("br", ".br")] if brotli is not None else [])
+    report = {"files": 0, "raw": 0, "gzip": 0, "br": 0 if brotli is not None else None}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = Path(dirpath) / filename
+            if path.suffix not in COMPRESSIBLE_EXTENSIONS or not HASHED_NAME_RE.search(filename):
+                continue
+            size = path.stat().st_size
+            report["files"] += 1
+            report["raw"] += size
+            for encoding, suffix in encodings:
+                sibling = Path(f"{path}{suffix}")
+                report[encoding] += sibling.stat().st_size if sibling.is_file() else size
+    return report
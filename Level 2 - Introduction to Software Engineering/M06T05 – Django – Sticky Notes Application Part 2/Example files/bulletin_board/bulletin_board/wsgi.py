@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bulletin_board.settings')
 
 application = get_wsgi_application()
+
+# Serve collected static files (hashed, precompressed) before Django sees the request
+from bulletin_board.staticfiles import StaticFilesMiddleware  # noqa: E402
+
+application = StaticFilesMiddleware(application)
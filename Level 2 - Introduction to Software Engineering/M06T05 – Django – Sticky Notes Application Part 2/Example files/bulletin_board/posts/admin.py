@@ -5,6 +5,7 @@ from django.contrib import admin
 from django.contrib import admin
 from .models import Post
 from .models import Author
+from .models import Tag
 
 # Register your models here.
 
@@ -12,4 +13,7 @@ from .models import Author
 admin.site.register(Post)
 
 # Author model
-admin.site.register(Author)
\ No newline at end of file
+admin.site.register(Author)
+
+# Tag model
+admin.site.register(Tag)
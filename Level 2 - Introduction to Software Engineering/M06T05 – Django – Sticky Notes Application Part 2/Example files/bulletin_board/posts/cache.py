@@ -0,0 +1,125 @@
+# posts/cache.py
+"""
+Cached rendering for post_detail.
+
+Each post has a version number stored in the cache. Rendered pages are
+stored under a key made of the post's pk and its current version, so
+invalidating a post is a single increment: old pages are never read again
+and simply expire. The signal handlers in posts/signals.py bump the
+version whenever a post is saved or deleted.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class CacheStats:
+    """
+    Thread-safe hit and miss counters for one process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        """
+        Count one cache lookup.
+
+        :param hit: True if the page came from the cache.
+        """
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def reset(self):
+        """
+        Set both counters back to zero.
+        """
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def as_dict(self):
+        """
+        Current counters and hit rate.
+
+        :return: Dictionary with "hits", "misses" and "hit_rate" (0 to 1).
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+stats = CacheStats()
+
+
+def detail_cache():
+    """
+    The cache used for rendered posts, or None if caching is turned off.
+
+    :return: Cache backend named by POSTS_DETAIL_CACHE, or None.
+    """
+    alias = getattr(settings, "POSTS_DETAIL_CACHE", None)
+    return caches[alias] if alias else None
+
+
+def _version_key(pk):
+    return f"post-detail:version:{pk}"
+
+
+def _page_key(pk, version):
+    return f"post-detail:{pk}:{version}"
+
+
+def get_cached_detail(pk, render):
+    """
+    Return the rendered detail page for a post, rendering it on a miss.
+
+    :param pk: Primary key of the post.
+    :param render: Callable that renders and returns the page HTML; it may
+        raise Http404, in which case nothing is cached.
+    :return: Page HTML.
+    """
+    cache = detail_cache()
+    if cache is None:
+        return render()
+
+    version = cache.get(_version_key(pk))
+    if version is None:
+        # Start from the current time rather than 1, so a version key that was
+        # evicted can never bring back pages cached under an older version
+        cache.add(_version_key(pk), time.time_ns(), timeout=None)
+        version = cache.get(_version_key(pk))
+
+    html = cache.get(_page_key(pk, version))
+    stats.record(hit=html is not None)
+    if html is None:
+        html = render()
+        cache.set(_page_key(pk, version), html)
+    return html
+
+
+def invalidate_detail(pk):
+    """
+    Make every cached page for a post stale by bumping its version.
+
+    :param pk: Primary key of the post.
+    """
+    cache = detail_cache()
+    if cache is None:
+        return
+    try:
+        cache.incr(_version_key(pk))
+    except ValueError:
+        # No version stored, so start a fresh one newer than any used before
+        cache.set(_version_key(pk), time.time_ns(), timeout=None)
@@ -0,0 +1,190 @@
+# posts/events.py
+"""
+In-process publish/subscribe hub for live post updates.
+
+Signal handlers publish an event whenever a post is created, updated or
+deleted, and every open server-sent events stream (the post_events view)
+receives it. No external broker is needed; the trade-off is that events
+only reach clients connected to the same process, so run a single ASGI
+worker (or put a broker in front) when that matters.
+
+Each event is encoded once and handed to every subscriber through its own
+bounded queue. A client that falls more than SUBSCRIBER_QUEUE_SIZE events
+behind is sent a "reset" event and disconnected, so one slow reader can
+never make the server buffer without limit; EventSource then reconnects
+and the page reloads the list.
+"""
+import asyncio
+import itertools
+import json
+import threading
+
+# Events a subscriber may have waiting before it is disconnected
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Sent to a subscriber that fell too far behind, just before its stream ends
+RESET_MESSAGE = b"event: reset\ndata: {}\n\n"
+
+
+def encode_event(event_id, event, data):
+    """
+    Format one server-sent event.
+
+    :param event_id: Event id, sent so clients can tell events apart.
+    :param event: Event name ("created", "updated" or "deleted").
+    :param data: JSON-serialisable payload.
+    :return: Bytes ready to write to the stream.
+    """
+    payload = json.dumps(data, separators=(",", ":"))
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n".encode()
+
+
+class Subscription:
+    """
+    One listener's queue of pending events.
+
+    :param loop: Event loop the listener runs on.
+    :param maxsize: Number of events that may wait in the queue.
+    """
+
+    def __init__(self, loop, maxsize):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = False
+
+    async def get(self, timeout=None):
+        """
+        Wait for events and return everything that is queued.
+
+        Handing over the whole backlog at once means a busy stream is
+        written in a few large chunks rather than one per event.
+
+        :param timeout: Seconds to wait, or None to wait for ever.
+        :return: Event bytes (RESET_MESSAGE if the listener fell behind),
+            or None if the timeout passed first.
+        """
+        if self.queue.empty():
+            first = await self._wait(timeout)
+            if first is None:
+                return None
+        else:
+            first = self.queue.get_nowait()
+        messages = [first]
+        while not self.queue.empty():
+            messages.append(self.queue.get_nowait())
+        return first if len(messages) == 1 else b"".join(messages)
+
+    async def _wait(self, timeout):
+        # asyncio.wait() rather than asyncio.wait_for(): on some Python versions
+        # wait_for swallows a cancellation that arrives just as an event does,
+        # leaving the stream of a disconnected client running for ever
+        getter = asyncio.ensure_future(self.queue.get())
+        try:
+            done, _ = await asyncio.wait({getter}, timeout=timeout)
+        except asyncio.CancelledError:
+            getter.cancel()
+            raise
+        if getter in done:
+            return getter.result()
+        getter.cancel()
+        return None
+
+    def deliver(self, message):
+        """
+        Queue an event; called on the listener's event loop.
+
+        :param message: Encoded event.
+        :return: False if the queue was full and the listener was reset.
+        """
+        if self.dropped:
+            return False
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            # Throw away the backlog and tell the client to start over
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESET_MESSAGE)
+            self.dropped = True
+            return False
+
+
+class EventHub:
+    """
+    Thread-safe fan-out of events to subscriptions on any event loop.
+
+    publish() may be called from any thread, such as a synchronous view.
+    Events are handed to each event loop with one call_soon_threadsafe
+    call, and the loop then fills its subscribers' queues.
+
+    :param queue_size: Queue size for new subscriptions.
+    """
+
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._by_loop = {}
+        self._ids = itertools.count(1)
+
+    def subscribe(self):
+        """
+        Start listening on the running event loop.
+
+        :return: New Subscription.
+        """
+        subscription = Subscription(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._by_loop.setdefault(subscription.loop, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Stop sending events to a subscription.
+
+        :param subscription: Subscription returned by subscribe().
+        """
+        with self._lock:
+            subscriptions = self._by_loop.get(subscription.loop)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._by_loop[subscription.loop]
+
+    def subscriber_count(self):
+        """
+        Number of open subscriptions across all event loops.
+        """
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._by_loop.values())
+
+    def publish(self, event, data):
+        """
+        Send an event to every subscriber.
+
+        :param event: Event name.
+        :param data: JSON-serialisable payload.
+        :return: Id of the event.
+        """
+        event_id = next(self._ids)
+        message = encode_event(event_id, event, data)
+        with self._lock:
+            loops = list(self._by_loop)
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._fan_out, loop, message)
+            except RuntimeError:
+                # The loop has been closed; its subscribers are gone
+                with self._lock:
+                    self._by_loop.pop(loop, None)
+        return event_id
+
+    def _fan_out(self, loop, message):
+        with self._lock:
+            subscriptions = list(self._by_loop.get(loop, ()))
+        for subscription in subscriptions:
+            if not subscription.deliver(message):
+                self.unsubscribe(subscription)
+
+
+hub = EventHub()
@@ -0,0 +1,124 @@
+# posts/factories.py
+"""
+Helpers that create authors and posts for tests and benchmarks.
+
+make_author and make_post create single rows through the ORM, so the usual
+signals run (author counts, revisions, cache invalidation). make_posts
+bulk-creates many posts with varied, realistic text and distinct creation
+times, then repairs the author counts that bulk_create skips. tag_posts does
+the same for tags.
+
+Names and titles come from a counter rather than fixed values, so tests
+never depend on which primary keys or names other tests used.
+"""
+import itertools
+import random
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .markup import render_markdown
+from .models import Author, Post, PostTag, Tag, make_excerpt, refresh_author_stats, refresh_tag_counts
+
+_sequence = itertools.count(1)
+
+WORDS = (
+    "meeting lunch parking printer coffee deadline project report holiday budget "
+    "kitchen fridge office window heating laptop password network badge delivery "
+    "the a to and of in on for with please today tomorrow team floor room"
+).split()
+
+
+def make_text(rng, words):
+    """
+    Build a sentence-like string of random words.
+
+    :param rng: random.Random instance.
+    :param words: Number of words.
+    :return: Text starting with a capital letter and ending with a full stop.
+    """
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def make_author(name=None):
+    """
+    Create an author.
+
+    :param name: Author name (defaults to a unique one).
+    :return: The new Author.
+    """
+    return Author.objects.create(name=name or f"Author {next(_sequence)}")
+
+
+def make_post(**fields):
+    """
+    Create a single post; any Post field can be given.
+
+    :return: The new Post.
+    """
+    n = next(_sequence)
+    fields.setdefault("title", f"Post {n}")
+    fields.setdefault("content", f"Content of post {n}.")
+    return Post.objects.create(**fields)
+
+
+def make_posts(count, authors=(), seed=0, batch_size=500):
+    """
+    Bulk-create posts with realistic text, spread over the past days.
+
+    :param count: Number of posts.
+    :param authors: Authors to share the posts between (round robin); posts
+        have no author if empty.
+    :param seed: Seed for the random text, so runs are repeatable.
+    :param batch_size: Rows per INSERT.
+    :return: List of the new Posts, newest first.
+    """
+    rng = random.Random(seed)
+    authors = list(authors)
+    now = timezone.now()
+    posts = []
+    for i in range(count):
+        content = " ".join(make_text(rng, rng.randint(5, 25)) for _ in range(rng.randint(1, 8)))
+        posts.append(Post(
+            title=f"{make_text(rng, rng.randint(2, 6))[:-1]} {next(_sequence)}",
+            content=content,
+            excerpt=make_excerpt(content),
+            content_html=render_markdown(content),
+            author=authors[i % len(authors)] if authors else None,
+        ))
+    posts = Post.objects.bulk_create(posts, batch_size=batch_size)
+
+    # bulk_create sets every created_at to now; give each post its own time
+    for i, post in enumerate(posts):
+        post.created_at = now - timedelta(minutes=i)
+    Post.objects.bulk_update(posts, ["created_at"], batch_size=batch_size)
+
+    if authors:
+        refresh_author_stats([author.pk for author in authors])
+    return posts
+
+
+def tag_posts(posts, names, per_post=3, seed=0, batch_size=500):
+    """
+    Bulk-tag posts, giving each a few tags picked with a skewed distribution
+    so that some tags are common and others rare, as on a real board.
+
+    :param posts: Posts to tag.
+    :param names: Tag names to choose from, most common first.
+    :param per_post: Most tags given to one post.
+    :param seed: Seed for the choices, so runs are repeatable.
+    :param batch_size: Rows per INSERT.
+    :return: List of the Tags, in the order of names.
+    """
+    rng = random.Random(seed)
+    Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+    tags = {tag.name: tag for tag in Tag.objects.filter(name__in=names)}
+    weights = [1 / (rank + 1) for rank in range(len(names))]
+    links = []
+    for post in posts:
+        chosen = set(rng.choices(names, weights, k=rng.randint(1, per_post)))
+        links.extend(PostTag(post=post, tag=tags[name]) for name in chosen)
+    PostTag.objects.bulk_create(links, batch_size=batch_size)
+    refresh_tag_counts([tag.pk for tag in tags.values()])
+    counted = Tag.objects.in_bulk(names, field_name="name")
+    return [counted[name] for name in names]
@@ -1,6 +1,7 @@
 # posts/forms.py
 from django import forms
 from .models import Post
+from .tags import MAX_TAGS_PER_POST, parse_tags, set_post_tags
 
 
 class PostForm(forms.ModelForm):
@@ -10,6 +11,7 @@ class PostForm(forms.ModelForm):
     Fields:
     - title: CharField for the post title.
     - content: TextField for the post content.
+    - tags: Comma-separated tag names, saved by save_m2m().
 
     Meta class:
     - Defines the model to use (Post) and the fields to include in the form.
@@ -17,6 +19,25 @@ class PostForm(forms.ModelForm):
     :param forms.ModelForm: Django's ModelForm class.
     """
 
+    tags = forms.CharField(required=False, help_text="Separate tags with commas.")
+
     class Meta:
         model = Post
-        fields = ["title", "content", "author"]
\ No newline at end of file
+        fields = ["title", "content", "author"]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.current_tags = []
+        if self.instance.pk:
+            self.current_tags = list(self.instance.tags.order_by("name").values_list("name", flat=True))
+            self.initial.setdefault("tags", ", ".join(self.current_tags))
+
+    def clean_tags(self):
+        names = parse_tags(self.cleaned_data["tags"])
+        if len(names) > MAX_TAGS_PER_POST:
+            raise forms.ValidationError(f"A post can have at most {MAX_TAGS_PER_POST} tags.")
+        return names
+
+    def _save_m2m(self):
+        super()._save_m2m()
+        set_post_tags(self.instance, self.cleaned_data["tags"], current=self.current_tags)
@@ -0,0 +1,111 @@
+# posts/management/commands/bench_events.py
+import asyncio
+import statistics
+import threading
+import time
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+
+from posts.events import hub
+
+
+class Command(BaseCommand):
+    """
+    Measure fan-out latency of the live event stream.
+
+    Opens --listeners connections to the post_events view through the real
+    ASGI application, all on one event loop as an ASGI server would. Events
+    are then published from another thread, the way a synchronous view
+    publishes them, and the time from publish() to each listener receiving
+    the bytes is recorded.
+    """
+
+    help = "Simulate many SSE listeners and measure event fan-out latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--listeners", type=int, default=1000, help="Number of connected clients.")
+        parser.add_argument("--events", type=int, default=50, help="Number of events to publish.")
+        parser.add_argument("--interval", type=float, default=0.02, help="Seconds between events.")
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(options["listeners"], options["events"], options["interval"]))
+
+    async def run(self, listeners, events, interval):
+        application = get_asgi_application()
+        path = reverse("post_events")
+        # Per event id: time it was published, and when each listener got it
+        published = {}
+        received = {}
+        connected = asyncio.Semaphore(0)
+        disconnect = asyncio.Event()
+
+        async def listener():
+            sent_request = False
+
+            async def receive():
+                nonlocal sent_request
+                if not sent_request:
+                    sent_request = True
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                await disconnect.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                if message["type"] != "http.response.body":
+                    return
+                body = message.get("body", b"")
+                if body.startswith(b"retry:"):
+                    connected.release()
+                else:
+                    # A chunk may hold several events if the listener was busy
+                    now = time.perf_counter()
+                    for line in body.split(b"\n"):
+                        if line.startswith(b"id: "):
+                            received.setdefault(int(line[4:]), []).append(now)
+
+            scope = {
+                "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+                "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+                "query_string": b"", "root_path": "", "headers": [(b"host", b"localhost")],
+                "client": ("127.0.0.1", 0), "server": ("localhost", 80),
+            }
+            await application(scope, receive, send)
+
+        start = time.perf_counter()
+        tasks = [asyncio.create_task(listener()) for _ in range(listeners)]
+        for _ in range(listeners):
+            await connected.acquire()
+        self.stdout.write(
+            f"Connected {hub.subscriber_count()} listeners in {time.perf_counter() - start:.2f} s"
+        )
+
+        def publisher():
+            for i in range(events):
+                published[hub.publish("created", {"id": i, "title": f"Post {i}"})] = time.perf_counter()
+                time.sleep(interval)
+
+        thread = threading.Thread(target=publisher)
+        thread.start()
+        await asyncio.to_thread(thread.join)
+        # Give the loop a moment to deliver the last event
+        await asyncio.sleep(0.5)
+
+        latencies = []
+        for event_id, sent_at in published.items():
+            latencies.extend((at - sent_at) * 1000 for at in received.get(event_id, ()))
+        delivered = len(latencies)
+        expected = events * listeners
+
+        disconnect.set()
+        await asyncio.gather(*tasks)
+
+        latencies.sort()
+        self.stdout.write(f"Delivered {delivered} of {expected} messages")
+        if latencies:
+            self.stdout.write(
+                f"Latency ms: median {statistics.median(latencies):.2f}, "
+                f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.2f}, max {latencies[-1]:.2f}"
+            )
+        self.stdout.write(f"Listeners left after disconnect: {hub.subscriber_count()}")
@@ -0,0 +1,75 @@
+# posts/management/commands/bench_post_detail.py
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory, override_settings
+
+from posts.cache import invalidate_detail, stats
+from posts.markup import render_markdown
+from posts.models import Author, Post
+from posts.views import post_detail
+
+
+class Command(BaseCommand):
+    """
+    Measure post_detail throughput with and without the page cache.
+
+    Posts are generated inside a transaction that is rolled back, so the
+    project database is left as it was. Requests follow a Zipf-like
+    distribution, so a few hot posts get most of the traffic, as on a real
+    board.
+    """
+
+    help = "Load test post_detail with the page cache on and off."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=500,
+                            help="Number of posts to generate.")
+        parser.add_argument("--requests", type=int, default=5000,
+                            help="Number of requests per run.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        factory = RequestFactory()
+
+        with transaction.atomic():
+            author = Author.objects.create(name="Benchmark Author")
+            content = "Some content for the benchmark. " * 40
+            posts = Post.objects.bulk_create(
+                Post(title=f"Post {i}", content=content, content_html=render_markdown(content), author=author)
+                for i in range(options["posts"])
+            )
+            pks = [post.pk for post in posts]
+            weights = [1 / rank for rank in range(1, len(pks) + 1)]
+            traffic = rng.choices(pks, weights, k=options["requests"])
+
+            try:
+                with override_settings(POSTS_DETAIL_CACHE=None):
+                    uncached = self.run(factory, traffic)
+                stats.reset()
+                cached = self.run(factory, traffic)
+            finally:
+                # Generated pks will be reused once the rows are rolled back
+                for pk in pks:
+                    invalidate_detail(pk)
+                transaction.set_rollback(True)
+
+        self.stdout.write(f"{'cache':<10}{'req/s':>10}")
+        self.stdout.write(f"{'off':<10}{uncached:>10.0f}")
+        self.stdout.write(f"{'on':<10}{cached:>10.0f}")
+        self.stdout.write(f"Speed-up: {cached / uncached:.1f}x, hit rate {stats.as_dict()['hit_rate']:.1%}")
+
+    def run(self, factory, traffic):
+        """
+        Call post_detail once for each pk in traffic.
+
+        :param factory: RequestFactory used to build the requests.
+        :param traffic: Post pks to request, in order.
+        :return: Requests per second.
+        """
+        start = time.perf_counter()
+        for pk in traffic:
+            post_detail(factory.get(f"/post/{pk}/"), pk)
+        return len(traffic) / (time.perf_counter() - start)
@@ -0,0 +1,78 @@
+# posts/management/commands/bench_revisions.py
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import Length
+
+from posts.models import Post, PostRevision
+from posts.revisions import get_revision
+
+from .bench_search import COMMON_WORDS, SYLLABLES
+
+
+class Command(BaseCommand):
+    """
+    Measure how much space post history takes and how fast revisions rebuild.
+
+    A long note is edited many times, a few words at a time, inside a
+    transaction that is rolled back afterwards, so the project database is
+    left as it was. The stored size is compared with keeping a full copy of
+    every revision.
+    """
+
+    help = "Benchmark revision storage growth and reconstruction time."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--edits", type=int, default=1000, help="Number of edits to make.")
+        parser.add_argument("--words", type=int, default=1000, help="Length of the note in words.")
+        parser.add_argument("--checkpoints", type=int, nargs="*", default=[10, 100, 1000],
+                            help="Edit counts at which to report storage.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        # A vocabulary of a few thousand words with Zipf-like frequencies, like real text
+        vocabulary = COMMON_WORDS + [a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES]
+        weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+        words = rng.choices(vocabulary, weights, k=options["words"])
+
+        with transaction.atomic():
+            post = Post.objects.create(title="Long note", content=" ".join(words))
+            full_copies = len(post.title) + len(post.content)
+
+            self.stdout.write(f"{'edits':>8}{'stored bytes':>14}{'full copies':>14}{'ratio':>8}{'snapshots':>11}")
+            for edit in range(1, options["edits"] + 1):
+                for _ in range(3):
+                    words[rng.randrange(len(words))] = rng.choices(vocabulary, weights)[0]
+                post.content = " ".join(words)
+                post.save()
+                full_copies += len(post.title) + len(post.content)
+                if edit in options["checkpoints"]:
+                    self.report(post, edit, full_copies)
+
+            numbers = list(PostRevision.objects.filter(post=post).values_list("number", flat=True))
+            sample = [rng.choice(numbers) for _ in range(200)]
+            start = time.perf_counter()
+            for number in sample:
+                get_revision(post.pk, number)
+            elapsed = (time.perf_counter() - start) / len(sample) * 1000
+            self.stdout.write(f"Rebuilding a random revision takes {elapsed:.2f} ms on average")
+
+            transaction.set_rollback(True)
+
+    def report(self, post, edits, full_copies):
+        """
+        Print the storage used by a post's revisions so far.
+
+        :param post: The edited Post.
+        :param edits: Number of edits made so far.
+        :param full_copies: Bytes that storing every revision in full would take.
+        """
+        revisions = PostRevision.objects.filter(post=post)
+        stored = revisions.aggregate(total=Sum(Length("data")))["total"]
+        snapshots = sum(1 for number, base in revisions.values_list("number", "base") if number == base)
+        self.stdout.write(
+            f"{edits:>8}{stored:>14}{full_copies:>14}{stored / full_copies:>8.3f}{snapshots:>11}"
+        )
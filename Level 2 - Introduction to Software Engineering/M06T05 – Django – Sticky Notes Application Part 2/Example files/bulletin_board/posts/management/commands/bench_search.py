@@ -0,0 +1,116 @@
+# posts/management/commands/bench_search.py
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.search import FTS_CREATE_SQL, SEARCH_SQL, build_match_query
+
+# What Post.objects.filter(Q(title__icontains=q) | Q(content__icontains=q)) runs on SQLite
+ICONTAINS_SQL = """
+    SELECT id, title FROM posts_post
+    WHERE title LIKE ? ESCAPE '\\' OR content LIKE ? ESCAPE '\\'
+    ORDER BY id DESC
+    LIMIT ?
+"""
+
+COMMON_WORDS = (
+    "meeting lunch parking printer coffee deadline project report holiday budget "
+    "kitchen fridge office window heating laptop password network badge delivery"
+).split()
+SYLLABLES = "ka lo mi ne ru sa ti vo ze pa".split()
+
+
+class Command(BaseCommand):
+    """
+    Compare FTS5 search with icontains on a generated posts table.
+
+    The table lives in a temporary SQLite file, so the project database is
+    never touched. Each search term is run --repeat times with both methods.
+    icontains can stop at the first 20 matches, so it is quick for very common
+    words but has to scan the whole table for rare ones; FTS5 looks up only the
+    matching posts but ranks all of them.
+    """
+
+    help = "Benchmark FTS5 search against content__icontains."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=1_000_000,
+                            help="Number of posts to generate.")
+        parser.add_argument("--repeat", type=int, default=5,
+                            help="Runs per search term.")
+        parser.add_argument("--terms", nargs="*", default=["fridge", "kitivo", "zebra", "laptop password"],
+                            help="Search terms to time (common, uncommon, rare and a two-word query).")
+
+    def handle(self, *args, **options):
+        fd, path = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(fd)
+        try:
+            conn = sqlite3.connect(path)
+            self.fill(conn, options["posts"])
+            self.compare(conn, options["terms"], options["repeat"])
+            conn.close()
+        finally:
+            os.remove(path)
+
+    def fill(self, conn, count):
+        """
+        Create posts_post with generated rows, then build the FTS index.
+
+        :param conn: sqlite3 connection.
+        :param count: Number of posts.
+        """
+        rng = random.Random(42)
+        # A vocabulary of a few thousand words with Zipf-like frequencies, like real text
+        vocabulary = COMMON_WORDS + [a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES]
+        weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+        conn.execute("CREATE TABLE posts_post (id INTEGER PRIMARY KEY, title TEXT, content TEXT)")
+
+        def rows():
+            for i in range(1, count + 1):
+                words = rng.choices(vocabulary, weights, k=40)
+                # A handful of posts mention a rare word
+                if i % 100_000 == 0:
+                    words.append("zebra")
+                yield i, " ".join(words[:5]).capitalize(), " ".join(words)
+
+        start = time.perf_counter()
+        conn.executemany("INSERT INTO posts_post VALUES (?, ?, ?)", rows())
+        conn.commit()
+        self.stdout.write(f"Inserted {count} posts in {time.perf_counter() - start:.1f} s")
+
+        start = time.perf_counter()
+        for statement in FTS_CREATE_SQL:
+            conn.execute(statement)
+        conn.commit()
+        self.stdout.write(f"Built FTS5 index in {time.perf_counter() - start:.1f} s")
+
+    def compare(self, conn, terms, repeat):
+        """
+        Time both search methods for each term.
+
+        :param conn: sqlite3 connection.
+        :param terms: Search terms.
+        :param repeat: Runs per term.
+        """
+        search_sql = SEARCH_SQL.replace("%s", "?")
+        self.stdout.write(f"{'term':<20}{'icontains ms':>14}{'fts5 ms':>10}{'speed-up':>10}")
+        for term in terms:
+            pattern = f"%{term}%"
+            like_ms = self.time_query(conn, ICONTAINS_SQL, (pattern, pattern, 20), repeat)
+            fts_ms = self.time_query(conn, search_sql, (build_match_query(term), 20), repeat)
+            self.stdout.write(f"{term:<20}{like_ms:>14.1f}{fts_ms:>10.1f}{like_ms / fts_ms:>9.1f}x")
+
+    def time_query(self, conn, sql, params, repeat):
+        """
+        Run a query several times and return the average time.
+
+        :return: Milliseconds per query.
+        """
+        start = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(sql, params).fetchall()
+        return (time.perf_counter() - start) / repeat * 1000
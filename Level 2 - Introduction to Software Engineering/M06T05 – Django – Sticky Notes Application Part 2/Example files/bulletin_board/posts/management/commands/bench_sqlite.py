@@ -0,0 +1,128 @@
+# posts/management/commands/bench_sqlite.py
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from bulletin_board.sqlite import DEFAULT_PRAGMAS, pragma_statements
+
+
+class Command(BaseCommand):
+    """
+    Compare concurrent reads and writes with SQLite's defaults and with the
+    tuned pragmas from bulletin_board/sqlite.py.
+
+    Each run uses its own temporary database file, so the project database
+    is never touched. Reader threads load a page of posts, like post_list;
+    writer threads read a post and then update it inside a transaction,
+    like post_update. Both runs use the same busy timeout, so the difference
+    comes from the journal mode and the transaction mode.
+    """
+
+    help = "Benchmark concurrent SQLite reads and writes with and without tuning."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=8, help="Number of reader threads.")
+        parser.add_argument("--writers", type=int, default=2, help="Number of writer threads.")
+        parser.add_argument("--seconds", type=float, default=5.0, help="Length of each run.")
+        parser.add_argument("--posts", type=int, default=10_000, help="Number of posts to generate.")
+        parser.add_argument("--busy-timeout", type=float, default=0.2,
+                            help="Seconds a connection waits for a lock before failing.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'mode':<10}{'reads/s':>10}{'writes/s':>10}{'lock errors':>13}")
+        for label, pragmas, begin in (
+            ("default", {}, "BEGIN"),
+            ("tuned", {**DEFAULT_PRAGMAS, "busy_timeout": None}, "BEGIN IMMEDIATE"),
+        ):
+            result = self.run(pragmas, begin, options)
+            self.stdout.write(
+                f"{label:<10}{result['reads'] / options['seconds']:>10.0f}"
+                f"{result['writes'] / options['seconds']:>10.0f}{result['errors']:>13}"
+            )
+
+    def run(self, pragmas, begin, options):
+        """
+        Run readers and writers against a fresh database for a fixed time.
+
+        :param pragmas: Pragmas to apply on every connection.
+        :param begin: Statement used to start write transactions.
+        :param options: Command options.
+        :return: Dictionary with "reads", "writes" and "errors" counts.
+        """
+        fd, path = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(fd)
+        counts = {"reads": 0, "writes": 0, "errors": 0}
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def connect():
+            conn = sqlite3.connect(path, timeout=options["busy_timeout"],
+                                   isolation_level=None, check_same_thread=False)
+            for statement in pragma_statements(pragmas):
+                conn.execute(statement)
+            return conn
+
+        def count(key):
+            with lock:
+                counts[key] += 1
+
+        def reader(n):
+            conn = connect()
+            while not stop.is_set():
+                offset = (n * 97) % max(options["posts"] - 20, 1)
+                try:
+                    conn.execute(
+                        "SELECT id, title, excerpt FROM posts_post ORDER BY id DESC LIMIT 20 OFFSET ?",
+                        (offset,),
+                    ).fetchall()
+                    count("reads")
+                except sqlite3.OperationalError:
+                    count("errors")
+                n += 1
+            conn.close()
+
+        def writer(n):
+            conn = connect()
+            while not stop.is_set():
+                pk = (n * 7919) % options["posts"] + 1
+                try:
+                    conn.execute(begin)
+                    conn.execute("SELECT content FROM posts_post WHERE id = ?", (pk,)).fetchone()
+                    conn.execute("UPDATE posts_post SET content = content || '.' WHERE id = ?", (pk,))
+                    conn.execute("COMMIT")
+                    count("writes")
+                except sqlite3.OperationalError:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    count("errors")
+                n += 1
+            conn.close()
+
+        try:
+            setup = connect()
+            setup.execute("CREATE TABLE posts_post (id INTEGER PRIMARY KEY, title TEXT, excerpt TEXT, content TEXT)")
+            setup.execute("BEGIN")
+            setup.executemany(
+                "INSERT INTO posts_post (title, excerpt, content) VALUES (?, ?, ?)",
+                ((f"Post {i}", "Excerpt " * 20, "Content " * 100) for i in range(options["posts"])),
+            )
+            setup.execute("COMMIT")
+            setup.close()
+
+            threads = [threading.Thread(target=reader, args=(i,)) for i in range(options["readers"])]
+            threads += [threading.Thread(target=writer, args=(i,)) for i in range(options["writers"])]
+            for thread in threads:
+                thread.start()
+            time.sleep(options["seconds"])
+            stop.set()
+            for thread in threads:
+                thread.join()
+        finally:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        return counts
@@ -0,0 +1,78 @@
+# posts/management/commands/export_posts.py
+import csv
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+
+FIELDS = ["id", "title", "content", "author", "created_at"]
+
+
+class Command(BaseCommand):
+    """
+    Export all posts to a JSONL or CSV file.
+
+    Rows are streamed from the database with .iterator(), so only one chunk
+    of posts is held in memory at a time. The output can be read back with
+    import_posts.
+    """
+
+    help = "Export posts to a JSONL or CSV file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to write, or - for standard output.")
+        parser.add_argument("--format", choices=["jsonl", "csv"],
+                            help="File format (guessed from the extension if not given).")
+        parser.add_argument("--chunk-size", type=int, default=2000,
+                            help="Number of rows fetched from the database at a time.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or ("csv" if path.lower().endswith(".csv") else "jsonl")
+
+        rows = (
+            Post.objects.order_by("id")
+            .values_list("id", "title", "content", "author__name", "created_at")
+            .iterator(chunk_size=options["chunk_size"])
+        )
+
+        start = time.perf_counter()
+        stream = self.stdout if path == "-" else open(path, "w", newline="", encoding="utf-8")
+        try:
+            exported = write_rows(stream, fmt, rows)
+        finally:
+            if stream is not self.stdout:
+                stream.close()
+
+        elapsed = time.perf_counter() - start
+        rate = exported / elapsed if elapsed else 0
+        # Report on stderr when the posts themselves go to stdout
+        report = self.stderr if path == "-" else self.stdout
+        report.write(f"Exported {exported} posts in {elapsed:.1f} s ({rate:.0f} posts/s)")
+
+
+def write_rows(stream, fmt, rows):
+    """
+    Write exported rows to a stream.
+
+    :param stream: Open text file.
+    :param fmt: "jsonl" or "csv".
+    :param rows: Iterator of (id, title, content, author, created_at) tuples.
+    :return: Number of rows written.
+    """
+    count = 0
+    if fmt == "csv":
+        writer = csv.writer(stream)
+        writer.writerow(FIELDS)
+        for pk, title, content, author, created_at in rows:
+            writer.writerow([pk, title, content, author or "", created_at.isoformat()])
+            count += 1
+        return count
+
+    for pk, title, content, author, created_at in rows:
+        record = dict(zip(FIELDS, [pk, title, content, author, created_at.isoformat()]))
+        stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        count += 1
+    return count
@@ -0,0 +1,201 @@
+# posts/management/commands/import_posts.py
+import csv
+import json
+import sys
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.markup import render_markdown
+from posts.models import Author, Post, add_author_posts, make_excerpt
+
+
+class Command(BaseCommand):
+    """
+    Import posts from a JSONL or CSV file.
+
+    Records are read as a stream and handled in chunks: each chunk looks up
+    its authors with one query, creates the missing ones with one
+    bulk_create, then inserts its posts with another. Only one chunk is in
+    memory at a time, so memory stays flat however large the file is.
+
+    Each record needs "title" and "content"; "author" (a name) and
+    "created_at" (ISO 8601) are optional. This matches what export_posts
+    writes. A created_at without a UTC offset is read in the current time
+    zone (TIME_ZONE). Records without a title are reported and skipped.
+    """
+
+    help = "Import posts from a JSONL or CSV file in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to read, or - for standard input.")
+        parser.add_argument("--format", choices=["jsonl", "csv"],
+                            help="File format (guessed from the extension if not given).")
+        parser.add_argument("--chunk-size", type=int, default=2000,
+                            help="Number of posts inserted per batch.")
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or guess_format(options["path"])
+        chunk_size = options["chunk_size"]
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be at least 1")
+
+        # Author name -> id, filled as authors are seen so each is looked up once
+        self.author_ids = {}
+        imported = 0
+        self.skipped = 0
+        read = 0
+        start = time.perf_counter()
+
+        stream = sys.stdin if options["path"] == "-" else open(options["path"], newline="", encoding="utf-8")
+        try:
+            records = read_records(stream, fmt)
+            while True:
+                chunk = list(islice(records, chunk_size))
+                if not chunk:
+                    break
+                imported += self.import_chunk(chunk, read + 1)
+                read += len(chunk)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        elapsed = time.perf_counter() - start
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write(f"Imported {imported} posts in {elapsed:.1f} s ({rate:.0f} posts/s)")
+        if self.skipped:
+            self.stdout.write(f"Skipped {self.skipped} records without a title")
+
+    @transaction.atomic
+    def import_chunk(self, chunk, first_number):
+        """
+        Insert one chunk of records.
+
+        :param chunk: List of record dictionaries.
+        :param first_number: Position of the chunk's first record in the file, for error messages.
+        :return: Number of posts inserted.
+        """
+        chunk = self.valid_records(chunk, first_number)
+        self.resolve_authors({record.get("author") for record in chunk} - {None, ""})
+
+        posts = []
+        created_at = []
+        for record in chunk:
+            content = record.get("content") or ""
+            posts.append(Post(
+                title=record["title"],
+                content=content,
+                excerpt=make_excerpt(content),
+                content_html=render_markdown(content),
+                author_id=self.author_ids.get(record.get("author")),
+            ))
+            created_at.append(parse_created_at(record.get("created_at")))
+        Post.objects.bulk_create(posts)
+
+        # created_at is auto_now_add, so restore the original dates with one extra update
+        dated = []
+        for post, value in zip(posts, created_at):
+            if value is not None:
+                post.created_at = value
+                dated.append(post)
+        if dated:
+            Post.objects.bulk_update(dated, ["created_at"])
+
+        # bulk_create skips the signals that maintain author counts, so add this chunk's posts
+        # to them; recounting each author's posts every chunk would grow with the table
+        new_posts = {}
+        for post in posts:
+            if post.author_id is not None:
+                count, newest = new_posts.get(post.author_id, (0, post.created_at))
+                new_posts[post.author_id] = (count + 1, max(newest, post.created_at))
+        add_author_posts(new_posts)
+        return len(posts)
+
+    def valid_records(self, chunk, first_number):
+        """
+        Drop records that cannot become a post, reporting each one.
+
+        :param chunk: List of records as read from the file.
+        :param first_number: Position of the chunk's first record in the file.
+        :return: List of the usable records.
+        """
+        valid = []
+        for number, record in enumerate(chunk, start=first_number):
+            if isinstance(record, dict) and record.get("title"):
+                valid.append(record)
+            else:
+                self.skipped += 1
+                self.stderr.write(f"Skipping record {number}: it has no title")
+        return valid
+
+    def resolve_authors(self, names):
+        """
+        Make sure every author name has an id, creating missing authors.
+
+        :param names: Set of author names used by the current chunk.
+        """
+        missing = names - self.author_ids.keys()
+        if not missing:
+            return
+        for pk, name in Author.objects.filter(name__in=missing).order_by("-id").values_list("id", "name"):
+            self.author_ids[name] = pk
+        missing -= self.author_ids.keys()
+        if missing:
+            for author in Author.objects.bulk_create([Author(name=name) for name in missing]):
+                self.author_ids[author.name] = author.pk
+
+
+def guess_format(path):
+    """
+    Guess the file format from its extension.
+
+    :param path: File path.
+    :return: "csv" or "jsonl".
+    """
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def parse_created_at(value):
+    """
+    Parse a record's created_at, matching the project's USE_TZ setting.
+
+    Files may mix times with and without a UTC offset; without this they
+    could not be compared with each other or saved consistently.
+
+    :param value: ISO 8601 text, or None/"" if the record has no date.
+    :return: Datetime, or None if there is no date or it can't be parsed.
+    """
+    parsed = parse_datetime(value) if value else None
+    if parsed is None:
+        return None
+    if settings.USE_TZ and timezone.is_naive(parsed):
+        return timezone.make_aware(parsed)
+    if not settings.USE_TZ and timezone.is_aware(parsed):
+        return timezone.make_naive(parsed)
+    return parsed
+
+
+def read_records(stream, fmt):
+    """
+    Yield records from a JSONL or CSV stream one at a time.
+
+    :param stream: Open text file.
+    :param fmt: "jsonl" or "csv".
+    :return: Iterator of dictionaries.
+    """
+    if fmt == "csv":
+        csv.field_size_limit(sys.maxsize)  # Post content can be longer than the csv default limit
+        yield from csv.DictReader(stream)
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise CommandError(f"Line {line_number} is not valid JSON: {exc}")
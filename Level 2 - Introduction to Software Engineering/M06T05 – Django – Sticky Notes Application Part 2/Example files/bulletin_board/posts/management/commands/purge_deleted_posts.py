@@ -0,0 +1,126 @@
+# posts/management/commands/purge_deleted_posts.py
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from posts.cache import invalidate_detail
+from posts.models import Author, Post, PostTag, refresh_author_stats, refresh_tag_counts
+from posts.tags import invalidate_tag_facets
+
+
+class Command(BaseCommand):
+    """
+    Hard-delete soft-deleted posts a batch at a time.
+
+    Each batch is its own short transaction, so SQLite's write lock (or
+    MySQL's row locks) is only held for one batch and other requests can
+    write in between. Run it from cron, for example:
+    python manage.py purge_deleted_posts --older-than-days 30
+
+    With --author, all of an author's posts are soft-deleted, purged in
+    batches and the author is removed last, instead of deleting the author
+    and cascading to every post in one long transaction.
+
+    This runs in its own process, so it cannot reach the server's live
+    events hub: pages open on the post list are not told about the posts it
+    removes and only drop them when they reload. Cached detail pages are
+    invalidated through the post_detail cache, which only reaches the server
+    when that cache is shared (the default file-based cache is); with a
+    per-process cache the server keeps serving them until they time out.
+    """
+
+    help = (
+        "Permanently delete soft-deleted posts in small batches. Open post lists are not "
+        "updated live; they drop the removed posts when they reload."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-days", type=float, default=0,
+                            help="Only purge posts deleted at least this many days ago.")
+        parser.add_argument("--batch-size", type=int, default=500,
+                            help="How many posts to delete per transaction.")
+        parser.add_argument("--max-batches", type=int, default=0,
+                            help="Stop after this many batches (0 means no limit).")
+        parser.add_argument("--sleep", type=float, default=0.0,
+                            help="Seconds to pause between batches to let other queries through.")
+        parser.add_argument("--author", type=int,
+                            help="Delete this author and all their posts in batches.")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        posts = Post.all_objects.filter(deleted_at__isnull=False)
+        author = None
+        if options["author"] is not None:
+            try:
+                author = Author.objects.get(pk=options["author"])
+            except Author.DoesNotExist:
+                raise CommandError(f"Author {options['author']} does not exist.")
+            self.hide_posts(author)
+            posts = posts.filter(author=author)
+        else:
+            cutoff = timezone.now() - timedelta(days=options["older_than_days"])
+            posts = posts.filter(deleted_at__lte=cutoff)
+
+        deleted, batches, finished = self.purge(posts, options)
+
+        if author is not None and finished:
+            author.delete()
+            self.stdout.write(f"Deleted author {author.name}.")
+        self.stdout.write(f"Purged {deleted} posts in {batches} batches.")
+
+    def hide_posts(self, author):
+        """
+        Soft-delete all of an author's live posts with one UPDATE.
+
+        The UPDATE skips the signals that soft_delete() would send, so this
+        redoes the parts of their work that outlive this process: tag and
+        author counts are refreshed and cached detail pages are invalidated.
+        Unlike soft_delete(), no "deleted" event reaches live clients (see
+        the class docstring). The posts are hidden even if --max-batches stops
+        before they are purged.
+
+        :param author: Author whose posts are hidden.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            tag_ids = set(PostTag.objects.filter(post__author=author, post__deleted_at__isnull=True)
+                          .values_list("tag_id", flat=True))
+            Post.objects.filter(author=author).update(deleted_at=now, updated_at=now)
+            refresh_tag_counts(tag_ids)
+            refresh_author_stats([author.pk])
+        invalidate_tag_facets()
+
+        hidden = Post.all_objects.filter(author=author, deleted_at=now).values_list("id", flat=True)
+        for pk in hidden.iterator():
+            invalidate_detail(pk)
+
+    def purge(self, posts, options):
+        """
+        Delete the posts in a queryset, oldest deletion first, in batches.
+
+        :param posts: Queryset of soft-deleted posts.
+        :param options: Command options.
+        :return: Tuple of (posts deleted, batches run, whether none are left).
+        """
+        deleted = 0
+        batches = 0
+        while not options["max_batches"] or batches < options["max_batches"]:
+            # Pick the next batch from the deleted_at index, then delete exactly those rows
+            ids = list(posts.order_by("deleted_at", "id").values_list("id", flat=True)[:options["batch_size"]])
+            if not ids:
+                return deleted, batches, True
+
+            with transaction.atomic():
+                _, per_model = Post.all_objects.filter(pk__in=ids).delete()
+            # The total also counts cascaded rows such as revisions
+            deleted += per_model.get(Post._meta.label, 0)
+            batches += 1
+
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+        return deleted, batches, not posts.exists()
@@ -0,0 +1,67 @@
+# posts/management/commands/restore_db.py
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from bulletin_board.backup import BackupError, format_size, integrity_problems, restore_database
+
+
+class Command(BaseCommand):
+    """
+    Restore the SQLite database from a file written by backup_db.
+
+    The backup's checksum (if its .sha256 file is there) and integrity are
+    verified, and compressed backups unpacked, before the database is
+    touched. The data is then copied in with SQLite's backup API, so the
+    site can stay up: requests running during the copy wait for it to
+    finish and then see the restored data.
+    """
+
+    help = "Replace the SQLite database with the contents of a backup."
+
+    def add_arguments(self, parser):
+        parser.add_argument("backup", help="Backup file to restore (plain or gzip/bz2/xz compressed).")
+        parser.add_argument("--pages", type=int, default=256,
+                            help="Database pages copied per step (-1 copies everything at once).")
+        parser.add_argument("--pause", type=float, default=0.0,
+                            help="Seconds to wait between steps.")
+        parser.add_argument("--noinput", "--no-input", action="store_false", dest="interactive",
+                            help="Don't ask for confirmation.")
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS,
+                            help="Database alias to restore into.")
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if connection.vendor != "sqlite":
+            raise CommandError("restore_db only works with SQLite databases.")
+        if options["pages"] == 0 or options["pages"] < -1:
+            raise CommandError("--pages must be positive, or -1.")
+        target = connection.settings_dict["NAME"]
+
+        if options["interactive"]:
+            answer = input(
+                f"This will replace everything in {target} with {options['backup']}.\n"
+                "Type 'yes' to continue, or 'no' to cancel: "
+            )
+            if answer != "yes":
+                raise CommandError("Restore cancelled.")
+
+        # Don't let this process's own connection hold a lock during the copy
+        connection.close()
+        try:
+            result = restore_database(options["backup"], target, pages=options["pages"], pause=options["pause"])
+        except (BackupError, FileNotFoundError) as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(
+            f"Verified and unpacked {options['backup']} ({format_size(result['backup_bytes'])}) "
+            f"in {result['unpack_seconds']:.2f} s"
+        )
+        self.stdout.write(
+            f"Restored {result['pages']} pages ({format_size(result['database_bytes'])}) "
+            f"in {result['steps']} steps, {result['copy_seconds']:.2f} s"
+        )
+        problems = integrity_problems(target, quick=True)
+        if problems:
+            raise CommandError("The restored database failed its check: " + "; ".join(problems[:5]))
+        self.stdout.write("Quick check of the restored database passed.")
+        self.stdout.write("Restart the web server so cached pages built from the old data are dropped.")
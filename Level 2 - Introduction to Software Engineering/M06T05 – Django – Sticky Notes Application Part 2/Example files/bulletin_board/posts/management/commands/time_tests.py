@@ -0,0 +1,52 @@
+# posts/management/commands/time_tests.py
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """
+    Time the test suite with different numbers of parallel workers.
+
+    Each run is a separate "manage.py test --parallel N" process, so the
+    times include creating and cloning the test database, as a real run
+    does. The speed-up is relative to the first worker count given.
+    """
+
+    help = "Report how the test suite's run time scales with parallel workers."
+
+    def add_arguments(self, parser):
+        cores = os.cpu_count() or 1
+        default = sorted({1, *(n for n in (2, 4, 8, 16) if n <= cores), cores})
+        parser.add_argument("--workers", type=int, nargs="+", default=default,
+                            help="Worker counts to try (default: powers of two up to the core count).")
+        parser.add_argument("--repeat", type=int, default=1,
+                            help="Runs per worker count; the fastest is reported.")
+        parser.add_argument("labels", nargs="*", help="Test labels to pass on (default: the whole suite).")
+
+    def handle(self, *args, **options):
+        manage_py = settings.BASE_DIR / "manage.py"
+        self.stdout.write(f"{os.cpu_count()} CPU cores available")
+        self.stdout.write(f"{'workers':>8}{'seconds':>10}{'speed-up':>10}")
+
+        baseline = None
+        for workers in options["workers"]:
+            best = None
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                result = subprocess.run(
+                    [sys.executable, str(manage_py), "test", "--parallel", str(workers), "--noinput",
+                     *options["labels"]],
+                    cwd=settings.BASE_DIR, capture_output=True, text=True,
+                )
+                elapsed = time.perf_counter() - start
+                if result.returncode != 0:
+                    self.stderr.write(result.stderr)
+                    raise CommandError(f"Tests failed with --parallel {workers}.")
+                best = elapsed if best is None else min(best, elapsed)
+            baseline = baseline or best
+            self.stdout.write(f"{workers:>8}{best:>10.2f}{baseline / best:>9.2f}x")
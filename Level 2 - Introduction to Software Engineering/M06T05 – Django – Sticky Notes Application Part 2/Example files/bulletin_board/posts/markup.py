@@ -0,0 +1,183 @@
+# posts/markup.py
+"""
+Markdown rendering for post content.
+
+Post.save stores the rendered HTML in Post.content_html whenever the content
+changes, so pages only ever output the stored HTML and never parse Markdown
+while serving a request.
+
+When the optional ``markdown`` and ``nh3`` packages are both installed they
+render and sanitise the HTML. Otherwise a small built-in renderer handles
+the common syntax: paragraphs, headings, emphasis, inline and fenced code,
+links, lists, block quotes and rules. It escapes the text before adding any
+markup of its own, so its output is safe without a sanitiser.
+
+The two renderers do not produce identical HTML for the same source, so
+installing or removing the packages changes how newly saved posts look.
+The built-in renderer only treats underscores as emphasis at word
+boundaries and leaves a lone identifier such as ``__init__`` as it is,
+where the markdown package makes it bold. Images are never shown: the
+built-in renderer keeps their alt text and the sanitiser drops them.
+"""
+import re
+
+from django.utils.html import escape
+
+try:
+    import markdown
+    import nh3
+except ImportError:  # Both are optional; the built-in renderer covers common Markdown
+    markdown = nh3 = None
+
+# Tags and attributes kept in the HTML from the markdown package
+ALLOWED_TAGS = {
+    "a", "blockquote", "br", "code", "em", "h1", "h2", "h3", "h4", "h5", "h6",
+    "hr", "li", "ol", "p", "pre", "strong", "ul",
+}
+ALLOWED_ATTRIBUTES = {"a": {"href", "title"}}
+ALLOWED_URL_SCHEMES = {"http", "https", "mailto"}
+LINK_REL = "nofollow noopener"
+
+_FENCE = re.compile(r"^ {0,3}(```|~~~)")
+_HEADING = re.compile(r"^ {0,3}(#{1,6})\s+(.*?)\s*#*\s*$")
+_RULE = re.compile(r"^ {0,3}([-*_])(\s*\1){2,}\s*$")
+_QUOTE = re.compile(r"^ {0,3}> ?")
+_BULLET = re.compile(r"^ {0,3}[-*+]\s+")
+_NUMBER = re.compile(r"^ {0,3}\d{1,9}[.)]\s+")
+
+_CODE_SPAN = re.compile(r"(`+)(.+?)\1", re.S)
+_IMAGE = re.compile(r"!\[([^\]\n]*)\]\(\s*([^()\s]+)\s*\)")
+_LINK = re.compile(r"\[([^\]\n]+)\]\(\s*([^()\s]+)\s*\)")
+# Underscores only count at word boundaries, and never around a bare
+# identifier, so snake_case names and dunders like __init__ stay as written
+_STRONG = re.compile(r"\*\*(?=\S)(.+?)(?<=\S)\*\*|\b__(?!\w+__\b)(?=[^\s_])(.+?)(?<=[^\s_])__\b", re.S)
+_EM = re.compile(r"\*(?=\S)(.+?)(?<=\S)\*|\b_(?=[^\s_])(.+?)(?<=[^\s_])_\b", re.S)
+_SAFE_URL = re.compile(r"^(https?://|mailto:|/(?!/)|#)", re.I)
+# Control characters never belong in post text and mark placeholders here
+_CONTROL = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def render_markdown(text):
+    """
+    Render post content as sanitised HTML.
+
+    :param text: Markdown source.
+    :return: HTML string, safe to output without escaping.
+    """
+    if markdown is not None:
+        html = markdown.markdown(text, extensions=["fenced_code", "sane_lists"])
+        return nh3.clean(
+            html,
+            tags=ALLOWED_TAGS,
+            attributes=ALLOWED_ATTRIBUTES,
+            url_schemes=ALLOWED_URL_SCHEMES,
+            link_rel=LINK_REL,
+        )
+    return _render_blocks(_CONTROL.sub("", text).replace("\r\n", "\n").replace("\r", "\n").split("\n"))
+
+
+def _render_blocks(lines):
+    """
+    Render a list of source lines as block-level HTML.
+
+    :param lines: Lines without their line endings.
+    :return: HTML string.
+    """
+    html = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if not line.strip():
+            i += 1
+            continue
+
+        fence = _FENCE.match(line)
+        if fence:
+            end = i + 1
+            while end < len(lines) and not lines[end].lstrip().startswith(fence.group(1)):
+                end += 1
+            code = "\n".join(lines[i + 1:end])
+            html.append(f"<pre><code>{escape(code)}</code></pre>")
+            i = end + 1
+            continue
+
+        heading = _HEADING.match(line)
+        if heading:
+            level = len(heading.group(1))
+            html.append(f"<h{level}>{_render_inline(heading.group(2))}</h{level}>")
+            i += 1
+            continue
+
+        if _RULE.match(line):
+            html.append("<hr>")
+            i += 1
+            continue
+
+        if _QUOTE.match(line):
+            quoted = []
+            while i < len(lines) and _QUOTE.match(lines[i]):
+                quoted.append(_QUOTE.sub("", lines[i], count=1))
+                i += 1
+            html.append(f"<blockquote>{_render_blocks(quoted)}</blockquote>")
+            continue
+
+        for marker, tag in ((_BULLET, "ul"), (_NUMBER, "ol")):
+            if marker.match(line):
+                items = []
+                while i < len(lines) and lines[i].strip():
+                    if marker.match(lines[i]):
+                        items.append(marker.sub("", lines[i], count=1))
+                    elif items and lines[i][:1].isspace():
+                        # An indented line continues the item above it
+                        items[-1] += "\n" + lines[i].strip()
+                    else:
+                        break
+                    i += 1
+                html.append(f"<{tag}>" + "".join(f"<li>{_render_inline(item)}</li>" for item in items) + f"</{tag}>")
+                break
+        else:
+            paragraph = []
+            while i < len(lines) and lines[i].strip() and not _starts_block(lines[i]):
+                paragraph.append(lines[i].strip())
+                i += 1
+            html.append(f"<p>{_render_inline(chr(10).join(paragraph))}</p>")
+    return "\n".join(html)
+
+
+def _starts_block(line):
+    return any(pattern.match(line) for pattern in (_FENCE, _HEADING, _RULE, _QUOTE, _BULLET, _NUMBER))
+
+
+def _render_inline(text):
+    """
+    Render inline Markdown in one block of text.
+
+    Code spans and links are set aside as placeholders first, so nothing
+    inside a code span or a URL is formatted, and everything is escaped
+    before tags are added. Images are replaced by their alt text.
+
+    :param text: Source text of a paragraph, heading or list item.
+    :return: HTML string.
+    """
+    spans = []
+
+    def keep(html):
+        spans.append(html)
+        return f"\x00{len(spans) - 1}\x00"
+
+    def link(match):
+        label, url = match.groups()
+        if not _SAFE_URL.match(url):
+            return label
+        return keep(f'<a href="{url}" rel="{LINK_REL}">{_emphasis(label)}</a>')
+
+    text = _CODE_SPAN.sub(lambda match: keep(f"<code>{escape(match.group(2).strip())}</code>"), text)
+    text = _IMAGE.sub(lambda match: match.group(1), escape(text))
+    text = _emphasis(_LINK.sub(link, text))
+    text = text.replace("\n", "<br>\n")
+    return re.sub(r"\x00(\d+)\x00", lambda match: spans[int(match.group(1))], text)
+
+
+def _emphasis(text):
+    text = _STRONG.sub(lambda match: f"<strong>{match.group(1) or match.group(2)}</strong>", text)
+    return _EM.sub(lambda match: f"<em>{match.group(1) or match.group(2)}</em>", text)
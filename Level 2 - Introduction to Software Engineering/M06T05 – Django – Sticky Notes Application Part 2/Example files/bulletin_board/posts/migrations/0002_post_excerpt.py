@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:54
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+
+def fill_excerpts(apps, schema_editor):
+    # Historical models don't run Post.save(), so build the excerpts here in batches
+    Post = apps.get_model('posts', 'Post')
+    batch = []
+    for post in Post.objects.only('id', 'content').iterator(chunk_size=1000):
+        post.excerpt = Truncator(post.content).chars(200)
+        batch.append(post)
+        if len(batch) == 1000:
+            Post.objects.bulk_update(batch, ['excerpt'])
+            batch = []
+    Post.objects.bulk_update(batch, ['excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+from posts.search import FTS_CREATE_SQL, FTS_DROP_SQL
+
+
+def create_fts(apps, schema_editor):
+    # The FTS5 index only exists on SQLite; other databases search with icontains
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in FTS_CREATE_SQL:
+        schema_editor.execute(statement)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in FTS_DROP_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_post_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:59
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_author_stats(apps, schema_editor):
+    # Count every author's posts with one UPDATE ... SET = (subquery)
+    Author = apps.get_model('posts', 'Author')
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.filter(author=OuterRef('pk')).order_by()
+    Author.objects.update(
+        post_count=Coalesce(Subquery(posts.values('author').annotate(n=Count('id')).values('n')), 0),
+        last_posted_at=Subquery(posts.order_by('-created_at').values('created_at')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_post_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='last_posted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_author_stats, migrations.RunPython.noop),
+    ]
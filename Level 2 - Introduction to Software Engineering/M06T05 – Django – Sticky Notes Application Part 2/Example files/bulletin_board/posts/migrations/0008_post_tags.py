@@ -0,0 +1,52 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_post_revisions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.SlugField(unique=True)),
+                ('post_count', models.PositiveIntegerField(default=0, editable=False)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-post_count', 'name'], name='tag_popular_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='posts.post')),
+                ('tag', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='posts.tag')),
+            ],
+        ),
+        # The field adds no column (PostTag is the table), but SQLite's schema
+        # editor would rebuild posts_post for it and drop the search triggers
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='post',
+                    name='tags',
+                    field=models.ManyToManyField(blank=True, related_name='posts', through='posts.PostTag', to='posts.tag'),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='posttag',
+            index=models.Index(fields=['post', 'tag'], name='post_tag_post_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='posttag',
+            constraint=models.UniqueConstraint(fields=('tag', 'post'), name='post_tag_uniq'),
+        ),
+    ]
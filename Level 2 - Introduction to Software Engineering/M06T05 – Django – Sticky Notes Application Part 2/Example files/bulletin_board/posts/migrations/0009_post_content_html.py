@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:41
+
+from django.db import migrations, models
+
+from posts.markup import render_markdown
+from posts.search import FTS_CREATE_SQL
+
+
+def restore_fts(apps, schema_editor):
+    # SQLite adds the column by rebuilding posts_post, which drops the search
+    # triggers; create them again (the statements skip what still exists)
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in FTS_CREATE_SQL:
+        schema_editor.execute(statement)
+
+
+def fill_content_html(apps, schema_editor):
+    # Historical models don't run Post.save(), so render the content here in batches
+    Post = apps.get_model('posts', 'Post')
+    batch = []
+    for post in Post.objects.only('id', 'content').iterator(chunk_size=1000):
+        post.content_html = render_markdown(post.content)
+        batch.append(post)
+        if len(batch) == 1000:
+            Post.objects.bulk_update(batch, ['content_html'])
+            batch = []
+    Post.objects.bulk_update(batch, ['content_html'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_post_tags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(restore_fts, migrations.RunPython.noop),
+        migrations.RunPython(fill_content_html, migrations.RunPython.noop),
+    ]
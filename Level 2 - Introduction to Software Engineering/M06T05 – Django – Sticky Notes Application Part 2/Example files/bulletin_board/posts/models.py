@@ -3,19 +3,56 @@ from django.db import models
 # Create your models here.
 # posts/models.py
 from django.db import models
+from django.db.models import DEFERRED
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.text import Truncator
+
+from .markup import render_markdown
+
+# Number of characters of content shown for each post on the list page
+EXCERPT_LENGTH = 200
+
+
+class LivePostManager(models.Manager):
+    """
+    Default manager for Post that leaves out soft-deleted posts.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 
 class Post(models.Model):
     """Model representing a bulletin board post.
 
     Fields:
     - title: CharField for the post title with a maximum length of 255 characters.
-    - content: TextField for the post content.
+    - content: TextField for the post content, written in Markdown.
+    - content_html: TextField holding the content rendered to sanitised HTML,
+      refreshed on save only when the content has changed.
+    - excerpt: CharField holding the start of the content, kept up to date on save
+      so the list page never has to load the full content.
     - created_at: DateTimeField set to the current date and time when the post is created.
+      Indexed together with id, since listings and the feed are ordered by both.
+    - updated_at: DateTimeField set whenever the post is saved. Indexed so the newest
+      change (used for conditional GET) is a cheap lookup.
+    - deleted_at: DateTimeField set when the post is soft-deleted, None while it is live.
+      The purge_deleted_posts command removes soft-deleted rows for good.
+
+    Managers:
+    - objects: Live posts only. Listings use the partial index on (created_at, id)
+      WHERE deleted_at IS NULL, so deleted rows never slow them down.
+    - all_objects: Every post, including soft-deleted ones.
 
     Relationships:
     - author: ForeignKey representing the author of the post.
+    - tags: ManyToManyField to Tag through PostTag. Set with posts.tags.set_post_tags,
+      which also keeps the tag counts up to date.
 
     Methods:
+    - save: Refreshes the excerpt and rendered HTML from the content before saving.
+    - soft_delete: Hides the post by setting deleted_at.
     - __str__: Returns a string representation of the post, showing the title.
 
     :param models.Model: Django's base model class.
@@ -23,23 +60,197 @@ class Post(models.Model):
 
     title = models.CharField(max_length=255)
     content = models.TextField()
+    content_html = models.TextField(blank=True, editable=False)
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     # Define a ForeignKey for the author's relationship
     author = models.ForeignKey(
         "Author", on_delete=models.CASCADE, null=True, blank=True
     )
+    tags = models.ManyToManyField("Tag", through="PostTag", related_name="posts", blank=True)
+
+    objects = LivePostManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        # Partial indexes are created on SQLite and PostgreSQL; MySQL skips them
+        indexes = [
+            models.Index(
+                fields=["-created_at", "-id"],
+                name="post_live_created_id_idx",
+                condition=models.Q(deleted_at__isnull=True),
+            ),
+            models.Index(
+                fields=["deleted_at"],
+                name="post_deleted_at_idx",
+                condition=models.Q(deleted_at__isnull=False),
+            ),
+        ]
+
+    # Content that content_html was last rendered from (None until rendered)
+    _rendered_content = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super().from_db(db, field_names, values)
+        post._rendered_content = post.__dict__.get("content", DEFERRED)
+        return post
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        # The stored content_html was rendered from the content just loaded
+        # (this also runs when a deferred content field is first read)
+        if fields is None or "content" in fields:
+            self._rendered_content = self.__dict__.get("content", DEFERRED)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if "content" in self.get_deferred_fields() or (
+            update_fields is not None and "content" not in update_fields
+        ):
+            # The content isn't being saved, so what is built from it is still current
+            super().save(*args, **kwargs)
+            return
+
+        derived = {"excerpt"}
+        self.excerpt = make_excerpt(self.content)
+        if self.content != self._rendered_content:
+            self.content_html = render_markdown(self.content)
+            self._rendered_content = self.content
+            derived.add("content_html")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, *derived}
+        super().save(*args, **kwargs)
+
+    def soft_delete(self):
+        """
+        Hide the post without deleting its row.
+
+        Saving through the model keeps the author counts, cached detail page
+        and feed ETag up to date via the usual signals.
+        """
+        self.deleted_at = timezone.now()
+        self.save(update_fields=["deleted_at", "updated_at"])
 
     def __str__(self):
         return self.title
 
 
+def make_excerpt(content):
+    """
+    Shorten post content for the list page.
+
+    :param content: Full post content.
+    :return: Content cut to EXCERPT_LENGTH characters, ending with an ellipsis if cut.
+    """
+    return Truncator(content).chars(EXCERPT_LENGTH)
+
+
+class PostRevision(models.Model):
+    """
+    One saved version of a post's title and content.
+
+    Most revisions store only a delta against the revision before them; every
+    so often a full snapshot is stored instead so that rebuilding a revision
+    never has to replay a long chain (see posts/revisions.py).
+
+    Fields:
+    - post: ForeignKey to the post this revision belongs to.
+    - number: Revision number, counting from 1 for each post.
+    - base: Number of the snapshot this revision is rebuilt from. Equal to
+      number for snapshots.
+    - data: JSON text holding either the full title and content (snapshot)
+      or the changes since the previous revision (delta).
+    - chain_bytes: Size of all deltas since the base snapshot, including this
+      one. Used to decide when the next snapshot is due.
+    - created_at: DateTimeField set when the revision is saved.
+
+    :param models.Model: Django's base model class.
+    """
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="revisions")
+    number = models.PositiveIntegerField()
+    base = models.PositiveIntegerField()
+    data = models.TextField()
+    chain_bytes = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["post", "number"], name="post_revision_number_uniq"),
+        ]
+
+    @property
+    def is_snapshot(self):
+        return self.base == self.number
+
+    def __str__(self):
+        return f"{self.post_id} r{self.number}"
+
+
+class Tag(models.Model):
+    """
+    A label that posts can be filed under.
+
+    Fields:
+    - name: SlugField holding the normalised tag name (see posts.tags.parse_tags).
+    - post_count: Number of live posts with this tag, kept up to date by
+      posts.tags.set_post_tags and the signal handlers in posts/signals.py.
+      Indexed together with name so the most used tags are a short index scan.
+
+    :param models.Model: Django's base model class.
+    """
+
+    name = models.SlugField(max_length=50, unique=True)
+    post_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-post_count", "name"], name="tag_popular_idx"),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class PostTag(models.Model):
+    """
+    Link between a post and one of its tags.
+
+    The unique (tag, post) index serves "posts with this tag" and the
+    (post, tag) index serves "does this post have that tag" and "tags of
+    this post", so neither foreign key needs an index of its own.
+
+    :param models.Model: Django's base model class.
+    """
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, db_index=False)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, db_index=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["tag", "post"], name="post_tag_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["post", "tag"], name="post_tag_post_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} {self.tag_id}"
+
+
 class Author(models.Model):
     """
     Model representing the author of a bulletin board post.
 
     Fields:
     - name: CharField for the author's name.
+    - post_count: Number of posts by this author, kept up to date by the
+      signal handlers in posts/signals.py.
+    - last_posted_at: Creation time of the author's newest post, or None.
      Methods:
     - __str__: Returns a string representation of the author, showing the name.
 
@@ -47,6 +258,85 @@ class Author(models.Model):
     """
 
     name = models.CharField(max_length=255)
+    post_count = models.PositiveIntegerField(default=0, editable=False)
+    last_posted_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+
+def add_author_posts(new_posts, batch_size=500):
+    """
+    Count newly inserted posts for their authors without recounting.
+
+    The same increment as signals._add_post, for bulk inserts that skip the
+    signals: post_count goes up by each author's count and last_posted_at
+    moves forward only if the new posts are newer. Runs one UPDATE per
+    batch_size authors.
+
+    :param new_posts: Dictionary of author id to (number of new posts,
+        newest created_at among them).
+    :param batch_size: Most authors updated per query.
+    :return: Number of authors updated.
+    """
+    updated = 0
+    author_ids = list(new_posts)
+    for start in range(0, len(author_ids), batch_size):
+        batch = author_ids[start:start + batch_size]
+        updated += Author.objects.filter(pk__in=batch).update(
+            post_count=models.F("post_count") + models.Case(
+                *[models.When(pk=pk, then=models.Value(new_posts[pk][0])) for pk in batch],
+                output_field=models.PositiveIntegerField(),
+            ),
+            last_posted_at=models.Case(
+                *[
+                    models.When(
+                        models.Q(pk=pk)
+                        & (models.Q(last_posted_at__isnull=True) | models.Q(last_posted_at__lt=new_posts[pk][1])),
+                        then=models.Value(new_posts[pk][1]),
+                    )
+                    for pk in batch
+                ],
+                default=models.F("last_posted_at"),
+            ),
+        )
+    return updated
+
+
+def refresh_author_stats(author_ids):
+    """
+    Recompute post_count and last_posted_at from the posts table.
+
+    Used after bulk operations that skip model signals, and to repair drift.
+    All the given authors are updated with a single UPDATE.
+
+    :param author_ids: Ids of the authors to refresh.
+    :return: Number of authors updated.
+    """
+    posts = Post.objects.filter(author=models.OuterRef("pk")).order_by()
+    return Author.objects.filter(pk__in=author_ids).update(
+        post_count=Coalesce(
+            models.Subquery(posts.values("author").annotate(n=models.Count("id")).values("n")),
+            0,
+        ),
+        last_posted_at=models.Subquery(posts.order_by("-created_at").values("created_at")[:1]),
+    )
+
+
+def refresh_tag_counts(tag_ids):
+    """
+    Recompute post_count for tags from the posts table.
+
+    Used after bulk operations that skip model signals, and to repair drift.
+    All the given tags are updated with a single UPDATE.
+
+    :param tag_ids: Ids of the tags to refresh.
+    :return: Number of tags updated.
+    """
+    links = PostTag.objects.filter(tag=models.OuterRef("pk"), post__deleted_at__isnull=True).order_by()
+    return Tag.objects.filter(pk__in=tag_ids).update(
+        post_count=Coalesce(
+            models.Subquery(links.values("tag").annotate(n=models.Count("post")).values("n")),
+            0,
+        ),
+    )
@@ -0,0 +1,217 @@
+# posts/revisions.py
+"""
+Edit history for posts, stored as compact deltas.
+
+Every time a post's title or content changes, a PostRevision is written.
+The first edit also saves the post's original text as revision 1, so posts
+that are never edited have no history rows at all.
+Most revisions hold only a delta: the content is split into words, and the
+delta lists which runs of the previous revision's
+tokens to copy and what new text to insert between them, e.g.
+``[[0, 41], "new words ", [44, 120]]``. The title is stored only when it
+changes.
+
+A full snapshot is written instead of a delta when the chain since the last
+snapshot reaches SNAPSHOT_INTERVAL revisions, or when the deltas since then
+add up to more than the text itself. Rebuilding any revision therefore
+replays a bounded number of deltas, and snapshots cost at most as much
+space as the deltas before them, so history grows with the size of the
+edits rather than with edit count times note length.
+"""
+import json
+import re
+from difflib import SequenceMatcher
+
+from django.db import connection, transaction
+
+from .models import Post, PostRevision
+
+# Longest run of deltas between two snapshots
+SNAPSHOT_INTERVAL = 50
+
+# A word together with the whitespace after it. Keeping whitespace out of its
+# own tokens avoids one very common token that would make diffing quadratic.
+_TOKEN_RE = re.compile(r"\S+\s*|\s+")
+
+
+def tokenize(text):
+    """
+    Split text into words, each with its trailing whitespace.
+
+    :param text: Text to split.
+    :return: List of tokens that join back to the original text.
+    """
+    return _TOKEN_RE.findall(text)
+
+
+def make_delta(old, new):
+    """
+    Describe how to turn one text into another.
+
+    :param old: Previous text.
+    :param new: New text.
+    :return: List of operations: [start, end] copies old tokens start to end,
+        a string is inserted as it is.
+    """
+    old_tokens = tokenize(old)
+    new_tokens = tokenize(new)
+
+    # Most edits touch one part of the note: match the unchanged start and end
+    # directly and only diff what lies between them
+    prefix = 0
+    limit = min(len(old_tokens), len(new_tokens))
+    while prefix < limit and old_tokens[prefix] == new_tokens[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old_tokens[-suffix - 1] == new_tokens[-suffix - 1]:
+        suffix += 1
+
+    ops = []
+    if prefix:
+        ops.append([0, prefix])
+    matcher = SequenceMatcher(
+        None,
+        old_tokens[prefix:len(old_tokens) - suffix],
+        new_tokens[prefix:len(new_tokens) - suffix],
+        autojunk=False,
+    )
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([prefix + i1, prefix + i2])
+        elif tag in ("replace", "insert"):
+            text = "".join(new_tokens[prefix + j1:prefix + j2])
+            # Merge with a preceding insert so the delta stays short
+            if ops and isinstance(ops[-1], str):
+                ops[-1] += text
+            else:
+                ops.append(text)
+    if suffix:
+        ops.append([len(old_tokens) - suffix, len(old_tokens)])
+    return _merge_copies(ops)
+
+
+def _merge_copies(ops):
+    """
+    Join copy operations that follow on from each other.
+
+    :param ops: Delta operations.
+    :return: Equivalent, possibly shorter, list of operations.
+    """
+    merged = []
+    for op in ops:
+        if merged and not isinstance(op, str) and not isinstance(merged[-1], str) \
+                and merged[-1][1] == op[0]:
+            merged[-1] = [merged[-1][0], op[1]]
+        else:
+            merged.append(op)
+    return merged
+
+
+def apply_delta(old, ops):
+    """
+    Rebuild a text from the previous text and a delta made by make_delta.
+
+    :param old: Previous text.
+    :param ops: Delta operations.
+    :return: New text.
+    """
+    old_tokens = tokenize(old)
+    parts = []
+    for op in ops:
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            parts.extend(old_tokens[op[0]:op[1]])
+    return "".join(parts)
+
+
+def _dumps(data):
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def record_revision(post, old_title=None, old_content=None):
+    """
+    Save a revision for the post's current title and content.
+
+    A post without revisions (every post before its first edit) gets its
+    previous state saved as a first snapshot before the new revision.
+
+    The post's row is locked while the next number is chosen, so two edits
+    saved at the same time are numbered one after the other instead of
+    both taking the same number.
+
+    :param post: The saved Post.
+    :param old_title: Title before this save, or None to save only the
+        current text as the first snapshot.
+    :param old_content: Content before this save, or None as for old_title.
+    :return: The new PostRevision.
+    """
+    with transaction.atomic():
+        # SQLite has no row locks; its IMMEDIATE transactions already let one writer in at a time
+        if connection.features.has_select_for_update:
+            Post.all_objects.select_for_update().filter(pk=post.pk).values_list("pk").first()
+        if old_content is None:
+            return _save_snapshot(post, 1, post.title, post.content)
+
+        last = (
+            PostRevision.objects.filter(post=post)
+            .only("number", "base", "chain_bytes")
+            .order_by("-number")
+            .first()
+        )
+        if last is None:
+            last = _save_snapshot(post, 1, old_title, old_content)
+
+        delta = {"c": make_delta(old_content, post.content)}
+        if post.title != old_title:
+            delta["t"] = post.title
+        data = _dumps(delta)
+        chain_bytes = last.chain_bytes + len(data)
+        number = last.number + 1
+        if number - last.base >= SNAPSHOT_INTERVAL or chain_bytes > len(post.title) + len(post.content):
+            return _save_snapshot(post, number, post.title, post.content)
+        return PostRevision.objects.create(
+            post=post, number=number, base=last.base, data=data, chain_bytes=chain_bytes
+        )
+
+
+def _save_snapshot(post, number, title, content):
+    return PostRevision.objects.create(
+        post=post, number=number, base=number, data=_dumps({"t": title, "c": content})
+    )
+
+
+def get_revision(post_id, number):
+    """
+    Rebuild the title and content of a post as of a revision.
+
+    Costs two indexed queries: one for the revision's base snapshot number
+    and one for the snapshot and the deltas after it.
+
+    :param post_id: Primary key of the post.
+    :param number: Revision number.
+    :return: Dictionary with "number", "title", "content" and "created_at",
+        or None if the revision does not exist.
+    """
+    base = (
+        PostRevision.objects.filter(post_id=post_id, number=number)
+        .values_list("base", flat=True)
+        .first()
+    )
+    if base is None:
+        return None
+
+    chain = (
+        PostRevision.objects.filter(post_id=post_id, number__gte=base, number__lte=number)
+        .order_by("number")
+        .values_list("data", "created_at")
+    )
+    title = content = ""
+    for index, (data, created_at) in enumerate(chain):
+        data = json.loads(data)
+        if index == 0:
+            title, content = data["t"], data["c"]
+        else:
+            title = data.get("t", title)
+            content = apply_delta(content, data["c"])
+    return {"number": number, "title": title, "content": content, "created_at": created_at}
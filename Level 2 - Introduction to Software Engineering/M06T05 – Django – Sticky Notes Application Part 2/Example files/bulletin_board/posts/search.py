@@ -0,0 +1,138 @@
+# posts/search.py
+"""
+Full-text search over post titles and content.
+
+On SQLite the search runs against ``posts_post_fts``, an FTS5 index over
+``posts_post`` that triggers keep in sync on every insert, update and delete
+(including bulk_create and queryset updates, which skip model signals).
+Results are ranked with bm25 and come with highlighted snippets, and
+soft-deleted posts are left out. Other databases fall back to a plain
+``icontains`` filter.
+"""
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+FTS_TABLE = "posts_post_fts"
+
+# Statements that create the index and its triggers, then fill it from existing posts
+FTS_CREATE_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, content, content='posts_post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS posts_post_fts_insert AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS posts_post_fts_delete AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS posts_post_fts_update AFTER UPDATE OF title, content ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+FTS_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS posts_post_fts_insert",
+    "DROP TRIGGER IF EXISTS posts_post_fts_delete",
+    "DROP TRIGGER IF EXISTS posts_post_fts_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+# Control characters used to mark matches before the text is HTML-escaped
+_MARK_START = "\x02"
+_MARK_END = "\x03"
+
+# The ranked search: bm25 weights title matches above content matches.
+# Soft-deleted posts stay in the index until purged, so they are filtered out
+# here (a lookup on the small partial index over deleted_at).
+SEARCH_SQL = f"""
+    SELECT rowid,
+           highlight({FTS_TABLE}, 0, '{_MARK_START}', '{_MARK_END}'),
+           snippet({FTS_TABLE}, 1, '{_MARK_START}', '{_MARK_END}', '…', 24)
+    FROM {FTS_TABLE}
+    WHERE {FTS_TABLE} MATCH %s
+      AND rowid NOT IN (SELECT id FROM posts_post WHERE deleted_at IS NOT NULL)
+    ORDER BY bm25({FTS_TABLE}, 10.0, 1.0)
+    LIMIT %s
+"""
+
+
+def fts_available(conn=None):
+    """
+    Check whether the FTS5 index can be used on a connection.
+
+    :param conn: Database connection (defaults to the default connection).
+    :return: True on SQLite, False on other databases.
+    """
+    return (conn or connection).vendor == "sqlite"
+
+
+def build_match_query(query):
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+
+    Each word is quoted, so characters such as quotes, colons or minus signs
+    are searched for rather than read as FTS5 syntax. All words must match.
+
+    :param query: Text typed by the user.
+    :return: MATCH expression, or an empty string if there are no words.
+    """
+    terms = [term.replace('"', '""') for term in query.split()]
+    return " ".join(f'"{term}"' for term in terms if term)
+
+
+def _highlight(text):
+    """
+    Escape text and turn the match markers into <mark> tags.
+
+    :param text: Text returned by highlight() or snippet().
+    :return: Safe HTML string.
+    """
+    html = escape(text or "").replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+    return mark_safe(html)
+
+
+def search_posts(query, limit=20):
+    """
+    Search posts by title and content.
+
+    :param query: Text typed by the user.
+    :param limit: Maximum number of results.
+    :return: List of dictionaries with "id", "title" and "snippet" (safe HTML),
+        best match first.
+    """
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    if not fts_available():
+        posts = (
+            Post.objects.filter(Q(title__icontains=query) | Q(content__icontains=query))
+            .only("id", "title", "excerpt")
+            .order_by("-created_at", "-id")[:limit]
+        )
+        return [{"id": post.pk, "title": post.title, "snippet": post.excerpt} for post in posts]
+
+    with connection.cursor() as cursor:
+        cursor.execute(SEARCH_SQL, [match, limit])
+        rows = cursor.fetchall()
+    return [
+        {"id": pk, "title": _highlight(title), "snippet": _highlight(snippet)}
+        for pk, title, snippet in rows
+    ]
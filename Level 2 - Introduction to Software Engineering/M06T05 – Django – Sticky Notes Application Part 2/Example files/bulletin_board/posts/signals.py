@@ -0,0 +1,265 @@
+# posts/signals.py
+"""
+Keep Author.post_count, Author.last_posted_at and Tag.post_count in step
+with Post, invalidate cached post_detail pages when a post changes, record a
+revision whenever a post's title or content is edited, and publish live
+events for the server-sent events stream.
+
+Each change is a single UPDATE using F() expressions, so counts stay
+correct when several requests save posts at the same time. Bulk
+operations (bulk_create, queryset.update/delete) skip signals and should
+call posts.models.refresh_author_stats (and refresh_tag_counts)
+afterwards.
+"""
+from django.db import transaction
+from django.db.models import DEFERRED, Case, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cache import invalidate_detail
+from .events import hub
+from .models import Author, Post
+from .revisions import record_revision
+from .tags import uncount_post_tags
+
+
+def _newest_post_time():
+    """
+    Subquery for the creation time of an author's newest remaining post.
+
+    :return: Subquery expression usable in Author.objects.update().
+    """
+    return Subquery(
+        Post.objects.filter(author=OuterRef("pk")).order_by("-created_at").values("created_at")[:1]
+    )
+
+
+def _add_post(author_id, created_at):
+    """
+    Count a new post for an author.
+
+    :param author_id: Author's primary key.
+    :param created_at: Creation time of the post.
+    """
+    Author.objects.filter(pk=author_id).update(
+        post_count=F("post_count") + 1,
+        last_posted_at=Case(
+            When(Q(last_posted_at__isnull=True) | Q(last_posted_at__lt=created_at), then=Value(created_at)),
+            default=F("last_posted_at"),
+        ),
+    )
+
+
+def _remove_post(author_id):
+    """
+    Stop counting a post for an author.
+
+    :param author_id: Author's primary key.
+    """
+    Author.objects.filter(pk=author_id, post_count__gt=0).update(
+        post_count=F("post_count") - 1,
+        last_posted_at=_newest_post_time(),
+    )
+
+
+def _counted_author_id(author_id, deleted_at):
+    """
+    The author a post counts towards: soft-deleted posts count for nobody.
+
+    :param author_id: The post's author id (or DEFERRED).
+    :param deleted_at: The post's deleted_at value (or DEFERRED).
+    :return: Author id, None, or DEFERRED if either value was not loaded.
+    """
+    if author_id is DEFERRED or deleted_at is DEFERRED:
+        return DEFERRED
+    return author_id if deleted_at is None else None
+
+
+def _invalidate_detail_on_commit(pk):
+    """
+    Invalidate a post's cached pages once the current transaction commits.
+
+    Bumping the version earlier would let a concurrent request cache the
+    old page under the new version before the change is visible.
+
+    :param pk: Primary key of the post.
+    """
+    transaction.on_commit(lambda: invalidate_detail(pk))
+
+
+@receiver(post_init, sender=Post)
+def remember_author(sender, instance, **kwargs):
+    """
+    Remember which author a post counted towards when it was loaded.
+
+    Read from __dict__ so that posts loaded with only()/defer() don't trigger
+    an extra query per row just to be remembered.
+
+    :param instance: The Post being initialised.
+    """
+    instance._original_author_id = _counted_author_id(
+        instance.__dict__.get("author_id", DEFERRED),
+        instance.__dict__.get("deleted_at", DEFERRED),
+    )
+    instance._original_deleted_at = instance.__dict__.get("deleted_at", DEFERRED)
+
+
+@receiver(pre_save, sender=Post)
+def load_original_author(sender, instance, raw=False, **kwargs):
+    """
+    Look up the stored author of a post whose author field was deferred.
+
+    :param instance: The Post about to be saved.
+    """
+    if raw or instance._state.adding or instance._original_author_id is not DEFERRED:
+        return
+    stored = Post.all_objects.filter(pk=instance.pk).values_list("author_id", "deleted_at").first()
+    instance._original_author_id = _counted_author_id(*stored) if stored else None
+    instance._original_deleted_at = stored[1] if stored else None
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw=False, **kwargs):
+    """
+    Update author counts when a post is created, moved to another author,
+    or soft-deleted.
+
+    :param instance: The saved Post.
+    :param created: True if the post was just inserted.
+    """
+    if raw:
+        return
+    old_author_id = None if created else instance._original_author_id
+    new_author_id = _counted_author_id(instance.author_id, instance.deleted_at)
+    if old_author_id != new_author_id:
+        if old_author_id is not None:
+            _remove_post(old_author_id)
+        if new_author_id is not None:
+            _add_post(new_author_id, instance.created_at)
+    instance._original_author_id = new_author_id
+    _invalidate_detail_on_commit(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post_tags(sender, instance, created, raw=False, **kwargs):
+    """
+    Update tag counts when a post is soft-deleted. New posts have no tags
+    yet; posts.tags.set_post_tags counts them as they are added.
+
+    :param instance: The saved Post.
+    :param created: True if the post was just inserted.
+    """
+    if raw or created:
+        return
+    if instance._original_deleted_at is None and instance.deleted_at is not None:
+        uncount_post_tags(instance.pk)
+    instance._original_deleted_at = instance.deleted_at
+
+
+@receiver(pre_delete, sender=Post)
+def count_deleted_post_tags(sender, instance, **kwargs):
+    """
+    Update tag counts when a live post is deleted. This runs before the
+    delete because the post's tag links are deleted along with it.
+
+    :param instance: The Post about to be deleted.
+    """
+    if instance.deleted_at is None:
+        uncount_post_tags(instance.pk)
+
+
+@receiver(pre_save, sender=Post)
+def load_original_text(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Load the stored title and content of a post that is about to be edited,
+    so the revision can be saved as a delta against them.
+
+    :param instance: The Post about to be saved.
+    :param update_fields: Fields being saved, or None for all of them.
+    """
+    instance._original_text = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not {"title", "content"} & set(update_fields):
+        return
+    instance._original_text = (
+        Post.all_objects.filter(pk=instance.pk).values_list("title", "content").first()
+    )
+
+
+@receiver(post_save, sender=Post)
+def save_revision(sender, instance, created, raw=False, **kwargs):
+    """
+    Record a revision for an edit to a post's title or content.
+
+    New posts get no revision: the first edit saves the original text as
+    a snapshot before the change, so posts that are never edited cost no
+    extra storage.
+
+    :param instance: The saved Post.
+    :param created: True if the post was just inserted.
+    """
+    if raw or created:
+        return
+    original = getattr(instance, "_original_text", None)
+    if original is not None and original != (instance.title, instance.content):
+        record_revision(instance, *original)
+
+
+def _publish(event, post):
+    """
+    Publish a post event once the current transaction commits.
+
+    :param event: "created", "updated" or "deleted".
+    :param post: The Post the event is about.
+    """
+    if event == "deleted":
+        data = {"id": post.pk}
+    else:
+        data = {
+            "id": post.pk,
+            "title": post.title,
+            "excerpt": post.excerpt,
+            "author": post.author.name if post.author_id else None,
+        }
+    transaction.on_commit(lambda: hub.publish(event, data))
+
+
+@receiver(post_save, sender=Post)
+def publish_saved_post(sender, instance, created, raw=False, **kwargs):
+    """
+    Tell live listeners about a new, edited or soft-deleted post.
+
+    :param instance: The saved Post.
+    :param created: True if the post was just inserted.
+    """
+    if raw:
+        return
+    if instance.deleted_at is not None:
+        _publish("deleted", instance)
+    else:
+        _publish("created" if created else "updated", instance)
+
+
+@receiver(post_delete, sender=Post)
+def publish_deleted_post(sender, instance, **kwargs):
+    """
+    Tell live listeners about a live post being deleted outright.
+
+    :param instance: The deleted Post.
+    """
+    if instance.deleted_at is None:
+        _publish("deleted", instance)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    """
+    Update author counts when a live post is deleted. Purging a post that
+    was already soft-deleted changes nothing.
+
+    :param instance: The deleted Post.
+    """
+    if instance.author_id is not None and instance.deleted_at is None:
+        _remove_post(instance.author_id)
+    _invalidate_detail_on_commit(instance.pk)
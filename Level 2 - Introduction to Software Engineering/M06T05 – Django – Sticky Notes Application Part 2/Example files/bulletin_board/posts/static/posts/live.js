@@ -0,0 +1,65 @@
+// posts/static/posts/live.js
+// Keeps the post list up to date from the server-sent events stream.
+// New posts are added to the top of the first page only; edits and deletes
+// are applied to whichever posts are on the current page.
+(function () {
+  var list = document.getElementById("post-list");
+  if (!list || !window.EventSource) {
+    return;
+  }
+  var detailUrl = list.dataset.detailUrl;
+  var source = new EventSource(list.dataset.eventsUrl);
+
+  function findItem(id) {
+    return list.querySelector('li[data-post-id="' + id + '"]');
+  }
+
+  function fillItem(item, post) {
+    item.textContent = "";
+    var link = document.createElement("a");
+    link.href = detailUrl.replace("/0/", "/" + post.id + "/");
+    link.textContent = post.title;
+    item.appendChild(link);
+    if (post.author) {
+      var author = document.createElement("small");
+      author.textContent = " by " + post.author;
+      item.appendChild(author);
+    }
+    var excerpt = document.createElement("p");
+    excerpt.textContent = post.excerpt;
+    item.appendChild(excerpt);
+  }
+
+  source.addEventListener("created", function (event) {
+    if (list.dataset.live !== "new") {
+      return;
+    }
+    var post = JSON.parse(event.data);
+    var item = document.createElement("li");
+    item.dataset.postId = post.id;
+    fillItem(item, post);
+    var first = list.querySelector("li");
+    list.insertBefore(item, first);
+  });
+
+  source.addEventListener("updated", function (event) {
+    var post = JSON.parse(event.data);
+    var item = findItem(post.id);
+    if (item) {
+      fillItem(item, post);
+    }
+  });
+
+  source.addEventListener("deleted", function (event) {
+    var item = findItem(JSON.parse(event.data).id);
+    if (item) {
+      item.remove();
+    }
+  });
+
+  // The server dropped us for falling behind: reload to catch up
+  source.addEventListener("reset", function () {
+    source.close();
+    window.location.reload();
+  });
+})();
@@ -0,0 +1,203 @@
+# posts/tags.py
+"""
+Tagging for posts: parsing tag input, changing a post's tags, filtering
+posts by several tags and counting the tags of the posts that match.
+
+Tag.post_count holds the number of live posts with each tag. It is
+recounted for just the affected tags whenever a post gains or loses tags,
+and changed with a single F() update when a post is deleted (see
+posts/signals.py), so the unfiltered tag cloud is one index scan. Facet counts for a filtered page come from one aggregate query and
+are cached under a generation number that any tag change bumps.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef
+from django.utils.text import slugify
+
+from .cache import invalidate_detail
+from .models import Post, PostTag, Tag, refresh_tag_counts
+
+# Most tags a single post can have
+MAX_TAGS_PER_POST = 10
+
+# Number of tags offered as facets on a tag page
+FACET_LIMIT = 20
+
+# Seconds that facet counts for a filtered page are cached
+FACET_CACHE_SECONDS = 5 * 60
+
+_GENERATION_KEY = "tag-facets:generation"
+
+
+def parse_tags(text):
+    """
+    Turn comma-separated tag input into normalised tag names.
+
+    :param text: Text such as "Lost property, Kitchen".
+    :return: List of unique slugs in the order given, e.g. ["lost-property", "kitchen"].
+    """
+    names = (slugify(part)[:Tag._meta.get_field("name").max_length] for part in text.split(","))
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def _count_tags(tags, delta):
+    """
+    Add delta to the post count of some tags.
+
+    :param tags: Queryset of the tags to change.
+    :param delta: 1 or -1.
+    :return: Number of tags changed.
+    """
+    if delta < 0:
+        tags = tags.filter(post_count__gt=0)
+    return tags.update(post_count=F("post_count") + delta)
+
+
+def set_post_tags(post, names, current=None):
+    """
+    Replace the tags of a saved post, creating tags that don't exist yet.
+
+    Only the difference is written: new links are inserted in one query,
+    dropped links deleted in one query and the counts of the affected tags
+    recomputed with one UPDATE. Two requests adding the same tag at once
+    both skip the link the other inserted, and the recount is right
+    whichever of them inserted it.
+
+    :param post: The Post.
+    :param names: Tag names as returned by parse_tags.
+    :param current: Names of the post's tags now, if the caller already has
+        them; read from the database otherwise.
+    :return: True if the tags changed.
+    """
+    if current is None:
+        current = list(post.tags.values_list("name", flat=True))
+    added = [name for name in names if name not in current]
+    removed = [name for name in current if name not in names]
+    if not added and not removed:
+        return False
+
+    with transaction.atomic():
+        if added:
+            Tag.objects.bulk_create([Tag(name=name) for name in added], ignore_conflicts=True)
+            tag_ids = list(Tag.objects.filter(name__in=added).values_list("id", flat=True))
+            PostTag.objects.bulk_create(
+                [PostTag(post=post, tag_id=tag_id) for tag_id in tag_ids], ignore_conflicts=True,
+            )
+        if removed:
+            PostTag.objects.filter(post=post, tag__name__in=removed).delete()
+        if post.deleted_at is None:
+            # Recount rather than add or subtract one: a concurrent request may
+            # already have added or removed some of these links
+            refresh_tag_counts(Tag.objects.filter(name__in=added + removed).values("pk"))
+    invalidate_tag_facets()
+    # Only once the new tags are visible, or a concurrent request could cache the old page
+    transaction.on_commit(lambda: invalidate_detail(post.pk))
+    return True
+
+
+def uncount_post_tags(post_id):
+    """
+    Stop counting a post towards its tags, when it is deleted or soft-deleted.
+
+    :param post_id: Primary key of the post.
+    """
+    tag_ids = PostTag.objects.filter(post_id=post_id).values("tag_id")
+    if _count_tags(Tag.objects.filter(pk__in=tag_ids), -1):
+        invalidate_tag_facets()
+
+
+def find_tags(names):
+    """
+    Look up tags by name, rarest first.
+
+    :param names: Tag names.
+    :return: List of Tags; shorter than names if some don't exist.
+    """
+    return list(Tag.objects.filter(name__in=names).order_by("post_count", "name"))
+
+
+def posts_with_tags(tags):
+    """
+    Live posts that have every one of the given tags.
+
+    The rarest tag's links are read from the (tag, post) index, and each
+    of those posts is checked for the other tags with a probe of the
+    (post, tag) index, so the work grows with the rarest tag rather than
+    with the most common one.
+
+    :param tags: Non-empty list of Tags, rarest first (see find_tags).
+    :return: Queryset of Posts.
+    """
+    rarest, *others = tags
+    posts = Post.objects.filter(pk__in=PostTag.objects.filter(tag=rarest).values("post"))
+    for tag in others:
+        posts = posts.filter(Exists(PostTag.objects.filter(post=OuterRef("pk"), tag=tag)))
+    return posts
+
+
+def tag_cache():
+    """
+    The cache used for facet counts, or None if caching is turned off.
+
+    :return: Cache backend named by POSTS_TAG_CACHE, or None.
+    """
+    alias = getattr(settings, "POSTS_TAG_CACHE", None)
+    return caches[alias] if alias else None
+
+
+def invalidate_tag_facets():
+    """
+    Make every cached facet count stale by bumping the generation.
+    """
+    cache = tag_cache()
+    if cache is None:
+        return
+    try:
+        cache.incr(_GENERATION_KEY)
+    except ValueError:
+        cache.set(_GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def tag_facets(tags, limit=FACET_LIMIT):
+    """
+    The most used tags among the posts that have all the given tags.
+
+    With no tags this reads the stored counts; otherwise the counts come
+    from one grouped query over the matching posts, cached until any
+    post's tags change.
+
+    :param tags: List of Tags from find_tags (may be empty).
+    :param limit: Most facets to return.
+    :return: List of (tag name, number of posts) pairs, most used first.
+    """
+    if not tags:
+        facets = Tag.objects.filter(post_count__gt=0).order_by("-post_count", "name")
+        return list(facets.values_list("name", "post_count")[:limit])
+
+    cache = tag_cache()
+    key = None
+    if cache is not None:
+        generation = cache.get(_GENERATION_KEY)
+        if generation is None:
+            cache.add(_GENERATION_KEY, time.time_ns(), timeout=None)
+            generation = cache.get(_GENERATION_KEY)
+        ids = ",".join(str(tag.pk) for tag in sorted(tags, key=lambda tag: tag.pk))
+        key = f"tag-facets:{generation}:{limit}:{ids}"
+        facets = cache.get(key)
+        if facets is not None:
+            return facets
+
+    facets = list(
+        PostTag.objects.filter(post__in=posts_with_tags(tags).values("pk"))
+        .exclude(tag__in=tags)
+        .values("tag__name")
+        .annotate(n=Count("post"))
+        .order_by("-n", "tag__name")
+        .values_list("tag__name", "n")[:limit]
+    )
+    if key is not None:
+        cache.set(key, facets, FACET_CACHE_SECONDS)
+    return facets
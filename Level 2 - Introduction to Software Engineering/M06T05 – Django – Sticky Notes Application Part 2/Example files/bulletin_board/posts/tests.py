@@ -1,31 +1,85 @@
 # posts/tests.py
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import os
+import statistics
+import sqlite3
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings, tag
 from django.urls import reverse
-from .models import Post, Author
+from django.utils import timezone
+from bulletin_board.backup import BackupError, backup_database, restore_database
+from bulletin_board.sqlite import pragma_statements, sqlite_options
+from bulletin_board.staticfiles import StaticFilesMiddleware, compress_file
+from .cache import detail_cache, stats as detail_cache_stats
+from .events import RESET_MESSAGE, EventHub, hub
+from .factories import make_author, make_post, make_posts, tag_posts
+from .markup import render_markdown
+from .models import Post, Author, PostRevision, Tag, refresh_author_stats
+from .revisions import SNAPSHOT_INTERVAL, apply_delta, get_revision, make_delta
+from .search import search_posts
+from .tags import set_post_tags, tag_cache
+
+# The manifest storage needs `build_static` to have run; templates rendered by
+# the tests only need plain, unhashed static URLs
+_plain_static_storage = override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+
+# Keep the pages rendered by the tests out of the real post_detail cache folder
+_detail_cache_folder = tempfile.TemporaryDirectory()
+_test_detail_cache = override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'post_detail': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': _detail_cache_folder.name,
+    },
+})
+
+
+def setUpModule():
+    _plain_static_storage.enable()
+    _test_detail_cache.enable()
+
+
+def tearDownModule():
+    _test_detail_cache.disable()
+    _plain_static_storage.disable()
+    _detail_cache_folder.cleanup()
+
 
 class PostModelTest(TestCase):
-    def setUp(self):
-        # Create an Author object
-        author = Author.objects.create(name='Test Author')
-        # Create a Post object for testing
-        Post.objects.create(title='Test Post', content='This is a test post.', author=author)
+    @classmethod
+    def setUpTestData(cls):
+        # Create an Author and a Post once for the whole class
+        cls.author = make_author('Test Author')
+        cls.post = make_post(title='Test Post', content='This is a test post.', author=cls.author)
 
     def test_post_has_title(self):
         # Test that a Post object has the expected title
-        post = Post.objects.get(id=1)
+        post = Post.objects.get(pk=self.post.pk)
         self.assertEqual(post.title, 'Test Post')
 
     def test_post_has_content(self):
         # Test that a Post object has the expected content
-        post = Post.objects.get(id=1)
+        post = Post.objects.get(pk=self.post.pk)
         self.assertEqual(post.content, 'This is a test post.')
 
 class PostViewTest(TestCase):
-    def setUp(self):
-        # Create an Author object
-        author = Author.objects.create(name='Test Author')
-        # Create a Post object for testing views
-        Post.objects.create(title='Test Post', content='This is a test post.', author=author)
+    @classmethod
+    def setUpTestData(cls):
+        # Create an Author and a Post once for the whole class
+        cls.author = make_author('Test Author')
+        cls.post = make_post(title='Test Post', content='This is a test post.', author=cls.author)
 
     def test_post_list_view(self):
         # Test the post-list view
@@ -33,10 +87,833 @@ class PostViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'Test Post')
 
+    def test_post_list_query_count_is_constant(self):
+        # The list page should cost the same number of queries for 1 post or 50
+        with self.assertNumQueries(2):
+            self.client.get(reverse('post_list'))
+
+        make_posts(50, authors=[self.author])
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('post_list'))
+        self.assertContains(response, 'by Test Author')
+        self.assertContains(response, 'Older posts')
+
+    def test_post_list_shows_excerpt(self):
+        # Long content is cut down to the stored excerpt
+        make_post(title='Long Post', content='word ' * 200)
+        response = self.client.get(reverse('post_list'))
+        self.assertContains(response, '…')
+        self.assertNotContains(response, 'word ' * 100)
+
     def test_post_detail_view(self):
         # Test the post-detail view
-        post = Post.objects.get(id=1)
-        response = self.client.get(reverse('post_detail', args=[str(post.id)]))
+        response = self.client.get(reverse('post_detail', args=[str(self.post.pk)]))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'Test Post')
         self.assertContains(response, 'This is a test post.')
+
+
+class PostDetailCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.post = make_post(title='Cached Post', content='First version.')
+        cls.url = reverse('post_detail', args=[cls.post.pk])
+
+    def setUp(self):
+        # The post is shared by every test, but cached pages are not rolled back with the database
+        detail_cache().clear()
+        self.addCleanup(detail_cache().clear)
+        detail_cache_stats.reset()
+
+    def test_second_view_is_served_from_cache(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'First version.')
+        self.assertEqual(detail_cache_stats.as_dict()['hits'], 1)
+
+    def test_update_and_delete_invalidate_the_page(self):
+        self.client.get(self.url)
+        # Pages are only invalidated once the change is committed
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('post_update', args=[self.post.pk]),
+                             {'title': 'Cached Post', 'content': 'Second version.'})
+        self.assertContains(self.client.get(self.url), 'Second version.')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_page_is_invalidated_only_after_commit(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.content = 'Second version.'
+            self.post.save()
+            # Until the transaction commits, readers keep getting the page for the committed post
+            self.assertContains(self.client.get(self.url), 'First version.')
+        self.assertContains(self.client.get(self.url), 'Second version.')
+
+    def test_stats_view(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        response = self.client.get(reverse('post_cache_stats'))
+        self.assertEqual(response.json(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+
+class PostFeedTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_posts(25, authors=[make_author()])
+
+    def test_pages_cover_every_post_once(self):
+        # Follow the "next" cursor until the feed runs out
+        seen = []
+        url = reverse('post_feed') + '?limit=10'
+        while url:
+            data = self.client.get(url).json()
+            seen.extend(post['id'] for post in data['posts'])
+            url = data['next'] and reverse('post_feed') + f"?limit=10&after={data['next']}"
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(seen, list(Post.objects.order_by('-created_at', '-id').values_list('id', flat=True)))
+
+    def test_unchanged_feed_returns_304(self):
+        response = self.client.get(reverse('post_feed'))
+        etag = response['ETag']
+        self.assertEqual(self.client.get(reverse('post_feed'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Editing a post changes the ETag
+        post = Post.objects.first()
+        post.title = 'Edited'
+        post.save()
+        self.assertEqual(self.client.get(reverse('post_feed'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_bad_cursor_is_rejected(self):
+        response = self.client.get(reverse('post_feed') + '?after=yesterday')
+        self.assertEqual(response.status_code, 400)
+
+
+class PostSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.post = make_post(title='Printer broken', content='The <b>printer</b> on floor two is jammed.')
+        make_post(title='Lunch', content='Pizza in the kitchen at noon.')
+
+    def test_search_ranks_and_highlights(self):
+        results = search_posts('printer')
+        self.assertEqual([r['id'] for r in results], [self.post.id])
+        self.assertEqual(results[0]['title'], '<mark>Printer</mark> broken')
+        # User content is escaped before the <mark> tags are added
+        self.assertIn('&lt;b&gt;<mark>printer</mark>&lt;/b&gt;', results[0]['snippet'])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.post.content = 'Fixed now.'
+        self.post.title = 'Fixed'
+        self.post.save()
+        self.assertEqual(search_posts('printer'), [])
+        self.assertEqual(len(search_posts('fixed')), 1)
+        self.post.soft_delete()
+        self.assertEqual(search_posts('fixed'), [])
+        self.post.delete()
+        self.assertEqual(search_posts('fixed'), [])
+
+    def test_search_syntax_is_treated_as_text(self):
+        self.assertEqual(search_posts('"printer OR -lunch:'), [])
+
+    def test_search_view(self):
+        response = self.client.get(reverse('post_search'), {'q': 'pizza'})
+        self.assertContains(response, '<mark>Pizza</mark>')
+
+
+class ImportExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        alice = make_author('Alice')
+        for i in range(5):
+            make_post(title=f'Post {i}', content=f'Content, with "quotes" {i}', author=alice if i % 2 else None)
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+
+    def round_trip(self, filename):
+        # Export everything, wipe the tables, then import the file again
+        path = self.dir / filename
+        call_command('export_posts', str(path), stdout=StringIO())
+        before = list(Post.objects.order_by('id').values_list('title', 'content', 'author__name', 'created_at'))
+        Post.objects.all().delete()
+        Author.objects.all().delete()
+
+        out = StringIO()
+        call_command('import_posts', str(path), chunk_size=2, stdout=out)
+        after = list(Post.objects.order_by('id').values_list('title', 'content', 'author__name', 'created_at'))
+        self.assertEqual(after, before)
+        self.assertIn('Imported 5 posts', out.getvalue())
+
+    def test_jsonl_round_trip(self):
+        self.round_trip('posts.jsonl')
+
+    def test_csv_round_trip(self):
+        self.round_trip('posts.csv')
+
+    def test_authors_are_resolved_once(self):
+        # Existing authors are reused and each new name is created only once
+        path = self.dir / 'new.jsonl'
+        path.write_text(
+            '{"title": "A", "content": "a", "author": "Alice"}\n'
+            '{"title": "B", "content": "b", "author": "Bob"}\n'
+            '{"title": "C", "content": "c", "author": "Bob"}\n'
+        )
+        call_command('import_posts', str(path), stdout=StringIO())
+        self.assertEqual(sorted(Author.objects.values_list('name', flat=True)), ['Alice', 'Bob'])
+        self.assertEqual(Post.objects.get(title='C').excerpt, 'c')
+
+    def test_records_without_a_title_are_skipped(self):
+        path = self.dir / 'partial.csv'
+        path.write_text('content,author\nNo title here,Alice\n')
+        err = StringIO()
+        call_command('import_posts', str(path), stdout=StringIO(), stderr=err)
+        self.assertIn('Skipping record 1: it has no title', err.getvalue())
+        self.assertEqual(Post.objects.count(), 5)
+
+    def test_author_stats_are_added_per_chunk(self):
+        alice = Author.objects.get(name='Alice')
+        path = self.dir / 'more.jsonl'
+        path.write_text(''.join(
+            f'{{"title": "New {i}", "content": "c", "author": "Alice", "created_at": "2031-01-0{i + 1}T00:00:00+00:00"}}\n'
+            for i in range(3)
+        ) + '{"title": "Old", "content": "c", "author": "Alice", "created_at": "2001-01-01T00:00:00+00:00"}\n')
+        call_command('import_posts', str(path), chunk_size=2, stdout=StringIO())
+        alice.refresh_from_db()
+        self.assertEqual(alice.post_count, 2 + 4)
+        self.assertEqual(alice.last_posted_at.isoformat(), '2031-01-03T00:00:00+00:00')
+
+
+    def test_dates_with_and_without_an_offset_can_be_mixed(self):
+        alice = Author.objects.get(name='Alice')
+        path = self.dir / 'mixed.jsonl'
+        path.write_text(
+            '{"title": "Naive", "content": "c", "author": "Alice", "created_at": "2031-01-02T12:00:00"}\n'
+            '{"title": "Aware", "content": "c", "author": "Alice", "created_at": "2031-01-01T12:00:00+02:00"}\n'
+        )
+        call_command('import_posts', str(path), stdout=StringIO())
+        self.assertEqual(Post.objects.get(title='Naive').created_at.isoformat(), '2031-01-02T12:00:00+00:00')
+        alice.refresh_from_db()
+        self.assertEqual(alice.last_posted_at.isoformat(), '2031-01-02T12:00:00+00:00')
+
+class AuthorStatsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = make_author('Alice')
+        cls.bob = make_author('Bob')
+
+    def assertStats(self, author, count):
+        # Compare the stored columns with a fresh count from the posts table
+        author.refresh_from_db()
+        newest = Post.objects.filter(author=author).order_by('-created_at').first()
+        self.assertEqual(author.post_count, count)
+        self.assertEqual(author.last_posted_at, newest.created_at if newest else None)
+
+    def test_counts_follow_create_move_and_delete(self):
+        first = make_post(author=self.alice)
+        second = make_post(author=self.alice)
+        self.assertStats(self.alice, 2)
+
+        # Moving a post loaded with a deferred author still updates both authors
+        moved = Post.objects.only('id', 'title').get(pk=second.pk)
+        moved.author = self.bob
+        moved.save()
+        self.assertStats(self.alice, 1)
+        self.assertStats(self.bob, 1)
+
+        first.delete()
+        self.assertStats(self.alice, 0)
+
+    def test_refresh_repairs_bulk_changes(self):
+        Post.objects.bulk_create([Post(title=str(i), content='x', author=self.bob) for i in range(3)])
+        refresh_author_stats([self.alice.pk, self.bob.pk])
+        self.assertStats(self.alice, 0)
+        self.assertStats(self.bob, 3)
+
+    def test_author_list_counts(self):
+        make_post(author=self.alice)
+        for denormalized in (False, True):
+            with self.subTest(denormalized=denormalized), \
+                    override_settings(POSTS_DENORMALIZED_AUTHOR_COUNTS=denormalized):
+                with self.assertNumQueries(2):
+                    response = self.client.get(reverse('author_list'))
+                self.assertContains(response, '1 post,')
+                self.assertContains(response, '0 posts')
+
+
+class SoftDeleteTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = make_author()
+        cls.post = make_post(title='Old news', content='Gone soon.', author=cls.author)
+
+    def test_get_asks_and_post_soft_deletes(self):
+        url = reverse('post_delete', args=[self.post.pk])
+        self.assertContains(self.client.get(url), 'Are you sure')
+        self.assertTrue(Post.objects.filter(pk=self.post.pk).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url)
+        self.assertFalse(Post.objects.filter(pk=self.post.pk).exists())
+        self.assertTrue(Post.all_objects.filter(pk=self.post.pk).exists())
+        self.assertNotContains(self.client.get(reverse('post_list')), 'Old news')
+        self.assertEqual(self.client.get(reverse('post_detail', args=[self.post.pk])).status_code, 404)
+
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.post_count, 0)
+        self.assertIsNone(self.author.last_posted_at)
+
+    def test_purge_respects_age_and_batches(self):
+        Post.objects.bulk_create([Post(title=str(i), content='x') for i in range(5)])
+        Post.objects.update(deleted_at=timezone.now() - timedelta(days=40))
+        fresh = make_post(title='Fresh')
+        fresh.soft_delete()
+
+        out = StringIO()
+        call_command('purge_deleted_posts', older_than_days=30, batch_size=2, stdout=out)
+        self.assertIn('Purged 6 posts in 3 batches', out.getvalue())
+        self.assertEqual(list(Post.all_objects.values_list('title', flat=True)), ['Fresh'])
+
+    def test_purge_author_in_batches(self):
+        Post.objects.bulk_create([Post(title=str(i), content='x', author=self.author) for i in range(4)])
+        out = StringIO()
+        call_command('purge_deleted_posts', author=self.author.pk, batch_size=2, stdout=out)
+        self.assertIn('Purged 5 posts in 3 batches', out.getvalue())
+        self.assertFalse(Author.objects.filter(pk=self.author.pk).exists())
+        self.assertFalse(Post.all_objects.exists())
+
+    def test_purge_author_hides_posts_and_their_cached_pages(self):
+        # Stopping after one batch leaves some posts soft-deleted; they must already be hidden everywhere
+        other = make_post(author=self.author)
+        urls = [reverse('post_detail', args=[pk]) for pk in (self.post.pk, other.pk)]
+        detail_cache().clear()
+        self.addCleanup(detail_cache().clear)
+        for url in urls:
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        call_command('purge_deleted_posts', author=self.author.pk, batch_size=1, max_batches=1, stdout=StringIO())
+
+        for url in urls:
+            self.assertEqual(self.client.get(url).status_code, 404)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.post_count, 0)
+        self.assertIsNone(self.author.last_posted_at)
+        self.assertEqual(Post.all_objects.count(), 1)
+        self.assertFalse(Post.objects.exists())
+
+
+class RevisionTest(TestCase):
+    def test_delta_round_trip(self):
+        old = '  Meet in the kitchen at noon.\nBring cups. '
+        new = 'Meet in the big kitchen at one.\nBring cups. '
+        delta = make_delta(old, new)
+        self.assertEqual(apply_delta(old, delta), new)
+        self.assertLess(len(str(delta)), len(new))
+
+    def test_every_revision_can_be_rebuilt(self):
+        # Long enough that the snapshot interval, not the size rule, decides
+        post = make_post(title='Note', content=' '.join(f'filler{i}' for i in range(500)))
+        versions = [(post.title, post.content)]
+        for i in range(SNAPSHOT_INTERVAL + 5):
+            post.content = f'{post.content} word{i}'
+            if i == 3:
+                post.title = 'Renamed note'
+            post.save()
+            versions.append((post.title, post.content))
+
+        # Edits that leave the text alone do not add revisions
+        post.save()
+        post.soft_delete()
+        self.assertEqual(PostRevision.objects.filter(post=post).count(), len(versions))
+
+        for number, (title, content) in enumerate(versions, start=1):
+            revision = get_revision(post.pk, number)
+            self.assertEqual((revision['title'], revision['content']), (title, content))
+        bases = set(PostRevision.objects.filter(post=post).values_list('base', flat=True))
+        self.assertEqual(bases, {1, SNAPSHOT_INTERVAL + 1})
+        with self.assertNumQueries(2):
+            get_revision(post.pk, len(versions))
+
+    def test_new_posts_have_no_revisions_until_edited(self):
+        post = make_post(title='Note', content='first')
+        self.assertFalse(PostRevision.objects.filter(post=post).exists())
+        self.assertContains(self.client.get(reverse('post_history', args=[post.pk])), 'No revisions yet.')
+
+    def test_bulk_created_post_gets_history_on_first_edit(self):
+        post = Post.objects.bulk_create([Post(title='Imported', content='old text')])[0]
+        post = Post.objects.get(pk=post.pk)
+        post.content = 'new text'
+        post.save()
+        self.assertEqual(get_revision(post.pk, 1)['content'], 'old text')
+        self.assertEqual(get_revision(post.pk, 2)['content'], 'new text')
+
+    def test_history_views(self):
+        post = make_post(title='Note', content='first')
+        self.client.post(reverse('post_update', args=[post.pk]), {'title': 'Note', 'content': 'second'})
+        response = self.client.get(reverse('post_history', args=[post.pk]))
+        self.assertContains(response, 'Revision 2')
+        self.assertContains(response, 'Revision 1')
+        response = self.client.get(reverse('post_revision', args=[post.pk, 1]))
+        self.assertContains(response, 'first')
+        self.assertEqual(self.client.get(reverse('post_revision', args=[post.pk, 9])).status_code, 404)
+
+
+class LiveEventsTest(TestCase):
+    def test_saves_are_published_after_commit(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+
+        async def subscribe():
+            return hub.subscribe()
+
+        subscription = loop.run_until_complete(subscribe())
+        self.addCleanup(hub.unsubscribe, subscription)
+        with self.captureOnCommitCallbacks(execute=True):
+            post = make_post(title='Live', content='Hello')
+        with self.captureOnCommitCallbacks(execute=True):
+            post.soft_delete()
+
+        message = loop.run_until_complete(subscription.get(timeout=1))
+        self.assertIn(b'event: created\ndata: {"id":%d,"title":"Live"' % post.pk, message)
+        self.assertIn(b'event: deleted\ndata: {"id":%d}' % post.pk, message)
+
+    def test_slow_listener_is_reset(self):
+        small_hub = EventHub(queue_size=2)
+
+        async def listen():
+            subscription = small_hub.subscribe()
+            for i in range(3):
+                small_hub.publish('created', {'id': i})
+            await asyncio.sleep(0)
+            return await subscription.get(timeout=1)
+
+        self.assertIs(asyncio.run(listen()), RESET_MESSAGE)
+        self.assertEqual(small_hub.subscriber_count(), 0)
+
+    async def test_stream_view(self):
+        response = await self.async_client.get(reverse('post_events'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b'retry: 3000\n\n')
+        hub.publish('updated', {'id': 7})
+        self.assertIn(b'event: updated\ndata: {"id":7}', await anext(chunks))
+        await chunks.aclose()
+
+    def test_stream_is_refused_under_wsgi(self):
+        self.assertEqual(self.client.get(reverse('post_events')).status_code, 204)
+        self.assertNotContains(self.client.get(reverse('post_list')), 'live.js')
+        with override_settings(POSTS_LIVE_UPDATES=True):
+            self.assertContains(self.client.get(reverse('post_list')), 'posts/live.js')
+
+
+class MarkdownTest(TestCase):
+    def test_render_formats_and_sanitises(self):
+        html = render_markdown('# Notice\n\nBring **cake** and `<code>`.\n\n- [menu](https://example.com/?a=1&b=2)\n- [x](javascript:alert(1))')
+        self.assertIn('<h1>Notice</h1>', html)
+        self.assertIn('<strong>cake</strong> and <code>&lt;code&gt;</code>', html)
+        self.assertIn('<a href="https://example.com/?a=1&amp;b=2" rel="nofollow noopener">menu</a>', html)
+        self.assertNotIn('href="javascript', html)
+        self.assertEqual(render_markdown('<script>alert(1)</script>'), '<p>&lt;script&gt;alert(1)&lt;/script&gt;</p>')
+
+    @mock.patch('posts.markup.markdown', None)
+    def test_builtin_renderer_leaves_identifiers_and_drops_images(self):
+        html = render_markdown('Override __init__ in my_module, not __this one__.\n\nSee ![the map](https://example.com/map.png).')
+        self.assertIn('Override __init__ in my_module, not <strong>this one</strong>.', html)
+        self.assertIn('<p>See the map.</p>', html)
+
+    def test_html_is_rendered_only_when_content_changes(self):
+        post = make_post(content='Hello *world*')
+        self.assertEqual(post.content_html, '<p>Hello <em>world</em></p>')
+        Post.objects.filter(pk=post.pk).update(content_html='stored')
+
+        post = Post.objects.get(pk=post.pk)
+        post.title = 'Renamed'
+        post.save()
+        post.soft_delete()
+        self.assertEqual(Post.all_objects.get(pk=post.pk).content_html, 'stored')
+
+        post.content = 'Hello **again**'
+        post.save(update_fields=['content'])
+        self.assertEqual(Post.all_objects.get(pk=post.pk).content_html, '<p>Hello <strong>again</strong></p>')
+
+    def test_refreshed_post_renders_from_what_it_loaded(self):
+        post = make_post(content='One')
+        Post.objects.filter(pk=post.pk).update(content='Two', content_html='<p>Two</p>')
+        post.refresh_from_db()
+        post.content = 'One'
+        post.save()
+        self.assertEqual(Post.objects.get(pk=post.pk).content_html, '<p>One</p>')
+
+        # Reading a deferred content field counts as loading it, so saving it unchanged renders nothing
+        post = Post.objects.defer('content').get(pk=post.pk)
+        self.assertEqual(post.content, 'One')
+        with mock.patch('posts.models.render_markdown') as render:
+            post.save()
+        render.assert_not_called()
+
+    def test_detail_shows_stored_html(self):
+        post = make_post(content='Line one\nline **two**')
+        response = self.client.get(reverse('post_detail', args=[post.pk]))
+        self.assertContains(response, 'Line one<br>\nline <strong>two</strong>')
+
+
+class TagTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = make_author()
+        cls.both = make_post(title='Lost keys in the kitchen', author=cls.author)
+        cls.kitchen = make_post(title='Kitchen rota', author=cls.author)
+        cls.lost = make_post(title='Lost umbrella', author=cls.author)
+        set_post_tags(cls.both, ['kitchen', 'lost-property', 'keys'])
+        set_post_tags(cls.kitchen, ['kitchen'])
+        set_post_tags(cls.lost, ['lost-property', 'umbrella'])
+
+    def setUp(self):
+        tag_cache().clear()
+
+    def counts(self):
+        return dict(Tag.objects.values_list('name', 'post_count'))
+
+    def test_form_normalises_and_counts_tags(self):
+        self.client.post(reverse('post_create'), {
+            'title': 'Fridge', 'content': 'Clear it out.', 'tags': 'Kitchen, Fridge Day, kitchen,',
+        })
+        post = Post.objects.get(title='Fridge')
+        self.assertEqual(sorted(post.tags.values_list('name', flat=True)), ['fridge-day', 'kitchen'])
+        self.assertEqual(self.counts()['kitchen'], 3)
+
+        self.client.post(reverse('post_update', args=[post.pk]),
+                         {'title': 'Fridge', 'content': 'Clear it out.', 'tags': 'fridge-day, cleaning'})
+        counts = self.counts()
+        self.assertEqual((counts['kitchen'], counts['cleaning'], counts['fridge-day']), (2, 1, 1))
+        self.assertContains(self.client.get(reverse('post_detail', args=[post.pk])), '>cleaning</a>')
+
+    def test_too_many_tags_are_rejected(self):
+        tags = ', '.join(f'tag{i}' for i in range(11))
+        response = self.client.post(reverse('post_create'), {'title': 'Spam', 'content': 'x', 'tags': tags})
+        self.assertContains(response, 'at most 10 tags')
+
+    def test_requests_racing_on_the_same_tag_count_it_once(self):
+        # Both requests read the post's tags before either saved, so both add and then both remove 'umbrella'
+        for _ in range(2):
+            set_post_tags(self.kitchen, ['kitchen', 'umbrella'], current=['kitchen'])
+        self.assertEqual(self.counts()['umbrella'], 2)
+        for _ in range(2):
+            set_post_tags(self.kitchen, ['kitchen'], current=['kitchen', 'umbrella'])
+        self.assertEqual(self.counts()['umbrella'], 1)
+
+    def test_deletes_uncount_tags_once(self):
+        self.both.soft_delete()
+        self.assertEqual(self.counts(), {'kitchen': 1, 'lost-property': 1, 'keys': 0, 'umbrella': 1})
+        call_command('purge_deleted_posts', stdout=StringIO())
+        self.kitchen.delete()
+        self.assertEqual(self.counts(), {'kitchen': 0, 'lost-property': 1, 'keys': 0, 'umbrella': 1})
+
+    def test_filter_intersects_tags(self):
+        url = reverse('tagged_posts')
+        response = self.client.get(url, {'tag': ['kitchen', 'lost-property']})
+        self.assertEqual([post.pk for post in response.context['posts']], [self.both.pk])
+        self.assertEqual(response.context['facets'], [('keys', 1)])
+
+        response = self.client.get(url, {'tag': ['kitchen', 'no-such-tag']})
+        self.assertEqual(list(response.context['posts']), [])
+
+        response = self.client.get(url)
+        self.assertEqual(response.context['facets'][:2], [('kitchen', 2), ('lost-property', 2)])
+
+    def test_facets_are_cached_until_tags_change(self):
+        url = reverse('tagged_posts')
+        self.client.get(url, {'tag': 'kitchen'})
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'tag': 'kitchen'})
+        self.assertEqual(response.context['facets'], [('keys', 1), ('lost-property', 1)])
+
+        set_post_tags(self.kitchen, ['kitchen', 'keys'])
+        response = self.client.get(url, {'tag': 'kitchen'})
+        self.assertEqual(response.context['facets'], [('keys', 2), ('lost-property', 1)])
+
+
+# Query and wall-clock budgets per view scenario. Query counts are exact;
+# milliseconds are a ceiling for the median request on a slow CI machine.
+PERF_BUDGETS = {
+    'post_list': {'queries': 2, 'ms': 150},
+    'post_list_deep_page': {'queries': 2, 'ms': 150},
+    'post_detail_uncached': {'queries': 2, 'ms': 100},
+    'post_detail_cached': {'queries': 0, 'ms': 50},
+    'post_create': {'queries': 4, 'ms': 150},
+    'post_update_form': {'queries': 3, 'ms': 100},
+    'post_update': {'queries': 10, 'ms': 150},
+    'tagged_posts': {'queries': 4, 'ms': 150},
+}
+
+# Recorded timings that later runs are compared with
+PERF_BASELINE = Path(__file__).resolve().parent / 'perf_baseline.json'
+
+# Slowdowns smaller than this are never reported as regressions
+PERF_MIN_REGRESSION_MS = 5
+
+# Wall-clock checks depend on the machine, so they only run when asked for
+PERF_TIMINGS = bool(os.environ.get('POSTS_PERF_TIMINGS') or os.environ.get('POSTS_PERF_OUTPUT'))
+
+
+@tag('performance')
+class ViewPerformanceTest(TestCase):
+    """
+    Query-count and latency budgets for the main views on a seeded board.
+
+    The query counts are always checked. Timings are only measured when
+    POSTS_PERF_TIMINGS is set, so a slow or busy machine can't fail the
+    normal test run:
+
+        POSTS_PERF_TIMINGS=1 python manage.py test --tag performance
+
+    Each scenario's median time is then held to its budget and compared with
+    perf_baseline.json, failing if it is more than POSTS_PERF_TOLERANCE times
+    slower (default 3) and at least PERF_MIN_REGRESSION_MS slower.
+    Set POSTS_PERF_OUTPUT to a path to also write this run's numbers as JSON,
+    for example to refresh the baseline:
+
+        POSTS_PERF_OUTPUT=posts/perf_baseline.json python manage.py test --tag performance
+
+    Skip these tests with --exclude-tag performance.
+    """
+
+    POSTS = 3000
+    RUNS = 15
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [make_author() for _ in range(20)]
+        posts = make_posts(cls.POSTS, authors=cls.authors)
+        cls.post = posts[0]
+        cls.tags = tag_posts(posts, [f'topic-{i}' for i in range(50)])
+        # Give the post some history, as a long-lived post would have
+        cls.post.content += ' Edited.'
+        cls.post.save()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.results = {}
+        cls.baseline = json.loads(PERF_BASELINE.read_text()) if PERF_BASELINE.exists() else {}
+
+    @classmethod
+    def tearDownClass(cls):
+        output = os.environ.get('POSTS_PERF_OUTPUT')
+        if output and cls.results:
+            Path(output).write_text(json.dumps(cls.results, indent=2, sort_keys=True) + '\n')
+        super().tearDownClass()
+
+    def measure(self, name, request, prepare=None):
+        """
+        Check a scenario's query budget, then time it and compare with the budget and baseline.
+
+        :param name: Scenario name, a key of PERF_BUDGETS.
+        :param request: Callable making the request; returns the response.
+        :param prepare: Optional callable run before every request, untimed.
+        """
+        budget = PERF_BUDGETS[name]
+        if prepare:
+            prepare()
+        with self.assertNumQueries(budget['queries']):
+            response = request()
+        self.assertLess(response.status_code, 400)
+        if not PERF_TIMINGS:
+            return
+
+        timings = []
+        for _ in range(self.RUNS):
+            if prepare:
+                prepare()
+            start = time.perf_counter()
+            request()
+            timings.append((time.perf_counter() - start) * 1000)
+        median = statistics.median(timings)
+        self.results[name] = {'queries': budget['queries'], 'ms': round(median, 3)}
+
+        self.assertLess(median, budget['ms'], f'{name} took {median:.1f} ms (budget {budget["ms"]} ms)')
+        baseline = self.baseline.get(name)
+        # Sub-millisecond timings are noisy, so a few ms of slack is always allowed
+        if baseline and median - baseline['ms'] > PERF_MIN_REGRESSION_MS:
+            tolerance = float(os.environ.get('POSTS_PERF_TOLERANCE', 3))
+            self.assertLess(
+                median, baseline['ms'] * tolerance,
+                f'{name} took {median:.1f} ms, {median / baseline["ms"]:.1f}x the baseline of {baseline["ms"]} ms',
+            )
+
+    def test_post_list(self):
+        self.measure('post_list', lambda: self.client.get(reverse('post_list')))
+        self.measure('post_list_deep_page', lambda: self.client.get(reverse('post_list'), {'page': 100}))
+
+    def test_post_detail(self):
+        url = reverse('post_detail', args=[self.post.pk])
+        with override_settings(POSTS_DETAIL_CACHE=None):
+            self.measure('post_detail_uncached', lambda: self.client.get(url))
+        self.client.get(url)
+        self.measure('post_detail_cached', lambda: self.client.get(url))
+
+    def test_post_create(self):
+        data = {'title': 'New post', 'content': 'Some new content.', 'author': self.authors[0].pk}
+        self.measure('post_create', lambda: self.client.post(reverse('post_create'), data))
+
+    def test_tagged_posts(self):
+        params = {'tag': [self.tags[0].name, self.tags[1].name]}
+        self.measure('tagged_posts', lambda: self.client.get(reverse('tagged_posts'), params),
+                     prepare=tag_cache().clear)
+
+    def test_post_update(self):
+        url = reverse('post_update', args=[self.post.pk])
+        self.measure('post_update_form', lambda: self.client.get(url))
+        edits = iter(range(1, 1000))
+        tags = ', '.join(self.post.tags.values_list('name', flat=True))
+        self.measure('post_update', lambda: self.client.post(url, {
+            'title': self.post.title,
+            'content': f'{self.post.content} Edit {next(edits)}.',
+            'author': self.authors[0].pk,
+            'tags': tags,
+        }))
+
+
+class StaticFilesMiddlewareTest(TestCase):
+    def setUp(self):
+        # Build a tiny static root with one hashed stylesheet and its gzip sibling
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        (self.root / 'posts').mkdir()
+        self.css = self.root / 'posts' / 'styles.0123456789ab.css'
+        self.css.write_text('body { color: black; }\n' * 50)
+        compress_file(self.css)
+        self.middleware = StaticFilesMiddleware(self.fallback, root=self.root, prefix='/static/')
+
+    def fallback(self, environ, start_response):
+        start_response('404 Not Found', [])
+        return [b'fallback']
+
+    def get(self, path, accept_encoding='', if_none_match=None, if_modified_since=None):
+        # Call the middleware like a WSGI server would and collect the response
+        captured = {}
+
+        def start_response(status, headers):
+            captured['status'] = status
+            captured['headers'] = dict(headers)
+
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'HTTP_ACCEPT_ENCODING': accept_encoding}
+        if if_none_match is not None:
+            environ['HTTP_IF_NONE_MATCH'] = if_none_match
+        if if_modified_since is not None:
+            environ['HTTP_IF_MODIFIED_SINCE'] = if_modified_since
+        body = b''.join(self.middleware(environ, start_response))
+        return captured['status'], captured['headers'], body
+
+    def test_serves_gzip_with_far_future_cache(self):
+        status, headers, body = self.get('/static/posts/styles.0123456789ab.css', 'gzip, deflate')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', headers['Cache-Control'])
+        self.assertEqual(gzip.decompress(body), self.css.read_bytes())
+
+    def test_unhashed_files_revalidate_with_304(self):
+        plain = self.root / 'posts' / 'live.js'
+        plain.write_text('console.log("live");\n')
+        status, headers, _ = self.get('/static/posts/live.js')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Cache-Control'], 'public, max-age=0, must-revalidate')
+
+        status, _, body = self.get('/static/posts/live.js', if_none_match=headers['ETag'])
+        self.assertEqual((status, body), ('304 Not Modified', b''))
+        status, _, body = self.get('/static/posts/live.js', if_modified_since=headers['Last-Modified'])
+        self.assertEqual((status, body), ('304 Not Modified', b''))
+        self.assertEqual(self.get('/static/posts/live.js', if_none_match='"stale"')[0], '200 OK')
+
+    def test_closes_the_file_without_a_server_file_wrapper(self):
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/static/posts/styles.0123456789ab.css'}
+        response = self.middleware(environ, lambda status, headers: None)
+        b''.join(response)
+        response.close()  # What a WSGI server does once the body is sent
+        self.assertTrue(response.filelike.closed)
+
+    def test_passes_through_missing_and_escaping_paths(self):
+        self.assertEqual(self.get('/static/posts/missing.css')[2], b'fallback')
+        self.assertEqual(self.get('/static/../secret.txt')[2], b'fallback')
+
+
+class SqliteTuningTest(TestCase):
+    def test_options_apply_wal_and_pragmas(self):
+        options = sqlite_options({'mmap_size': None})
+        self.assertEqual(options['transaction_mode'], 'IMMEDIATE')
+        self.assertEqual(options['timeout'], 5.0)
+        self.assertNotIn('mmap_size', options['init_command'])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = sqlite3.connect(Path(tmp) / 'db.sqlite3')
+            for statement in options['init_command'].split(';'):
+                conn.execute(statement)
+            self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            self.assertEqual(conn.execute('PRAGMA synchronous').fetchone()[0], 1)
+            conn.close()
+
+    def test_rejects_sql_in_pragmas(self):
+        with self.assertRaises(ValueError):
+            pragma_statements({'cache_size': '1; DROP TABLE posts_post'})
+
+
+class BackupTest(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.db = str(self.dir / 'db.sqlite3')
+        conn = sqlite3.connect(self.db)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('CREATE TABLE note (id INTEGER PRIMARY KEY, text TEXT)')
+        conn.executemany('INSERT INTO note (text) VALUES (?)', [(f'note {i}',) for i in range(2000)])
+        conn.commit()
+        conn.close()
+
+    def notes(self):
+        conn = sqlite3.connect(self.db)
+        try:
+            return conn.execute('SELECT count(*) FROM note').fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_round_trip_with_each_compression(self):
+        for compression in ('none', 'gzip', 'bz2', 'xz'):
+            with self.subTest(compression=compression):
+                output = str(self.dir / f'backup-{compression}')
+                result = backup_database(self.db, output, compression=compression, pages=8)
+                self.assertGreater(result['steps'], 1)
+                self.assertTrue(Path(f'{output}.sha256').read_text().startswith(result['sha256']))
+
+                conn = sqlite3.connect(self.db)
+                conn.execute('DELETE FROM note')
+                conn.commit()
+                conn.close()
+                restore_database(output, self.db, pages=8)
+                self.assertEqual(self.notes(), 2000)
+
+    def test_damaged_backups_are_refused(self):
+        output = self.dir / 'backup.gz'
+        backup_database(self.db, str(output), compression='gzip')
+        output.write_bytes(output.read_bytes()[:-100])
+        with self.assertRaisesMessage(BackupError, 'does not match its checksum'):
+            restore_database(str(output), self.db)
+
+        Path(f'{output}.sha256').unlink()
+        with self.assertRaisesMessage(BackupError, 'Could not read'):
+            restore_database(str(output), self.db)
+        self.assertEqual(self.notes(), 2000)
+
+    def test_restore_command_checks_before_touching_the_database(self):
+        post = make_post()
+        bogus = self.dir / 'bogus.sqlite3'
+        bogus.write_text('not a database')
+        with self.assertRaisesMessage(CommandError, 'is not a SQLite database'):
+            call_command('restore_db', str(bogus), interactive=False)
+        self.assertTrue(Post.objects.filter(pk=post.pk).exists())
@@ -2,7 +2,15 @@
 from django.urls import path
 from .views import (
     post_list,
+    post_feed,
+    post_events,
+    post_search,
+    tagged_posts,
+    author_list,
+    post_cache_stats,
     post_detail,
+    post_history,
+    post_revision,
     post_create,
     post_update,
     post_delete,
@@ -12,9 +20,31 @@ urlpatterns = [
     # URL pattern for displaying a list of all posts
     path("", post_list, name="post_list"),
 
+    # URL pattern for the JSON feed of posts (keyset paginated with ?after=)
+    path("posts/feed.json", post_feed, name="post_feed"),
+
+    # URL pattern for the live server-sent events stream (ASGI only)
+    path("posts/events/", post_events, name="post_events"),
+
+    # URL pattern for searching posts (?q=...)
+    path("search/", post_search, name="post_search"),
+
+    # URL pattern for posts filtered by tags (?tag=a&tag=b) with tag counts
+    path("tags/", tagged_posts, name="tagged_posts"),
+
+    # URL pattern for listing authors with their post counts
+    path("authors/", author_list, name="author_list"),
+
+    # URL pattern for the post_detail cache hit/miss counters
+    path("posts/cache-stats.json", post_cache_stats, name="post_cache_stats"),
+
     # URL pattern for displaying details of a specific post
     path("post/<int:pk>/", post_detail, name="post_detail"),
 
+    # URL patterns for a post's edit history and a single past revision
+    path("post/<int:pk>/history/", post_history, name="post_history"),
+    path("post/<int:pk>/history/<int:number>/", post_revision, name="post_revision"),
+
     # URL pattern for creating a new post
     path("post/new/", post_create, name="post_create"),
 
@@ -1,37 +1,402 @@
 # posts/views.py
+import hashlib
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.paginator import Paginator
+from django.db.models import Count, F, Max, Q
+from django.db.models.functions import Length
+from django.http import Http404
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Post
+from django.template.loader import render_to_string
+from django.utils.dateparse import parse_datetime
+from django.utils.http import urlencode
+from django.views.decorators.http import condition, require_GET
+from .models import Author, Post, PostRevision
 from .forms import PostForm
+from .cache import get_cached_detail, stats as detail_cache_stats
+from .events import RESET_MESSAGE, hub
+from .revisions import get_revision
+from .search import search_posts
+from .tags import find_tags, parse_tags, posts_with_tags, tag_facets
+
+# Number of posts shown on each page of the post list
+POSTS_PER_PAGE = 20
+
+# Number of authors shown on each page of the author list
+AUTHORS_PER_PAGE = 50
+
+# Default and maximum number of posts in one page of the JSON feed
+FEED_PAGE_SIZE = 20
+FEED_MAX_PAGE_SIZE = 100
+
+# Seconds between keep-alive comments on the live event stream
+EVENTS_HEARTBEAT = 15
 
 
 def post_list(request):
     """
-    View to display a list of all posts.
+    View to display a paginated list of posts, newest first.
+
+    The author is joined in the same query and only the stored excerpt is
+    loaded, never the full content, so the page costs the same number of
+    queries however many posts there are.
 
     :param request: HTTP request object.
-    :return: Rendered template with a list of posts.
+    :return: Rendered template with a page of posts.
     """
-    posts = Post.objects.all()
+    posts = (
+        Post.objects.select_related("author")
+        .only("id", "title", "excerpt", "created_at", "author__name")
+        .order_by("-created_at", "-id")
+    )
+    page = Paginator(posts, POSTS_PER_PAGE).get_page(request.GET.get("page"))
 
     # Creating a context dictionary to pass data
     context = {
-        "posts": posts,
+        "posts": page,
+        "page_obj": page,
         "page_title": "List of Posts",
+        "live_updates": getattr(settings, "POSTS_LIVE_UPDATES", False),
     }
 
     return render(request, "posts/post_list.html", context)
 
 
+def author_list(request):
+    """
+    View to display authors with how many posts each has written.
+
+    By default the counts come from one query that joins and groups the
+    posts (annotate(Count("post"))). With POSTS_DENORMALIZED_AUTHOR_COUNTS
+    enabled they are read from the Author.post_count and last_posted_at
+    columns instead, so each author costs O(1) however many posts exist.
+
+    :param request: HTTP request object.
+    :return: Rendered template with a page of authors.
+    """
+    if getattr(settings, "POSTS_DENORMALIZED_AUTHOR_COUNTS", False):
+        stats = {"num_posts": F("post_count"), "latest_post_at": F("last_posted_at")}
+    else:
+        live = Q(post__deleted_at__isnull=True)
+        stats = {
+            "num_posts": Count("post", filter=live),
+            "latest_post_at": Max("post__created_at", filter=live),
+        }
+    authors = Author.objects.only("id", "name").annotate(**stats).order_by("name", "id")
+    page = Paginator(authors, AUTHORS_PER_PAGE).get_page(request.GET.get("page"))
+
+    context = {
+        "authors": page,
+        "page_obj": page,
+        "page_title": "Authors",
+    }
+    return render(request, "posts/author_list.html", context)
+
+
+def encode_cursor(post):
+    """
+    Build the feed cursor that points just past a post.
+
+    :param post: The last post on a feed page.
+    :return: Cursor string in the form "<created_at>,<id>".
+    """
+    created_at = post.created_at.astimezone(dt_timezone.utc).isoformat().replace("+00:00", "Z")
+    return f"{created_at},{post.pk}"
+
+
+def decode_cursor(cursor):
+    """
+    Parse a feed cursor produced by encode_cursor.
+
+    :param cursor: Cursor string from the "after" query parameter.
+    :return: Tuple of (created_at, id), or None if the cursor is malformed.
+    """
+    created_at, _, pk = cursor.rpartition(",")
+    try:
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except ValueError:
+        return None
+    if created_at is None:
+        return None
+    return created_at, pk
+
+
+def feed_state(request):
+    """
+    Summarise the posts table for conditional GET on the feed.
+
+    The newest change time and the post count are read with one aggregate
+    query (served by the updated_at index) and cached on the request, so the
+    ETag and Last-Modified checks share it.
+
+    :param request: HTTP request object.
+    :return: Dictionary with "last_modified" and "count".
+    """
+    if not hasattr(request, "_feed_state"):
+        state = Post.objects.aggregate(last_modified=Max("updated_at"), count=Count("id"))
+        request._feed_state = state
+    return request._feed_state
+
+
+def feed_etag(request):
+    """
+    ETag for one feed page: changes when any post is added, edited or deleted.
+
+    :param request: HTTP request object.
+    :return: ETag string.
+    """
+    state = feed_state(request)
+    key = "|".join([
+        str(state["last_modified"]),
+        str(state["count"]),
+        request.GET.get("after", ""),
+        request.GET.get("limit", ""),
+    ])
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def feed_last_modified(request):
+    """
+    Last-Modified for the feed: the time of the newest post change.
+
+    :param request: HTTP request object.
+    :return: Datetime, or None if there are no posts.
+    """
+    return feed_state(request)["last_modified"]
+
+
+@require_GET
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
+def post_feed(request):
+    """
+    JSON feed of posts, newest first, for infinite scroll and polling clients.
+
+    Pages are found with keyset pagination on (created_at, id): the "after"
+    cursor returned by one page is passed to get the next, so every page is
+    an index range scan no matter how deep the client scrolls. Unchanged
+    pages are answered with 304 Not Modified.
+
+    :param request: HTTP request object. Accepts "after" (a cursor) and
+        "limit" (page size, at most FEED_MAX_PAGE_SIZE) query parameters.
+    :return: JSON response with "posts" and "next" (cursor or null).
+    """
+    try:
+        limit = min(int(request.GET.get("limit", FEED_PAGE_SIZE)), FEED_MAX_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({"error": "limit must be a number"}, status=400)
+    if limit < 1:
+        return JsonResponse({"error": "limit must be positive"}, status=400)
+
+    posts = (
+        Post.objects.select_related("author")
+        .only("id", "title", "excerpt", "created_at", "author__name")
+        .order_by("-created_at", "-id")
+    )
+
+    after = request.GET.get("after")
+    if after:
+        cursor = decode_cursor(after)
+        if cursor is None:
+            return JsonResponse({"error": "after must look like <created_at>,<id>"}, status=400)
+        created_at, pk = cursor
+        posts = posts.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+    # Fetch one extra row to know whether there is a next page
+    page = list(posts[:limit + 1])
+    has_next = len(page) > limit
+    page = page[:limit]
+
+    data = {
+        "posts": [
+            {
+                "id": post.pk,
+                "title": post.title,
+                "excerpt": post.excerpt,
+                "author": post.author.name if post.author else None,
+                "created_at": post.created_at.isoformat(),
+            }
+            for post in page
+        ],
+        "next": encode_cursor(page[-1]) if has_next else None,
+    }
+    return JsonResponse(data, json_dumps_params={"separators": (",", ":")})
+
+
+@require_GET
+async def post_events(request):
+    """
+    Server-sent events stream of post changes, for live updates on post_list.
+
+    Sends a "created", "updated" or "deleted" event (JSON data with the
+    post's id, and title, excerpt and author for the first two) whenever a
+    post changes, plus a comment every EVENTS_HEARTBEAT seconds to keep
+    proxies from closing the connection.
+
+    Only works through the ASGI entry point (bulletin_board/asgi.py). Under
+    WSGI, Django would read the endless stream to the end before sending
+    anything, so the request would hang and hold its thread for good; there
+    the view answers 204 No Content instead, which also tells EventSource
+    to stop reconnecting.
+
+    :param request: HTTP request object.
+    :return: Streaming text/event-stream response, or an empty 204 response.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    async def stream():
+        subscription = hub.subscribe()
+        try:
+            # Tell EventSource how long to wait before reconnecting
+            yield b"retry: 3000\n\n"
+            while True:
+                message = await subscription.get(timeout=EVENTS_HEARTBEAT)
+                if message is None:
+                    yield b": ping\n\n"
+                    continue
+                yield message
+                if message is RESET_MESSAGE:
+                    return
+        finally:
+            hub.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx and similar proxies from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def tagged_posts(request):
+    """
+    View to display the posts that have all of the given tags, newest first,
+    with counts of the other tags those posts have.
+
+    :param request: HTTP request object. Tags are read from repeated "tag"
+        query parameters, e.g. ?tag=kitchen&tag=lost-property.
+    :return: Rendered template with a page of posts and the tag facets.
+    """
+    names = parse_tags(",".join(request.GET.getlist("tag")))
+    tags = find_tags(names) if names else []
+    if len(tags) < len(names):
+        # A tag nobody has used matches no posts
+        posts = Post.objects.none()
+    elif tags:
+        posts = posts_with_tags(tags)
+    else:
+        posts = Post.objects.all()
+    posts = (
+        posts.select_related("author")
+        .only("id", "title", "excerpt", "created_at", "author__name")
+        .order_by("-created_at", "-id")
+    )
+    page = Paginator(posts, POSTS_PER_PAGE).get_page(request.GET.get("page"))
+
+    context = {
+        "posts": page,
+        "page_obj": page,
+        "tags": names,
+        "tag_query": urlencode([("tag", name) for name in names]),
+        "facets": tag_facets(tags) if len(tags) == len(names) else [],
+        "page_title": f"Posts tagged {', '.join(names)}" if names else "Tags",
+    }
+    return render(request, "posts/tagged_posts.html", context)
+
+
+def post_search(request):
+    """
+    View to search posts by title and content.
+
+    :param request: HTTP request object. The search text is read from "q".
+    :return: Rendered template with ranked, highlighted results.
+    """
+    query = request.GET.get("q", "").strip()
+    results = search_posts(query) if query else []
+
+    context = {
+        "query": query,
+        "results": results,
+        "page_title": "Search Posts",
+    }
+    return render(request, "posts/post_search.html", context)
+
+
 def post_detail(request, pk):
     """
     View to display details of a specific post.
 
+    The rendered page is cached per post (see posts/cache.py) and served
+    without touching the database until the post is edited or deleted.
+
     :param request: HTTP request object.
     :param pk: Primary key of the post.
     :return: Rendered template with details of the specified post.
     """
-    post = get_object_or_404(Post, pk=pk)
-    return render(request, "posts/post_detail.html", {"post": post})
+    def render_detail():
+        post = get_object_or_404(Post.objects.prefetch_related("tags"), pk=pk)
+        return render_to_string("posts/post_detail.html", {"post": post})
+
+    return HttpResponse(get_cached_detail(pk, render_detail))
+
+
+def post_history(request, pk):
+    """
+    View listing the saved revisions of a post, newest first.
+
+    :param request: HTTP request object.
+    :param pk: Primary key of the post.
+    :return: Rendered template with the post's revisions.
+    """
+    post = get_object_or_404(Post.objects.only("id", "title"), pk=pk)
+    revisions = (
+        PostRevision.objects.filter(post=post)
+        .annotate(size=Length("data"))
+        .only("number", "base", "created_at")
+        .order_by("-number")
+    )
+    context = {
+        "post": post,
+        "revisions": revisions,
+        "page_title": f"History of {post.title}",
+    }
+    return render(request, "posts/post_history.html", context)
+
+
+def post_revision(request, pk, number):
+    """
+    View showing a post as it was at one revision.
+
+    :param request: HTTP request object.
+    :param pk: Primary key of the post.
+    :param number: Revision number.
+    :return: Rendered template with the rebuilt title and content.
+    """
+    post = get_object_or_404(Post.objects.only("id"), pk=pk)
+    revision = get_revision(post.pk, number)
+    if revision is None:
+        raise Http404("No such revision.")
+    context = {
+        "post": post,
+        "revision": revision,
+        "page_title": f"{revision['title']} (revision {number})",
+    }
+    return render(request, "posts/post_revision.html", context)
+
+
+def post_cache_stats(request):
+    """
+    View reporting hit and miss counts for the post_detail cache.
+
+    The counters are per process, so each worker reports its own numbers.
+
+    :param request: HTTP request object.
+    :return: JSON response with "hits", "misses" and "hit_rate".
+    """
+    return JsonResponse(detail_cache_stats.as_dict())
 
 
 def post_create(request):
@@ -46,6 +411,7 @@ def post_create(request):
         if form.is_valid():
             post = form.save(commit=False)
             post.save()
+            form.save_m2m()
             return redirect("post_list")
     else:
         form = PostForm()
@@ -66,6 +432,7 @@ def post_update(request, pk):
         if form.is_valid():
             post = form.save(commit=False)
             post.save()
+            form.save_m2m()
             return redirect("post_list")
     else:
         form = PostForm(instance=post)
@@ -76,10 +443,16 @@ def post_delete(request, pk):
     """
     View to delete an existing post.
 
+    A GET shows a confirmation page; only a POST deletes. The post is
+    soft-deleted (hidden at once) and its row is removed later by the
+    purge_deleted_posts command.
+
     :param request: HTTP request object.
     :param pk: Primary key of the post to be deleted.
-    :return: Redirect to the post list after deletion.
+    :return: Confirmation page, or a redirect to the post list after deletion.
     """
     post = get_object_or_404(Post, pk=pk)
-    post.delete()
-    return redirect("post_list")
\ No newline at end of file
+    if request.method == "POST":
+        post.soft_delete()
+        return redirect("post_list")
+    return render(request, "posts/post_confirm_delete.html", {"post": post})
\ No newline at end of file
@@ -7,8 +7,11 @@ For more info on settings, see:
 https://docs.djangoproject.com/en/5.2/topics/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # This sets the base directory of your project so you can refer to files easily
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -52,8 +55,16 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],  # You can add folders here if you keep templates outside apps
-        'APP_DIRS': True, # Tells Django to look for templates inside each app’s 'templates' folder
         'OPTIONS': {
+            # Look for templates in DIRS, then inside each app's 'templates' folder.
+            # The cached loader keeps each compiled template in memory, so pages are not
+            # read and parsed from disk on every request (it still reloads on change under runserver).
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request', # Adds 'request' object to templates
                 'django.contrib.auth.context_processors.auth', # Adds user info to templates
@@ -78,6 +89,66 @@ DATABASES = {
     }
 }
 
+# Cache used by the cached_db and cache session engines (and anything else that wants a quick cache)
+# Each worker process has its own in-memory cache, so set AUTHLOG_REDIS_URL
+# (for example redis://localhost:6379/0) to share one Redis cache between all of them
+REDIS_URL = os.environ.get('AUTHLOG_REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',  # Shared by every process
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',  # In-process memory cache
+            'LOCATION': 'authlog-default',
+        }
+    }
+
+# Session storage: pick one with the AUTHLOG_SESSION_BACKEND environment variable
+#   db             - every request reads (and often writes) a row in the database (default)
+#   cached_db      - reads come from the cache, writes still go to the database
+#   cache          - cache only, sessions are lost if the cache is cleared
+# cached_db and cache need a cache shared by every process (see CACHES above). With a
+# per-process cache, a session logged out in one worker would still work in another.
+#   signed_cookies - no server storage at all, only for small sessions (cookies max out around 4 KB)
+#   file           - one file per session in SESSION_FILE_PATH
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+    'file': 'django.contrib.sessions.backends.file',
+}
+SHARED_CACHE_BACKENDS = [
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+]
+SESSION_BACKEND = os.environ.get('AUTHLOG_SESSION_BACKEND', 'db')
+if SESSION_BACKEND not in SESSION_ENGINES:
+    raise ImproperlyConfigured(
+        f"AUTHLOG_SESSION_BACKEND is {SESSION_BACKEND!r}, it must be one of: {', '.join(SESSION_ENGINES)}."
+    )
+if SESSION_BACKEND in ('cached_db', 'cache') and CACHES['default']['BACKEND'] not in SHARED_CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        f"The {SESSION_BACKEND} session engine needs a shared cache such as Redis or Memcached; "
+        "set AUTHLOG_REDIS_URL or use AUTHLOG_SESSION_BACKEND=db."
+    )
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
+# Folder for the file engine; None means the system temp folder
+SESSION_FILE_PATH = os.environ.get('AUTHLOG_SESSION_FILE_PATH')
+
+# Auth event log (logins, failed logins, logouts, registrations and password resets)
+# Events are kept in memory and written in batches by a background thread
+AUTH_AUDIT_STORAGE = 'db'            # 'db' to bulk insert into grabsomore_authevent, 'jsonl' to only write the file
+AUTH_AUDIT_BATCH_SIZE = 100          # Write as soon as this many events are waiting
+AUTH_AUDIT_FLUSH_INTERVAL = 5.0      # ...or after this many seconds, whichever comes first
+AUTH_AUDIT_FALLBACK_PATH = BASE_DIR / 'logs' / 'auth_events.jsonl'  # Used when the database write fails
+
 # Password validation helps make sure passwords are strong and safe
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',},
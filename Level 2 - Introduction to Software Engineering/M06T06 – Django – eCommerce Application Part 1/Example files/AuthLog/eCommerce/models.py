@@ -13,6 +13,9 @@ class Product(models.Model):
     stock = models.PositiveIntegerField()  
     # How many items are available in stock (only positive numbers allowed)
     
+    updated_at = models.DateTimeField(auto_now=True)
+    # When the product was last saved; the catalog's cached rows are keyed on it, so any edit shows straight away
+
     def __str__(self):
         # This makes it easier to see the product’s name when printing or in admin pages
         return self.name
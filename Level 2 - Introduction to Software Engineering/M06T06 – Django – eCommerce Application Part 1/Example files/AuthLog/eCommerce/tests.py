@@ -1,3 +1,37 @@
+from decimal import Decimal
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+
+from .models import Product
+
+
+class ProductListTest(TestCase):
+    def setUp(self):
+        # Start every test with an empty fragment cache
+        cache.clear()
+        self.product = Product.objects.create(name='Laptop', description='A fast laptop', price=Decimal('999.00'), stock=3)
+
+    def test_cached_row_shows_new_price(self):
+        # The first render fills the fragment cache for this product
+        response = self.client.get(reverse('eCommerce:products_list'))
+        self.assertContains(response, 'R999.00')
+
+        # Saving changes updated_at, which is part of the cache key, so the new price is shown straight away
+        self.product.price = Decimal('899.00')
+        self.product.save()
+        response = self.client.get(reverse('eCommerce:products_list'))
+        self.assertContains(response, 'R899.00')
+        self.assertNotContains(response, 'R999.00')
+
+    def test_cached_row_shows_new_name_and_description(self):
+        self.client.get(reverse('eCommerce:products_list'))
 
-# Create your tests here.
+        self.product.name = 'Gaming laptop'
+        self.product.description = 'An even faster laptop'
+        self.product.save()
+        response = self.client.get(reverse('eCommerce:products_list'))
+        self.assertContains(response, 'Gaming laptop')
+        self.assertContains(response, 'An even faster laptop')
+        self.assertNotContains(response, 'A fast laptop')
@@ -0,0 +1,117 @@
+import atexit  # To write out whatever is left in the buffer when the process stops
+import json  # Events are written to the fallback file as one JSON object per line
+import logging
+import threading  # The buffer is flushed by a background thread, not by the request
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.utils import timezone
+
+from .models import AuthEvent
+
+logger = logging.getLogger(__name__)
+
+
+# Collects auth events in memory and writes them out in batches
+# Requests only append to a list; a background thread does the writing, either
+# when BATCH_SIZE events are waiting or every FLUSH_INTERVAL seconds.
+# Batches go to the database with one bulk_create. If that fails, or if
+# AUTH_AUDIT_STORAGE is 'jsonl', they are appended to a JSONL file instead.
+class AuthEventBuffer:
+    def __init__(self, batch_size=100, flush_interval=5.0, storage='db', fallback_path=None, background=True):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.storage = storage
+        self.fallback_path = Path(fallback_path) if fallback_path else None
+        self.background = background
+
+        self._events = []
+        self._lock = threading.Lock()  # Protects self._events
+        self._flush_lock = threading.Lock()  # Makes sure only one flush writes at a time
+        self._wake = threading.Event()  # Set when a full batch is waiting
+        self._thread = None
+
+    # Called from the views; never touches the database
+    def record(self, event, username='', user_id=None, ip_address=None):
+        entry = {
+            'event': event,
+            'username': username or '',
+            'user_id': user_id,
+            'ip_address': ip_address,
+            'created_at': timezone.now(),
+        }
+        with self._lock:
+            self._events.append(entry)
+            full = len(self._events) >= self.batch_size
+
+        if self.background:
+            self._start_thread()
+            if full:
+                self._wake.set()  # Ask the background thread to flush now
+
+    # Writes out everything that is waiting and returns how many events were written
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                events, self._events = self._events, []
+            if not events:
+                return 0
+
+            if self.storage == 'db':
+                try:
+                    AuthEvent.objects.bulk_create([AuthEvent(**entry) for entry in events])
+                    return len(events)
+                except DatabaseError:
+                    logger.exception('Could not save %d auth events, writing them to file', len(events))
+
+            self._write_jsonl(events)
+            return len(events)
+
+    def _write_jsonl(self, events):
+        path = self.fallback_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Append only: the file is never rewritten, so it is safe to tail or rotate
+        with open(path, 'a', encoding='utf-8') as f:
+            for entry in events:
+                f.write(json.dumps({**entry, 'created_at': entry['created_at'].isoformat()}) + '\n')
+
+    def _start_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='auth-audit-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            # Wake up when a batch is full or when the interval has passed
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Auth event flush failed')
+
+
+# The buffer used by the views, configured from settings
+audit_buffer = AuthEventBuffer(
+    batch_size=getattr(settings, 'AUTH_AUDIT_BATCH_SIZE', 100),
+    flush_interval=getattr(settings, 'AUTH_AUDIT_FLUSH_INTERVAL', 5.0),
+    storage=getattr(settings, 'AUTH_AUDIT_STORAGE', 'db'),
+    fallback_path=getattr(settings, 'AUTH_AUDIT_FALLBACK_PATH', settings.BASE_DIR / 'logs' / 'auth_events.jsonl'),
+)
+atexit.register(audit_buffer.flush)
+
+
+# Shortcut for views: pulls the IP address out of the request
+def record_auth_event(request, event, username='', user=None):
+    audit_buffer.record(
+        event,
+        username=username or (user.username if user is not None else ''),
+        user_id=user.pk if user is not None else None,
+        ip_address=request.META.get('REMOTE_ADDR') or None,
+    )
@@ -0,0 +1,62 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+# Measures how much time the session layer adds to each request for every engine in SESSION_ENGINES
+# Each simulated request loads the session and reads the cart, like our views do
+# Every --write-every requests the cart also changes, so the session is saved too
+class Command(BaseCommand):
+    help = 'Benchmark per-request session overhead for each session engine.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000,
+                            help='Number of simulated requests per engine.')
+        parser.add_argument('--write-every', type=int, default=5,
+                            help='Save the session on every Nth request (0 means never).')
+        parser.add_argument('--cart-items', type=int, default=10,
+                            help='Number of items stored in the session cart.')
+        parser.add_argument('--engines', nargs='*', default=list(settings.SESSION_ENGINES),
+                            help='Engines to test, by name from SESSION_ENGINES.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'engine':<16}{'us/request':>12}{'stored bytes':>14}")
+
+        for name in options['engines']:
+            store_class = import_module(settings.SESSION_ENGINES[name]).SessionStore
+            per_request, size = self.run_engine(store_class, options)
+            self.stdout.write(f'{name:<16}{per_request:>12.1f}{size:>14}')
+
+    def run_engine(self, store_class, options):
+        # Start with a session that looks like a logged-in user with a cart
+        session = store_class()
+        session['user_id'] = 1
+        session['username'] = 'benchmark-user'
+        session['cart'] = {f'Product {i}': 1 for i in range(options['cart_items'])}
+        session.save()
+        session_key = session.session_key
+
+        write_every = options['write_every']
+        start = time.perf_counter()
+
+        for i in range(options['requests']):
+            # A new store per request, just like SessionMiddleware creates
+            session = store_class(session_key=session_key)
+            cart = session.get('cart', {})
+
+            if write_every and i % write_every == 0:
+                cart['Product 0'] += 1
+                session['cart'] = cart
+                session.save()
+                # Signed cookie sessions get a new key every time they are saved
+                session_key = session.session_key
+
+        elapsed = time.perf_counter() - start
+
+        # How big the stored session is (for signed cookies this is the cookie itself)
+        size = len(session.encode(dict(session.items())))
+
+        session.delete()
+        return elapsed / options['requests'] * 1_000_000, size
@@ -0,0 +1,87 @@
+import time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory, override_settings
+
+from eCommerce.models import Product
+
+SOURCE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+# Compares render times for the login page and the product catalog with:
+#   no caching                 - templates are read and parsed from disk on every render
+#   cached loader              - parsed templates are kept in memory
+#   cached loader + fragments  - plus {% cache %} fragments are served from the cache
+# The benchmark clears the cache between renders, so it swaps in a private in-memory
+# cache of its own: clearing the real one would also throw away everyone's sessions
+# when they are kept in Redis (AUTHLOG_SESSION_BACKEND=cache or cached_db).
+BENCH_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bench-templates',
+    }
+}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark template rendering with and without the cached loader and fragment caching.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--renders', type=int, default=500,
+                            help='Number of renders per template and configuration.')
+        parser.add_argument('--products', type=int, default=50,
+                            help='Number of products shown in the catalog.')
+
+    @override_settings(CACHES=BENCH_CACHES)  # The {% cache %} tags use the default cache
+    def handle(self, *args, **options):
+        # Unsaved products are enough for rendering, so no database is needed
+        products = [
+            Product(pk=i, name=f'Product {i}', description='A useful product. ' * 10,
+                    price=Decimal('9.99') + i, stock=10)
+            for i in range(options['products'])
+        ]
+        pages = [
+            ('grabsomore/login.html', {}),
+            ('eCommerce/products_list.html', {'products': products}),
+        ]
+        configs = [
+            ('no caching', self.build_engine(cached=False), False),
+            ('cached loader', self.build_engine(cached=True), False),
+            ('cached loader + fragments', self.build_engine(cached=True), True),
+        ]
+
+        self.stdout.write(f"{'template':<32}{'configuration':<28}{'us/render':>12}")
+        for name, context in pages:
+            for label, engine, fragments in configs:
+                per_render = self.time_renders(engine, name, context, fragments, options['renders'])
+                self.stdout.write(f'{name:<32}{label:<28}{per_render:>12.1f}')
+
+    def build_engine(self, cached):
+        loaders = [('django.template.loaders.cached.Loader', SOURCE_LOADERS)] if cached else SOURCE_LOADERS
+        return DjangoTemplates({
+            'NAME': 'bench',
+            'DIRS': [],
+            'APP_DIRS': False,
+            'OPTIONS': {'loaders': loaders},
+        })
+
+    def time_renders(self, engine, name, context, fragments, renders):
+        request = RequestFactory().get('/')
+        cache.clear()
+        elapsed = 0.0
+
+        for _ in range(renders):
+            if not fragments:
+                cache.clear()  # Throw the fragments away so every render builds them again
+            # Same steps as the render() shortcut: find the template, then render it
+            start = time.perf_counter()
+            engine.get_template(name).render(context, request)
+            elapsed += time.perf_counter() - start
+
+        return elapsed / renders * 1_000_000
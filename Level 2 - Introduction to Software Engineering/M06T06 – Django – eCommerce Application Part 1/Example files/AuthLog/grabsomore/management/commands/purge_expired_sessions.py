@@ -0,0 +1,56 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DBSessionStore
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+# Deletes expired sessions a few rows at a time, so the session table is never locked for long
+# Run it from cron, for example: python manage.py purge_expired_sessions --batch-size 1000
+class Command(BaseCommand):
+    help = 'Delete expired sessions in small batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='How many session rows to delete per query.')
+        parser.add_argument('--max-batches', type=int, default=0,
+                            help='Stop after this many batches (0 means no limit).')
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help='Seconds to pause between batches to let other queries through.')
+
+    def handle(self, *args, **options):
+        engine = import_module(settings.SESSION_ENGINE)
+
+        # Only the db and cached_db engines keep rows in the session table
+        # Other engines (file, cache) clean up with their own clear_expired()
+        if not issubclass(engine.SessionStore, DBSessionStore):
+            engine.SessionStore.clear_expired()
+            self.stdout.write(f'Cleared expired sessions for {settings.SESSION_ENGINE}.')
+            return
+
+        batch_size = options['batch_size']
+        max_batches = options['max_batches']
+        now = timezone.now()
+        deleted = 0
+        batches = 0
+
+        while not max_batches or batches < max_batches:
+            # Pick the next batch of expired keys, then delete exactly those rows
+            keys = list(
+                Session.objects.filter(expire_date__lt=now)
+                .values_list('session_key', flat=True)[:batch_size]
+            )
+            if not keys:
+                break
+
+            count, _ = Session.objects.filter(session_key__in=keys).delete()
+            deleted += count
+            batches += 1
+
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(f'Deleted {deleted} expired sessions in {batches} batches.')
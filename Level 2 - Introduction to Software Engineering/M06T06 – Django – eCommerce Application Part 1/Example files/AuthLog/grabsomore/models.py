@@ -14,3 +14,35 @@ class ResetToken(models.Model):
     def __str__(self):
         # Show a short summary for easier debugging
         return f"ResetToken(user={self.user.username}, token={self.token[:10]}..., used={self.used})"
+
+
+class AuthEvent(models.Model):
+    # The kinds of things we keep a record of
+    LOGIN = 'login'
+    LOGIN_FAILED = 'login_failed'
+    LOGOUT = 'logout'
+    REGISTER = 'register'
+    RESET_REQUESTED = 'reset_requested'
+    RESET_COMPLETED = 'reset_completed'
+    EVENT_CHOICES = [
+        (LOGIN, 'Logged in'),
+        (LOGIN_FAILED, 'Failed login'),
+        (LOGOUT, 'Logged out'),
+        (REGISTER, 'Registered'),
+        (RESET_REQUESTED, 'Requested password reset'),
+        (RESET_COMPLETED, 'Reset password'),
+    ]
+
+    # What happened
+    event = models.CharField(max_length=32, choices=EVENT_CHOICES)
+    # The username that was typed in (kept even if the login failed or the user is deleted later)
+    username = models.CharField(max_length=150, blank=True)
+    # The user it happened to, when we know who that is
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    # Where the request came from
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+    # When it happened (set when the event is recorded, not when it is written to the database)
+    created_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"AuthEvent(event={self.event}, username={self.username}, at={self.created_at})"
@@ -1,3 +1,128 @@
+import json
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import DatabaseError
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .audit import AuthEventBuffer, audit_buffer
+from .models import ResetToken, AuthEvent
+from .utils import hash_reset_token, validate_reset_token, consume_reset_token
+
+
+# Views record auth events; keep the shared buffer from starting its background thread during tests
+# Tests that call views flush it themselves, inside their own transaction
+_no_background_flush = mock.patch.object(audit_buffer, 'background', False)
+
+
+def setUpModule():
+    _no_background_flush.start()
+
+
+def tearDownModule():
+    # Put the shared buffer back the way it was for whatever runs next
+    _no_background_flush.stop()
+
+
+class ResetTokenTest(TestCase):
+    def setUp(self):
+        # Create a user and a reset token that is valid for the next hour
+        self.user = User.objects.create_user(username='alice', password='old-password')
+        self.raw_token = 'raw-token'
+        self.reset_token = ResetToken.objects.create(
+            user=self.user,
+            token=hash_reset_token(self.raw_token),
+            expiry_date=timezone.now() + timedelta(hours=1),
+        )
+
+    def test_validate_uses_one_query(self):
+        # The token and its user should come back from a single query
+        with self.assertNumQueries(1):
+            status, reset_token = validate_reset_token(self.raw_token)
+            self.assertEqual(reset_token.user.username, 'alice')
+        self.assertEqual(status, 'valid')
+
+    def test_validate_unknown_and_expired_tokens(self):
+        self.assertEqual(validate_reset_token('wrong-token'), ('invalid', None))
+        self.reset_token.expiry_date = timezone.now() - timedelta(minutes=1)
+        self.reset_token.save()
+        self.assertEqual(validate_reset_token(self.raw_token)[0], 'expired')
+
+    def test_token_can_only_be_consumed_once(self):
+        # The second attempt must fail even though it holds the same token object
+        self.assertTrue(consume_reset_token(self.reset_token))
+        self.assertFalse(consume_reset_token(self.reset_token))
+        self.assertEqual(validate_reset_token(self.raw_token), ('invalid', None))
+
+    def test_reset_password_flow(self):
+        # Visiting the link stores the token in the session
+        response = self.client.get(reverse('grabsomore:password_reset_form', args=[self.raw_token]))
+        self.assertEqual(response.status_code, 200)
+
+        # Submitting the form changes the password and uses up the token
+        response = self.client.post(reverse('grabsomore:reset_password'), {
+            'password': 'new-password',
+            'password_conf': 'new-password',
+        })
+        self.assertRedirects(response, reverse('grabsomore:login'))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('new-password'))
+        self.reset_token.refresh_from_db()
+        self.assertTrue(self.reset_token.used)
+        audit_buffer.flush()
+        self.assertTrue(AuthEvent.objects.filter(event=AuthEvent.RESET_COMPLETED, user=self.user).exists())
+
+
+class PurgeExpiredSessionsTest(TestCase):
+    def test_deletes_only_expired_sessions_in_batches(self):
+        # Five expired sessions and one that is still active
+        now = timezone.now()
+        for i in range(5):
+            Session.objects.create(session_key=f'expired-{i}', session_data='', expire_date=now - timedelta(days=1))
+        Session.objects.create(session_key='active', session_data='', expire_date=now + timedelta(days=1))
+
+        out = StringIO()
+        call_command('purge_expired_sessions', batch_size=2, stdout=out)
+
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['active'])
+        self.assertIn('Deleted 5 expired sessions in 3 batches.', out.getvalue())
+
+
+class AuthEventBufferTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = Path(self.tmp.name) / 'auth_events.jsonl'
+        self.buffer = AuthEventBuffer(batch_size=10, fallback_path=self.path, background=False)
+
+    def test_record_does_not_query_and_flush_uses_one_insert(self):
+        # Recording is memory only; the whole batch is saved with a single bulk insert
+        with self.assertNumQueries(0):
+            for i in range(3):
+                self.buffer.record(AuthEvent.LOGIN_FAILED, username=f'user{i}', ip_address='127.0.0.1')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(AuthEvent.objects.filter(event=AuthEvent.LOGIN_FAILED).count(), 3)
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_falls_back_to_jsonl_when_database_fails(self):
+        self.buffer.record(AuthEvent.LOGIN, username='alice')
+        with mock.patch.object(AuthEvent.objects, 'bulk_create', side_effect=DatabaseError), \
+                self.assertLogs('grabsomore.audit', level='ERROR'):
+            self.buffer.flush()
+        lines = self.path.read_text().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['username'], 'alice')
 
-# Create your tests here.
+    def test_login_view_records_failed_login(self):
+        self.client.post(reverse('grabsomore:login'), {'username': 'nobody', 'password': 'wrong'})
+        audit_buffer.flush()
+        self.assertTrue(AuthEvent.objects.filter(event=AuthEvent.LOGIN_FAILED, username='nobody').exists())
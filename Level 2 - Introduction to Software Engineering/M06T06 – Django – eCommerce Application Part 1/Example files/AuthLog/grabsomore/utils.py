@@ -3,6 +3,7 @@ from hashlib import sha1  # Used to securely hash data (like tokens)
 from datetime import datetime, timedelta  # To handle dates and times
 from .models import ResetToken  # Our model to store password reset tokens
 from django.urls import reverse  # To get URL from named paths
+from django.utils import timezone  # Timezone-aware "now" for token expiry checks
 
 
 # This function creates a special reset link for the user
@@ -33,3 +34,46 @@ def build_email(user, url):
     email = EmailMessage(subject, body, to=[user.email])
     
     return email  # Return the email object so it can be sent later
+
+
+# This function turns the raw token from the email link into the hash we store
+def hash_reset_token(raw_token):
+    return sha1(raw_token.encode()).hexdigest()
+
+
+# This function checks a raw token and returns (status, reset_token)
+# status is one of 'valid', 'expired' or 'invalid'
+def validate_reset_token(raw_token):
+    if not raw_token:
+        return 'invalid', None
+
+    hashed_token = hash_reset_token(raw_token)
+
+    # One query: fetch the unused token and its user together (no second lookup for token.user)
+    # Only the hash is stored and looked up, so a leaked table row can't be used as a reset link
+    reset_token = (
+        ResetToken.objects.select_related('user')
+        .filter(token=hashed_token, used=False)
+        .first()
+    )
+
+    if reset_token is None:
+        return 'invalid', None
+
+    # Tokens are stored with a timezone, so compare against an aware "now"
+    if reset_token.expiry_date < timezone.now():
+        return 'expired', reset_token
+
+    return 'valid', reset_token
+
+
+# This function marks a token as used, but only if nobody else has used it first
+# It returns True if this call was the one that used the token
+def consume_reset_token(reset_token):
+    # A single conditional UPDATE: if two requests race, only one of them matches used=False
+    updated = ResetToken.objects.filter(
+        pk=reset_token.pk,
+        used=False,
+        expiry_date__gte=timezone.now(),
+    ).update(used=True)
+    return updated == 1
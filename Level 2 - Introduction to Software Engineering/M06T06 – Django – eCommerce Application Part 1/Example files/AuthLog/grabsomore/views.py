@@ -10,8 +10,11 @@ from datetime import timedelta
 from hashlib import sha1  # To hash tokens securely
 from django.utils import timezone  # Better way to handle dates and times in Django
 from django.core.exceptions import ObjectDoesNotExist  # For handling cases when an object is not found
+from django.db import transaction  # To make several database changes succeed or fail together
 from .utils import generate_reset_url, build_email  # Helper functions for email and token generation
-from .models import ResetToken  # Our custom model to store reset tokens
+from .utils import validate_reset_token, consume_reset_token  # Helpers to check and use reset tokens
+from .models import ResetToken, AuthEvent  # Our custom models for reset tokens and the auth log
+from .audit import record_auth_event  # Buffers auth events so logging never slows down the request
 
 from django.core.mail import EmailMessage  # To send emails
 from django.contrib.auth.hashers import make_password  # To hash passwords before saving
@@ -29,6 +32,7 @@ def login_user(request):
 
         if user is not None:
             login(request, user)  # Log the user in and start their session
+            record_auth_event(request, AuthEvent.LOGIN, user=user)
 
             # Set the session to expire on 30 Dec 2025 (so user stays logged in until then)
             exp_date = datetime(2025, 12, 30)
@@ -44,7 +48,8 @@ def login_user(request):
             # Redirect user to the welcome page after successful login
             return HttpResponseRedirect(reverse('grabsomore:welcome'))
         else:
-            # If login failed, reload login page with an error message
+            # If login failed, remember who tried, then reload login page with an error message
+            record_auth_event(request, AuthEvent.LOGIN_FAILED, username=username)
             return render(request, 'grabsomore/login.html', {'error': 'Invalid credentials'})
 
     # If the user just opened the login page, show the login form
@@ -79,6 +84,7 @@ def register_user(request):
         user.save()  # Save all changes to the database
 
         login(request, user)  # Log the new user in automatically
+        record_auth_event(request, AuthEvent.REGISTER, user=user)
 
         # Redirect to welcome page after registration
         return redirect(reverse('grabsomore:welcome'))
@@ -99,6 +105,8 @@ def change_user_password(username, new_password):
 # Logs the user out and redirects to login page
 def logout_user(request):
     if request.user is not None:
+        if request.user.is_authenticated:
+            record_auth_event(request, AuthEvent.LOGOUT, user=request.user)
         logout(request)  # Log out the current user
         return HttpResponseRedirect(reverse('grabsomore:login'))
 
@@ -152,6 +160,7 @@ def send_password_reset(request):
             reset_url = generate_reset_url(user)  # Generate reset link with token
             email = build_email(user, reset_url)  # Create the email message
             email.send()  # Send the email
+            record_auth_event(request, AuthEvent.RESET_REQUESTED, user=user)
 
             # Show a confirmation page that email was sent
             return render(request, 'grabsomore/reset_email_sent.html', {
@@ -170,73 +179,68 @@ def send_password_reset(request):
 
 # This view is called when user clicks the reset link in their email
 def reset_user_password(request, token):
-    hashed_token = sha1(token.encode()).hexdigest()  # Hash the token from URL
+    # Look up the token and its user in one query
+    status, user_token = validate_reset_token(token)
 
-    try:
-        user_token = ResetToken.objects.get(token=hashed_token)  # Look for token in DB
+    if status == 'invalid':
+        # Token not found or already used
+        return render(request, 'grabsomore/password_reset_invalid.html')
 
-        # Check if the token expired
-        if user_token.expiry_date.replace(tzinfo=None) < datetime.now():
-            user_token.delete()  # Delete expired token
-            return render(request, 'grabsomore/password_reset_expired.html')  # Show expired token message
+    if status == 'expired':
+        return render(request, 'grabsomore/password_reset_expired.html')  # Show expired token message
 
-        # Save user ID and token in session to verify next step
-        request.session['user_id'] = user_token.user.id
-        request.session['reset_token'] = token
+    # Save the raw token in session so the next step can check it again
+    request.session['reset_token'] = token
 
-        # Show the password reset form
-        return render(request, 'grabsomore/password_reset.html', {'token': token})
-
-    except ResetToken.DoesNotExist:
-        # Token not found or already used
-        return render(request, 'grabsomore/password_reset_invalid.html')
+    # Show the password reset form
+    return render(request, 'grabsomore/password_reset.html', {'token': token})
 
 
 # Handles the password reset form submission (when user enters new password)
 def reset_password(request):
     if request.method == 'POST':
-        username = request.session.get('user')
-        token = request.session.get('token')
+        token = request.session.get('reset_token')
         password = request.POST.get('password')
         password_conf = request.POST.get('password_conf')
 
         # Check if all required data is present
-        if not all([username, token, password, password_conf]):
-            return render(request, 'password_reset.html', {
+        if not all([token, password, password_conf]):
+            return render(request, 'grabsomore/password_reset.html', {
                 'error': 'Missing fields or session expired.',
                 'token': token
             })
 
         # Check if passwords match
         if password != password_conf:
-            return render(request, 'password_reset.html', {
+            return render(request, 'grabsomore/password_reset.html', {
                 'error': 'Passwords do not match.',
                 'token': token
             })
 
-        try:
-            user = User.objects.get(username=username)  # Find user by username
-            hashed_token = sha1(token.encode()).hexdigest()
-            reset_token = ResetToken.objects.get(token=hashed_token)
+        # Check the token again (it may have expired while the form was open)
+        status, reset_token = validate_reset_token(token)
+        if status == 'expired':
+            return render(request, 'grabsomore/password_reset_expired.html')
+        if status == 'invalid':
+            return render(request, 'grabsomore/password_reset_invalid.html')
 
-            # Check token expiry again (just to be sure)
-            if reset_token.expiry_date.replace(tzinfo=None) < datetime.now():
-                reset_token.delete()
-                return render(request, 'password_reset_expired.html')
+        with transaction.atomic():
+            # Mark the token used first; if another request beat us to it, stop here
+            if not consume_reset_token(reset_token):
+                return render(request, 'grabsomore/password_reset_invalid.html')
 
             # Update the user's password (hashed securely)
+            user = reset_token.user
             user.password = make_password(password)
-            user.save()
+            user.save(update_fields=['password'])
 
-            # Delete the token and clear session info
-            reset_token.delete()
-            request.session.flush()
+        record_auth_event(request, AuthEvent.RESET_COMPLETED, user=user)
 
-            # Redirect user to login page after successful password reset
-            return HttpResponseRedirect(reverse('grabsomore:login'))
+        # Clear session info
+        request.session.flush()
 
-        except (User.DoesNotExist, ResetToken.DoesNotExist):
-            return render(request, 'password_reset_invalid.html')
+        # Redirect user to login page after successful password reset
+        return HttpResponseRedirect(reverse('grabsomore:login'))
 
     # If the page was accessed with GET or any other method, redirect to login page
     return HttpResponseRedirect(reverse('grabsomore:login'))
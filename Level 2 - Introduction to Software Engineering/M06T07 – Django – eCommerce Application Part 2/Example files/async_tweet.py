@@ -0,0 +1,207 @@
+import asyncio  # To send several tweets at the same time
+import email.utils  # To read dates in the Retry-After header
+import time  # To know how long to wait before trying again
+from urllib.parse import urlencode  # To build the form body Twitter expects
+
+import httpx  # An HTTP client that works with async code and keeps a pool of connections
+from oauthlib.oauth1 import Client  # Signs each request, the same way OAuth1Session does
+
+try:
+    from .resilience import CircuitBreaker, TweetError, TweetMetrics, check_breaker, record_answer, record_no_answer  # When used inside the Django app
+except ImportError:
+    from resilience import CircuitBreaker, TweetError, TweetMetrics, check_breaker, record_answer, record_no_answer  # When this file is run directly
+
+
+# An async version of Tweet, for posting many tweets without waiting for each one in turn.
+#
+# Tweets are put in a queue. A background task takes them out in batches and sends
+# each batch at the same time, using at most max_connections connections, which are
+# kept open and reused between tweets. When Twitter says we are sending too fast
+# (429 Too Many Requests), every tweet waits as long as Twitter asks before trying again.
+# Every request goes through a circuit breaker and is counted in the metrics, like
+# Tweet.send_status; from_tweet shares Tweet's breaker and metrics (see resilience.py).
+#
+# Use it like this:
+#     async with AsyncTweetClient.from_tweet(Tweet()) as client:
+#         results = await client.post_many(["First tweet", "Second tweet"])
+class AsyncTweetClient:
+    API_BASE_URL = "https://api.twitter.com"  # Change this to point at a test server
+    STATUS_UPDATE_PATH = "/1.1/statuses/update.json"  # The same endpoint Tweet.make_tweet uses
+
+    # Responses that mean "try again later" rather than "this tweet is wrong"
+    RETRY_STATUS_CODES = (429, 503)
+
+    def __init__(
+        self,
+        consumer_key,
+        consumer_secret,
+        access_token,
+        access_token_secret,
+        base_url=API_BASE_URL,
+        max_connections=10,  # Most tweets being sent at once
+        batch_size=50,  # Most tweets taken from the queue at a time
+        max_retries=3,  # How many times to retry a tweet that was rate limited
+        max_retry_wait=15 * 60,  # Never wait longer than this many seconds for a retry
+        timeout=10.0,  # Seconds to wait for Twitter before giving up on a request
+        breaker=None,  # The CircuitBreaker to check before each request (a new one if not given)
+        metrics=None,  # Where to count each request's outcome and time (a new TweetMetrics if not given)
+    ):
+        # The signer adds the OAuth Authorization header to every request
+        self.signer = Client(
+            consumer_key,
+            client_secret=consumer_secret,
+            resource_owner_key=access_token,
+            resource_owner_secret=access_token_secret,
+        )
+        self.status_url = base_url.rstrip("/") + self.STATUS_UPDATE_PATH
+        self.max_connections = max_connections
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.max_retry_wait = max_retry_wait
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics = metrics or TweetMetrics()
+
+        # These are created in start(), inside the running event loop
+        self.http = None
+        self.queue = None
+        self.sending = None  # Limits how many requests are in flight
+        self.batcher = None  # The background task that drains the queue
+        self.resume_at = 0.0  # No tweet is sent before this time (after a 429)
+
+    # Build a client that uses the tokens of an already authenticated Tweet object
+    @classmethod
+    def from_tweet(cls, tweet, **options):
+        if not tweet.oauth:
+            raise ValueError('Authentication failed!')
+        token = tweet.oauth.token  # {"oauth_token": ..., "oauth_token_secret": ...}
+        options.setdefault("breaker", tweet.breaker)
+        options.setdefault("metrics", tweet.metrics)
+        return cls(
+            tweet.CONSUMER_KEY,
+            tweet.CONSUMER_SECRET,
+            token["oauth_token"],
+            token["oauth_token_secret"],
+            **options,
+        )
+
+    # "async with" starts the client and closes it when the block ends
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    # Open the connection pool and start sending queued tweets
+    async def start(self):
+        limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+        self.http = httpx.AsyncClient(limits=limits, timeout=self.timeout)
+        self.queue = asyncio.Queue()
+        self.sending = asyncio.Semaphore(self.max_connections)
+        self.batcher = asyncio.create_task(self.send_batches())
+
+    # Send whatever is still queued, then close every connection
+    async def close(self):
+        await self.queue.join()
+        self.batcher.cancel()
+        await asyncio.gather(self.batcher, return_exceptions=True)
+        await self.http.aclose()
+
+    # Queue a tweet and return a future that will hold Twitter's response (or the error)
+    def enqueue(self, tweet_text):
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((tweet_text, future))
+        return future
+
+    # Queue several tweets and wait for all of them.
+    # Each result is Twitter's response for that tweet, or the TweetError it failed with.
+    async def post_many(self, tweet_texts):
+        futures = [self.enqueue(text) for text in tweet_texts]
+        return await asyncio.gather(*futures, return_exceptions=True)
+
+    # Post one tweet straight away, skipping the queue
+    async def make_tweet(self, tweet_text):
+        body = urlencode({"status": tweet_text})
+        for attempt in range(self.max_retries + 1):
+            await self.wait_for_rate_limit()
+            async with self.sending:
+                check_breaker(self.breaker, self.metrics)  # Fails at once while Twitter is known to be down
+                # Sign every attempt again: a signature can only be used once
+                url, headers, signed_body = self.signer.sign(
+                    self.status_url,
+                    http_method="POST",
+                    body=body,
+                    headers={"Content-Type": "application/x-www-form-urlencoded"},
+                )
+                start = time.perf_counter()
+                try:
+                    response = await self.http.post(url, headers=headers, content=signed_body)
+                except Exception as error:  # No answer at all: count it against Twitter, then pass it on
+                    if isinstance(error, httpx.TimeoutException):
+                        outcome = "timeout"
+                    elif isinstance(error, httpx.TransportError):
+                        outcome = "connection_error"
+                    else:
+                        outcome = "error"
+                    record_no_answer(self.breaker, self.metrics, outcome, time.perf_counter() - start)
+                    raise
+                record_answer(self.breaker, self.metrics, response.status_code, time.perf_counter() - start)
+
+            if response.status_code == 200:
+                return response.json()
+            if response.status_code in self.RETRY_STATUS_CODES and attempt < self.max_retries:
+                # Make every tweet wait, not just this one, so we stop hitting the limit
+                self.resume_at = max(self.resume_at, time.monotonic() + self.retry_delay(response, attempt))
+                continue
+            raise TweetError(response.status_code, response.text)
+
+    # Background task: take up to batch_size tweets from the queue and send them together
+    async def send_batches(self):
+        while True:
+            batch = [await self.queue.get()]  # Wait until there is at least one tweet
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            await asyncio.gather(*(self.send_queued(text, future) for text, future in batch))
+            for _ in batch:
+                self.queue.task_done()
+
+    # Send one queued tweet and put the outcome in its future
+    async def send_queued(self, tweet_text, future):
+        if future.cancelled():  # Nobody is waiting for this tweet any more
+            return
+        try:
+            result = await self.make_tweet(tweet_text)
+        except Exception as exc:  # Pass every failure on to whoever is waiting, never stop the batcher
+            if not future.cancelled():
+                future.set_exception(exc)
+        else:
+            if not future.cancelled():
+                future.set_result(result)
+
+    # Sleep until Twitter's rate limit has reset
+    async def wait_for_rate_limit(self):
+        delay = self.resume_at - time.monotonic()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self.resume_at - time.monotonic()  # Another tweet may have pushed it back
+
+    # Work out how many seconds Twitter wants us to wait before retrying
+    def retry_delay(self, response, attempt):
+        retry_after = response.headers.get("Retry-After")
+        reset = response.headers.get("x-rate-limit-reset")
+        delay = None
+        if retry_after:
+            try:
+                delay = float(retry_after)  # A number of seconds...
+            except ValueError:
+                try:
+                    when = email.utils.parsedate_to_datetime(retry_after)  # ...or a date
+                    delay = when.timestamp() - time.time()
+                except (TypeError, ValueError):
+                    pass  # Not something we understand, so fall back to backing off
+        elif reset:
+            delay = float(reset) - time.time()  # The time (in seconds since 1970) the limit resets
+        if delay is None:
+            delay = 2 ** attempt  # Twitter didn't say, so wait 1, 2, 4... seconds
+        return min(max(delay, 0), self.max_retry_wait)
@@ -0,0 +1,160 @@
+import asyncio  # The async client sends each batch of tweets in parallel
+import time  # To wait between checks when the outbox is empty
+import uuid  # To give this worker a name no other worker has
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async  # To touch the database from inside the event loop
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ...functions.async_tweet import AsyncTweetClient, TweetError
+from ...functions.tweet import Tweet
+from ...models import TweetOutbox
+
+
+# Posts the tweets queued in TweetOutbox, a batch at a time.
+#
+# Run it next to the web server, for example:
+#     python manage.py send_tweets
+# Several workers can run at once: each one claims its batch with a single
+# UPDATE, so no tweet is picked up twice. While a batch is being sent the worker
+# renews its claim every third of --stale-after, so only a tweet whose worker died
+# part way is handed out again, once --stale-after seconds have passed. Results are
+# only written back for tweets this worker still holds.
+class Command(BaseCommand):
+
+    help = "Post queued tweets from the TweetOutbox in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50,
+                            help="Most tweets claimed and sent at once.")
+        parser.add_argument("--poll", type=float, default=5.0,
+                            help="Seconds to wait before looking again when nothing is due.")
+        parser.add_argument("--once", action="store_true",
+                            help="Send everything that is due, then stop instead of waiting for more.")
+        parser.add_argument("--retries", type=int, default=3,
+                            help="How often the client retries a rate-limited tweet before giving it back.")
+        parser.add_argument("--stale-after", type=float, default=600,
+                            help="Seconds without news from a worker after which its claimed tweets are sent again.")
+
+    def handle(self, *args, **options):
+        self.worker_id = uuid.uuid4().hex
+        while True:
+            self.release_stale(options["stale_after"])
+            batch = self.claim(options["batch_size"])
+            if batch:
+                self.send(batch, options)
+            elif options["once"]:
+                break
+            else:
+                time.sleep(options["poll"])
+
+    # Hand tweets claimed by a worker that stopped part way back to the queue
+    def release_stale(self, seconds):
+        cutoff = timezone.now() - timedelta(seconds=seconds)
+        TweetOutbox.objects.filter(status=TweetOutbox.SENDING, claimed_at__lt=cutoff).update(
+            status=TweetOutbox.PENDING, claimed_by="",
+        )
+
+    # Mark the oldest due tweets as ours and return them
+    def claim(self, size):
+        now = timezone.now()
+        due = TweetOutbox.objects.filter(status=TweetOutbox.PENDING, next_attempt_at__lte=now)
+        ids = list(due.order_by("next_attempt_at", "id").values_list("id", flat=True)[:size])
+        if not ids:
+            return []
+        # Only rows still pending are taken, so if another worker got there first we skip them
+        TweetOutbox.objects.filter(pk__in=ids, status=TweetOutbox.PENDING).update(
+            status=TweetOutbox.SENDING,
+            claimed_by=self.worker_id,
+            claimed_at=now,
+            attempts=F("attempts") + 1,
+        )
+        return list(TweetOutbox.objects.filter(pk__in=ids, claimed_by=self.worker_id, status=TweetOutbox.SENDING))
+
+    # Post a batch and record what happened to each tweet
+    def send(self, batch, options):
+        results = asyncio.run(self.post_batch(batch, options))
+        now = timezone.now()
+        login_rejected = False
+        for item, result in zip(batch, results):
+            item.claimed_by = ""
+            if isinstance(result, TweetError) and result.status_code == 401:
+                # Twitter no longer accepts our login, which is not this tweet's fault:
+                # put it back as it was, so it doesn't use up its attempts on a bad token
+                login_rejected = True
+                item.status = TweetOutbox.PENDING
+                item.attempts -= 1
+                item.last_error = str(result)
+            elif isinstance(result, Exception):
+                self.record_failure(item, result, now)
+            else:
+                item.status = TweetOutbox.SENT
+                item.tweet_id = str(result.get("id_str") or result.get("id", ""))
+                item.sent_at = now
+                item.last_error = ""
+        with transaction.atomic():
+            # If we were too slow, another worker may have taken some of these tweets over.
+            # Lock the ones still ours and leave the others to whoever holds them now.
+            still_ours = set(
+                TweetOutbox.objects.select_for_update()
+                .filter(pk__in=[item.pk for item in batch], claimed_by=self.worker_id, status=TweetOutbox.SENDING)
+                .values_list("pk", flat=True)
+            )
+            done = [item for item in batch if item.pk in still_ours]
+            TweetOutbox.objects.bulk_update(
+                done, ["status", "attempts", "claimed_by", "tweet_id", "sent_at", "last_error", "next_attempt_at"],
+            )
+        counts = {TweetOutbox.SENT: 0, TweetOutbox.PENDING: 0, TweetOutbox.FAILED: 0}
+        for item in done:
+            counts[item.status] += 1
+        message = (
+            f"Sent {counts[TweetOutbox.SENT]}, retrying {counts[TweetOutbox.PENDING]} later, "
+            f"failed {counts[TweetOutbox.FAILED]} of {len(batch)} tweets."
+        )
+        if len(done) < len(batch):
+            message += f" {len(batch) - len(done)} had been taken over by another worker."
+        self.stdout.write(message)
+        if login_rejected:
+            # Every other tweet would be refused too. Forget the saved login, so the next
+            # run asks for a new PIN (as Tweet.make_tweet does), and stop here.
+            Tweet.token_store.clear()
+            raise CommandError("Twitter rejected the saved login. Run send_tweets again to log in with a new PIN.")
+
+    async def post_batch(self, batch, options):
+        tweet = Tweet()
+        client = AsyncTweetClient.from_tweet(
+            tweet, base_url=tweet.API_BASE_URL, batch_size=len(batch), max_retries=options["retries"],
+        )
+        ids = [item.pk for item in batch]
+        # Rate limits can keep a batch waiting for a long time, so keep telling other workers we're alive
+        heartbeat = asyncio.create_task(self.heartbeat(ids, options["stale_after"] / 3))
+        try:
+            async with client:
+                return await client.post_many([item.text for item in batch])
+        finally:
+            heartbeat.cancel()
+
+    async def heartbeat(self, ids, every):
+        while True:
+            await asyncio.sleep(every)
+            await sync_to_async(self.renew_claim)(ids)
+
+    # Move the claim time of the tweets we still hold up to now, so they don't look abandoned
+    def renew_claim(self, ids):
+        TweetOutbox.objects.filter(pk__in=ids, claimed_by=self.worker_id, status=TweetOutbox.SENDING).update(
+            claimed_at=timezone.now(),
+        )
+
+    # Decide whether a failed tweet is tried again later or given up on
+    def record_failure(self, item, error, now):
+        item.last_error = str(error)
+        # Other 4xx answers (a duplicate or too-long tweet, say) will never succeed
+        permanent = isinstance(error, TweetError) and 400 <= error.status_code < 500 and error.status_code != 429
+        if permanent or item.attempts >= TweetOutbox.MAX_ATTEMPTS:
+            item.status = TweetOutbox.FAILED
+        else:
+            item.status = TweetOutbox.PENDING
+            item.next_attempt_at = now + item.retry_delay()
@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from django.db import models
+from django.utils import timezone
+
+
+# A tweet waiting to be posted (or already posted) by the send_tweets command.
+#
+# Views never talk to Twitter themselves: they call TweetOutbox.enqueue(), which is a
+# single INSERT, and the send_tweets worker posts the queued tweets in batches.
+# Every tweet has an idempotency key chosen by the caller (for example
+# "store-42-opened"), so enqueuing the same event twice still only tweets once.
+class TweetOutbox(models.Model):
+    PENDING = "pending"  # Waiting to be sent
+    SENDING = "sending"  # Claimed by a worker that is sending it right now
+    SENT = "sent"  # Posted; tweet_id says which tweet it became
+    FAILED = "failed"  # Twitter refused it, or it kept failing; see last_error
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (SENDING, "Sending"),
+        (SENT, "Sent"),
+        (FAILED, "Failed"),
+    ]
+
+    # How many times a tweet is tried before it is marked as failed
+    MAX_ATTEMPTS = 5
+
+    text = models.CharField(max_length=280)
+    idempotency_key = models.CharField(max_length=100, unique=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)  # Not sent before this time
+    claimed_by = models.CharField(max_length=32, blank=True)  # Which worker is sending it
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    tweet_id = models.CharField(max_length=32, blank=True)  # Twitter's id for the posted tweet
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker looks for the oldest pending tweets that are due
+            models.Index(fields=["status", "next_attempt_at"], name="tweet_outbox_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.idempotency_key} ({self.status})"
+
+    # Queue a tweet with one INSERT. If a tweet with the same key was queued before,
+    # nothing happens, so it is safe to call again for the same event.
+    @classmethod
+    def enqueue(cls, text, idempotency_key):
+        cls.objects.bulk_create(
+            [cls(text=text, idempotency_key=idempotency_key)],
+            ignore_conflicts=True,
+        )
+
+    # How long to wait before trying a tweet again: 1, 2, 4, 8... minutes
+    def retry_delay(self):
+        return timedelta(minutes=2 ** max(self.attempts - 1, 0))
@@ -0,0 +1,132 @@
+import threading  # Several threads may tweet at once, so the counts are kept under a lock
+import time  # To time each request and to know when to try Twitter again
+
+
+# The error raised when Twitter refuses a tweet
+class TweetError(Exception):
+    def __init__(self, status_code, text):
+        super().__init__(f"Tweet failed: {status_code} — {text}")
+        self.status_code = status_code  # The HTTP status Twitter answered with
+        self.text = text  # Twitter's explanation
+
+
+# The error raised instead of calling Twitter while the circuit breaker is open
+class CircuitOpenError(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Twitter keeps failing, not trying again for {retry_after:.0f} more seconds.")
+        self.retry_after = retry_after  # Seconds until the next call is let through
+
+
+# Stops calling Twitter for a while once it has failed several times in a row.
+#
+# While Twitter is down every call would wait for a timeout and fail anyway, so
+# after failure_threshold failures in a row the breaker "opens": calls fail at
+# once with CircuitOpenError. After reset_timeout seconds one call is let through
+# to test the water. If it works the breaker closes again and everything goes
+# back to normal; if it fails the breaker stays open for another reset_timeout.
+class CircuitBreaker:
+    CLOSED = "closed"  # Everything goes through
+    OPEN = "open"  # Nothing goes through
+    HALF_OPEN = "half-open"  # One test call is on its way
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0  # Failures in a row
+        self.opened_at = 0.0
+
+    # Call this before every request; raises CircuitOpenError if it shouldn't be made
+    def before_call(self):
+        with self.lock:
+            if self.state == self.CLOSED:
+                return
+            wait = self.opened_at + self.reset_timeout - time.monotonic()
+            if self.state == self.OPEN and wait <= 0:
+                self.state = self.HALF_OPEN  # Let this one call through as the test
+                return
+            raise CircuitOpenError(max(wait, 0))
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+# Call this before every request. Like CircuitBreaker.before_call, but the refused
+# call is also counted in the metrics.
+def check_breaker(breaker, metrics):
+    try:
+        breaker.before_call()  # Fails at once while Twitter is known to be down
+    except CircuitOpenError:
+        metrics.observe("circuit_open")
+        raise
+
+
+# Tell the breaker and the metrics about a request Twitter answered
+def record_answer(breaker, metrics, status_code, seconds):
+    # Too many requests and server errors mean Twitter is struggling; anything else means it answered fine
+    if status_code == 429 or status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    metrics.observe("ok" if status_code == 200 else f"http_{status_code}", seconds)
+
+
+# Tell the breaker and the metrics about a request that got no answer at all
+# (outcome says why: "timeout", "connection_error" or "error")
+def record_no_answer(breaker, metrics, outcome, seconds):
+    breaker.record_failure()
+    metrics.observe(outcome, seconds)
+
+
+# Counts how tweets went and how long Twitter took to answer.
+#
+# Tweet and AsyncTweetClient call observe(outcome, seconds) once for every request they try:
+# outcome is "ok", "http_<status code>", "timeout", "connection_error", "error"
+# or "circuit_open", and seconds is None when no request was made.
+# To send the numbers somewhere else (Prometheus, StatsD, a log...) set
+# Tweet.metrics to any object with an observe method like this one.
+class TweetMetrics:
+    # Upper bounds, in seconds, of the latency histogram's buckets
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bucket_counts = [0] * (len(self.BUCKETS) + 1)  # The last bucket is "slower than all of them"
+        self.total_seconds = 0.0
+        self.requests = 0
+        self.outcomes = {}  # Outcome to how many times it happened
+
+    def observe(self, outcome, seconds=None):
+        with self.lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            if seconds is None:
+                return
+            self.requests += 1
+            self.total_seconds += seconds
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    self.bucket_counts[i] += 1
+                    break
+            else:
+                self.bucket_counts[-1] += 1
+
+    # Everything counted so far, as a plain dict
+    def snapshot(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "total_seconds": self.total_seconds,
+                "latency_buckets": dict(zip(self.BUCKETS + (float("inf"),), self.bucket_counts)),
+                "outcomes": dict(self.outcomes),
+                "errors": sum(count for outcome, count in self.outcomes.items() if outcome != "ok"),
+            }
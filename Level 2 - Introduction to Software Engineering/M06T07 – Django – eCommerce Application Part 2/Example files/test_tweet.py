@@ -0,0 +1,410 @@
+# Tests for the Tweet clients. They never talk to Twitter: each test starts a small
+# HTTP server on this computer that pretends to be Twitter.
+# Run them with: python -m unittest test_tweet
+import asyncio
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs
+
+import requests
+from cryptography.fernet import Fernet
+
+try:
+    from .async_tweet import AsyncTweetClient, TweetError  # When used inside the Django app
+    from .resilience import CircuitBreaker, CircuitOpenError, TweetMetrics
+    from .token_store import FileTokenStore
+    from .tweet import Tweet
+except ImportError:
+    from async_tweet import AsyncTweetClient, TweetError  # When run with python -m unittest test_tweet
+    from resilience import CircuitBreaker, CircuitOpenError, TweetMetrics
+    from token_store import FileTokenStore
+    from tweet import Tweet
+
+
+# A stand-in for the Twitter API that records what it receives.
+# Set "responses" to a list of (status code, headers) to answer with, one per request;
+# once the list runs out every request gets a 200 with the tweet echoed back.
+# To make requests go wrong, set "faults" to a list with one entry per request:
+# "drop" hangs up without answering, and a number stalls that many seconds first.
+class FakeTwitter(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeTwitterHandler)
+        self.lock = threading.Lock()
+        self.requests = []  # (path, Authorization header, status text) of every request
+        self.responses = []
+        self.faults = []
+        self.delay = 0.0  # Seconds to take over each request
+        self.in_flight = 0
+        self.most_in_flight = 0
+        self.connections = set()  # Client ports seen, one per connection
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def handle_error(self, request, client_address):
+        pass  # A client that gave up on a stalled request is expected, not worth printing
+
+
+class FakeTwitterHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep connections open so the client can reuse them
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+        status = parse_qs(body).get("status", [""])[0]
+        with server.lock:
+            server.requests.append((self.path, self.headers.get("Authorization", ""), status))
+            server.connections.add(self.client_address[1])
+            fault = server.faults.pop(0) if server.faults else None
+        if fault == "drop":
+            self.close_connection = True
+            return
+        time.sleep(fault or 0)
+        with server.lock:
+            server.in_flight += 1
+            server.most_in_flight = max(server.most_in_flight, server.in_flight)
+            code, headers = server.responses.pop(0) if server.responses else (200, {})
+            number = len(server.requests)
+        time.sleep(server.delay)
+        payload = json.dumps({"id": number, "text": status} if code == 200 else {"errors": [{"code": code}]})
+        self.send_response(code)
+        for name, value in {"Content-Type": "application/json", **headers}.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload.encode())
+        with server.lock:
+            server.in_flight -= 1
+
+    def log_message(self, *args):
+        pass  # Keep the test output quiet
+
+
+class AsyncTweetClientTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.twitter = FakeTwitter()
+        self.addCleanup(self.twitter.stop)
+
+    def client(self, **options):
+        return AsyncTweetClient("key", "secret", "token", "token-secret", base_url=self.twitter.url, **options)
+
+    async def test_posts_in_parallel_over_a_bounded_pool(self):
+        self.twitter.delay = 0.05
+        async with self.client(max_connections=4) as client:
+            results = await client.post_many([f"Tweet {i}" for i in range(20)])
+
+        self.assertEqual(sorted(result["text"] for result in results), sorted(f"Tweet {i}" for i in range(20)))
+        self.assertEqual(self.twitter.most_in_flight, 4)
+        self.assertLessEqual(len(self.twitter.connections), 4)
+        path, authorization, _ = self.twitter.requests[0]
+        self.assertEqual(path, "/1.1/statuses/update.json")
+        self.assertTrue(authorization.startswith("OAuth "))
+        self.assertIn('oauth_token="token"', authorization)
+
+    async def test_waits_for_retry_after_then_retries(self):
+        self.twitter.responses = [(429, {"Retry-After": "0.3"})]
+        start = time.monotonic()
+        async with self.client() as client:
+            results = await client.post_many(["Hello", "World"])
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.3)
+        self.assertEqual({result["text"] for result in results}, {"Hello", "World"})
+        self.assertEqual(len(self.twitter.requests), 3)
+
+    async def test_failures_are_reported_per_tweet(self):
+        self.twitter.responses = [(403, {})]
+        async with self.client(max_connections=1) as client:
+            results = await client.post_many(["Duplicate", "Fine"])
+
+        self.assertIsInstance(results[0], TweetError)
+        self.assertEqual(results[0].status_code, 403)
+        self.assertEqual(results[1]["text"], "Fine")
+
+    async def test_shares_the_breaker_and_metrics(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        metrics = TweetMetrics()
+        self.twitter.responses = [(200, {}), (503, {}), (503, {})]
+        async with self.client(max_retries=0, max_connections=1, breaker=breaker, metrics=metrics) as client:
+            results = await client.post_many(["Fine", "Down", "Still down", "Not tried"])
+
+        self.assertEqual(results[0]["text"], "Fine")
+        self.assertEqual([type(result) for result in results[1:]], [TweetError, TweetError, CircuitOpenError])
+        self.assertEqual(len(self.twitter.requests), 3)
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["outcomes"], {"ok": 1, "http_503": 2, "circuit_open": 1})
+        self.assertEqual(snapshot["requests"], 3)
+
+    async def test_gives_up_after_max_retries(self):
+        self.twitter.responses = [(503, {"Retry-After": "0"})] * 3
+        async with self.client(max_retries=2) as client:
+            with self.assertRaises(TweetError):
+                await client.make_tweet("Never sent")
+        self.assertEqual(len(self.twitter.requests), 3)
+
+
+class TokenStoreTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.path = os.path.join(folder.name, "token")
+        self.key = Fernet.generate_key()
+        self.tokens = {"oauth_token": "token", "oauth_token_secret": "token-secret"}
+
+    def test_saves_encrypted_and_private(self):
+        store = FileTokenStore(self.path, self.key)
+        store.save(self.tokens)
+
+        with open(self.path, "rb") as f:
+            self.assertNotIn(b"token-secret", f.read())
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+        self.assertEqual(FileTokenStore(self.path, self.key).load(), self.tokens)
+
+    def test_wrong_key_or_no_key_means_no_tokens(self):
+        FileTokenStore(self.path, self.key).save(self.tokens)
+        self.assertIsNone(FileTokenStore(self.path, Fernet.generate_key()).load())
+        with mock.patch.dict(os.environ, {"TWEET_TOKEN_KEY": ""}):
+            self.assertIsNone(FileTokenStore(self.path).load())
+
+        FileTokenStore(self.path, self.key).clear()
+        self.assertIsNone(FileTokenStore(self.path, self.key).load())
+
+
+class TweetLoginTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.store = FileTokenStore(os.path.join(folder.name, "token"), Fernet.generate_key())
+        self.store.save({"oauth_token": "saved", "oauth_token_secret": "saved-secret"})
+        self.twitter = FakeTwitter()
+        self.addCleanup(self.twitter.stop)
+
+        for patcher in (
+            mock.patch.object(Tweet, "token_store", self.store),
+            mock.patch.object(Tweet, "API_BASE_URL", self.twitter.url),
+            mock.patch.object(Tweet, "_instance", None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_startup_reuses_the_saved_login(self):
+        with mock.patch.object(Tweet, "authenticate") as authenticate:
+            bot = Tweet()
+        authenticate.assert_not_called()
+        self.assertEqual(bot.oauth.token["oauth_token"], "saved")
+
+    def test_logs_in_again_after_a_401(self):
+        def authenticate(bot):
+            bot.token_store.save({"oauth_token": "fresh", "oauth_token_secret": "fresh-secret"})
+            bot.oauth = bot.session_for(bot.token_store.load())
+
+        self.twitter.responses = [(401, {})]
+        bot = Tweet()
+        with mock.patch.object(Tweet, "authenticate", autospec=True, side_effect=authenticate) as login:
+            bot.make_tweet("Hello again")
+
+        login.assert_called_once()
+        self.assertIn('oauth_token="saved"', self.twitter.requests[0][1])
+        self.assertIn('oauth_token="fresh"', self.twitter.requests[1][1])
+        self.assertEqual(self.store.load()["oauth_token"], "fresh")
+
+    def test_threads_that_all_get_a_401_log_in_once(self):
+        # A slow login, so the other threads' 401s arrive while it is still going on
+        def authenticate(bot):
+            time.sleep(0.1)
+            bot.token_store.save({"oauth_token": "fresh", "oauth_token_secret": "fresh-secret"})
+            bot.oauth = bot.session_for(bot.token_store.load())
+
+        bot = Tweet()
+        self.twitter.responses = [(401, {})] * 4
+        self.twitter.delay = 0.05  # So all four requests arrive before any answer
+        errors = []
+
+        def tweet(number):
+            try:
+                bot.make_tweet(f"Tweet {number}")
+            except Exception as error:
+                errors.append(error)
+
+        with mock.patch.object(Tweet, "authenticate", autospec=True, side_effect=authenticate) as login:
+            threads = [threading.Thread(target=tweet, args=(i,)) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        login.assert_called_once()
+        self.assertEqual(len(self.twitter.requests), 8)
+        self.assertTrue(all('oauth_token="fresh"' in request[1] for request in self.twitter.requests[4:]))
+
+
+class TweetInstanceTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.logins = 0
+
+        # A slow, counted login, so threads that race to create the instance really overlap
+        def authenticate(bot):
+            with lock:
+                self.logins += 1
+            time.sleep(0.1)
+            bot.oauth = bot.session_for({"oauth_token": "token", "oauth_token_secret": "token-secret"})
+
+        lock = threading.Lock()
+        for patcher in (
+            mock.patch.object(Tweet, "token_store", FileTokenStore(os.path.join(folder.name, "token"), Fernet.generate_key())),
+            mock.patch.object(Tweet, "_instance", None),
+            mock.patch.object(Tweet, "authenticate", autospec=True, side_effect=authenticate),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def create_in_threads(self, count):
+        start = threading.Barrier(count)
+        bots = []
+
+        def create():
+            start.wait()
+            bots.append(Tweet())
+
+        threads = [threading.Thread(target=create) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return bots
+
+    def test_threads_share_one_login(self):
+        bots = self.create_in_threads(16)
+
+        self.assertEqual(self.logins, 1)
+        self.assertEqual(len({id(bot) for bot in bots}), 1)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs os.fork")
+    def test_forked_process_logs_in_once_for_itself(self):
+        parent_bot = Tweet()
+        pid = os.fork()
+        if pid == 0:  # The child: report how many logins it needed, and whether it got a new object
+            try:
+                bots = self.create_in_threads(8)
+                new_object = all(bot is not parent_bot for bot in bots) and len({id(bot) for bot in bots}) == 1
+                os._exit(self.logins if new_object else 99)
+            except BaseException:
+                os._exit(98)
+        _, status = os.waitpid(pid, 0)
+
+        self.assertEqual(os.waitstatus_to_exitcode(status), 2)  # The parent's login, plus one in the child
+        self.assertIs(Tweet(), parent_bot)
+        self.assertEqual(self.logins, 1)
+
+    def test_forgetting_the_instance_replaces_every_lock(self):
+        # As after a fork while other threads held the locks: they would never be released in the child
+        with mock.patch.object(Tweet, "_lock", threading.Lock()), \
+                mock.patch.object(Tweet, "breaker", CircuitBreaker()), \
+                mock.patch.object(Tweet, "metrics", TweetMetrics()):
+            held = [Tweet._lock, Tweet.breaker.lock, Tweet.metrics.lock]
+            for lock in held:
+                lock.acquire()
+            Tweet.forget_instance()
+
+            for old, new in zip(held, [Tweet._lock, Tweet.breaker.lock, Tweet.metrics.lock]):
+                self.assertIsNot(new, old)
+                self.assertFalse(new.locked())
+
+    def test_per_thread_sessions(self):
+        bot = Tweet()
+        with mock.patch.object(Tweet, "PER_THREAD_SESSIONS", True):
+            sessions = []
+            for _ in range(2):
+                thread = threading.Thread(target=lambda: sessions.append((bot.session(), bot.session())))
+                thread.start()
+                thread.join()
+
+        self.assertIs(sessions[0][0], sessions[0][1])  # The same session every time within a thread
+        self.assertIsNot(sessions[0][0], sessions[1][0])  # But a different one in each thread
+        self.assertIsNot(sessions[0][0], bot.oauth)
+        self.assertEqual(sessions[1][0].token, bot.oauth.token)
+
+
+class TweetResilienceTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        store = FileTokenStore(os.path.join(folder.name, "token"), Fernet.generate_key())
+        store.save({"oauth_token": "token", "oauth_token_secret": "token-secret"})
+        self.twitter = FakeTwitter()
+        self.addCleanup(self.twitter.stop)
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.2)
+        self.metrics = TweetMetrics()
+
+        for patcher in (
+            mock.patch.object(Tweet, "token_store", store),
+            mock.patch.object(Tweet, "API_BASE_URL", self.twitter.url),
+            mock.patch.object(Tweet, "_instance", None),
+            mock.patch.object(Tweet, "READ_TIMEOUT", 0.2),
+            mock.patch.object(Tweet, "breaker", self.breaker),
+            mock.patch.object(Tweet, "metrics", self.metrics),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.bot = Tweet()
+
+    def test_gives_up_on_slow_or_dropped_requests_and_counts_them(self):
+        self.twitter.faults = [1.0, "drop"]
+
+        start = time.monotonic()
+        with self.assertRaises(requests.exceptions.Timeout):
+            self.bot.make_tweet("Too slow")
+        self.assertLess(time.monotonic() - start, 1.0)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.bot.make_tweet("Hung up on")
+        self.bot.make_tweet("Fine")
+
+        metrics = self.metrics.snapshot()
+        self.assertEqual(metrics["outcomes"], {"timeout": 1, "connection_error": 1, "ok": 1})
+        self.assertEqual(metrics["errors"], 2)
+        self.assertEqual(metrics["requests"], 3)
+        self.assertEqual(sum(metrics["latency_buckets"].values()), 3)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_circuit_opens_after_failures_in_a_row_then_recovers(self):
+        self.twitter.responses = [(503, {})] * 4
+
+        for _ in range(3):
+            with self.assertRaises(TweetError):
+                self.bot.make_tweet("Twitter is down")
+        with self.assertRaises(CircuitOpenError):
+            self.bot.make_tweet("Not even tried")
+        self.assertEqual(len(self.twitter.requests), 3)
+
+        time.sleep(0.25)
+        with self.assertRaises(TweetError):  # The test call fails, so the breaker opens again
+            self.bot.make_tweet("Still down")
+        with self.assertRaises(CircuitOpenError):
+            self.bot.make_tweet("Not tried either")
+
+        time.sleep(0.25)
+        self.bot.make_tweet("Back up")
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(len(self.twitter.requests), 5)
+        self.assertEqual(self.metrics.snapshot()["outcomes"], {"http_503": 4, "circuit_open": 2, "ok": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
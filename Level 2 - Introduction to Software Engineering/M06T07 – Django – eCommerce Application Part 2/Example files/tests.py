@@ -0,0 +1,130 @@
+# Tests for the tweet outbox. Run them with: python manage.py test your_app
+# Tweets go to a small fake Twitter server on this computer, never to the real one.
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from cryptography.fernet import Fernet
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from .functions.resilience import CircuitBreaker, TweetMetrics
+from .functions.test_tweet import FakeTwitter
+from .functions.token_store import FileTokenStore
+from .functions.tweet import Tweet
+from .management.commands import send_tweets
+from .models import TweetOutbox
+
+
+class TweetOutboxTest(TestCase):
+    def setUp(self):
+        # Log in with saved tokens, so no test ever asks for a PIN
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        store = FileTokenStore(os.path.join(folder.name, "token"), Fernet.generate_key())
+        store.save({"oauth_token": "token", "oauth_token_secret": "token-secret"})
+        self.twitter = FakeTwitter()
+        self.addCleanup(self.twitter.stop)
+
+        for patcher in (
+            mock.patch.object(Tweet, "token_store", store),
+            mock.patch.object(Tweet, "API_BASE_URL", self.twitter.url),
+            mock.patch.object(Tweet, "_instance", None),
+            # The worker shares these with Tweet, so give every test its own
+            mock.patch.object(Tweet, "breaker", CircuitBreaker()),
+            mock.patch.object(Tweet, "metrics", TweetMetrics()),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def send_tweets(self):
+        out = StringIO()
+        call_command("send_tweets", "--once", "--retries", "0", stdout=out)
+        return out.getvalue()
+
+    def test_enqueue_is_one_insert_and_ignores_repeats(self):
+        with self.assertNumQueries(1):
+            TweetOutbox.enqueue("Store opened!", "store-1-opened")
+        TweetOutbox.enqueue("Store opened again?", "store-1-opened")
+
+        self.assertEqual(TweetOutbox.objects.count(), 1)
+        self.assertEqual(TweetOutbox.objects.get().text, "Store opened!")
+
+    def test_sends_each_tweet_once_and_records_the_outcome(self):
+        for i in range(3):
+            TweetOutbox.enqueue(f"Tweet {i}", f"tweet-{i}")
+        # Twitter rejects the first tweet it sees and is unavailable for the second
+        self.twitter.responses = [(403, {}), (503, {})]
+        self.twitter.delay = 0.05  # So all three requests arrive before any answer
+
+        self.assertIn("Sent 1, retrying 1 later, failed 1 of 3 tweets.", self.send_tweets())
+
+        outcomes = {}
+        for item in TweetOutbox.objects.all():
+            outcomes[item.status] = item
+            self.assertEqual(item.attempts, 1)
+            self.assertEqual(item.claimed_by, "")
+        sent = outcomes[TweetOutbox.SENT]
+        self.assertTrue(sent.tweet_id)
+        self.assertIsNotNone(sent.sent_at)
+        self.assertIn("403", outcomes[TweetOutbox.FAILED].last_error)
+        self.assertEqual(Tweet.metrics.snapshot()["outcomes"], {"ok": 1, "http_403": 1, "http_503": 1})
+        self.assertGreater(outcomes[TweetOutbox.PENDING].next_attempt_at, timezone.now())
+
+        # The tweet waiting for its retry isn't due yet, so a second run sends nothing
+        self.send_tweets()
+        self.assertEqual(len(self.twitter.requests), 3)
+
+    def test_tweets_left_by_a_stopped_worker_are_sent_again(self):
+        TweetOutbox.enqueue("Half sent", "half-sent")
+        TweetOutbox.objects.update(
+            status=TweetOutbox.SENDING, claimed_by="gone", claimed_at=timezone.now() - timedelta(hours=1),
+        )
+
+        self.send_tweets()
+
+        item = TweetOutbox.objects.get()
+        self.assertEqual(item.status, TweetOutbox.SENT)
+        self.assertEqual(self.twitter.requests[0][2], "Half sent")
+
+    def test_a_live_worker_keeps_its_claim_and_never_overwrites_another(self):
+        for i in range(2):
+            TweetOutbox.enqueue(f"Tweet {i}", f"tweet-{i}")
+        kept, lost = TweetOutbox.objects.order_by("id")
+
+        def post_batch(command, batch, options):
+            # Part way through, the heartbeat renews our claim on the first tweet...
+            TweetOutbox.objects.filter(pk=kept.pk).update(claimed_at=timezone.now() - timedelta(hours=1))
+            command.renew_claim([item.pk for item in batch])
+            # ...but the second was taken over by a worker that thought we had died
+            TweetOutbox.objects.filter(pk=lost.pk).update(claimed_by="other", claimed_at=timezone.now())
+            return sent_both()
+
+        async def sent_both():
+            return [{"id_str": "1"}, {"id_str": "2"}]
+
+        with mock.patch.object(send_tweets.Command, "post_batch", post_batch):
+            out = self.send_tweets()
+
+        self.assertIn("Sent 1, retrying 0 later, failed 0 of 2 tweets. 1 had been taken over by another worker.", out)
+        kept.refresh_from_db()
+        self.assertEqual(kept.status, TweetOutbox.SENT)
+        self.assertGreater(kept.claimed_at, timezone.now() - timedelta(minutes=1))
+        lost.refresh_from_db()
+        self.assertEqual((lost.status, lost.claimed_by, lost.tweet_id), (TweetOutbox.SENDING, "other", ""))
+
+    def test_a_rejected_login_stops_the_worker_without_using_up_attempts(self):
+        TweetOutbox.enqueue("Not yet", "not-yet")
+        self.twitter.responses = [(401, {})]
+
+        with self.assertRaisesMessage(CommandError, "Twitter rejected the saved login"):
+            self.send_tweets()
+
+        item = TweetOutbox.objects.get()
+        self.assertEqual((item.status, item.attempts), (TweetOutbox.PENDING, 0))
+        self.assertLessEqual(item.next_attempt_at, timezone.now())
+        self.assertIsNone(Tweet.token_store.load())
@@ -0,0 +1,60 @@
+import json  # Tokens are saved as a small JSON document
+import os  # To find the home folder and write the file safely
+import tempfile  # To write the new file next to the old one before swapping them
+
+from cryptography.fernet import Fernet, InvalidToken  # Encrypts the file so the tokens can't be read from disk
+
+
+# Keeps Twitter access tokens in an encrypted file, so a new process can tweet
+# straight away instead of going through the whole login (and PIN) again.
+#
+# The file is encrypted with a key from the TWEET_TOKEN_KEY environment variable.
+# Make one with:
+#     python -c "from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())"
+# Without a key nothing is saved and every run logs in again, as before.
+class FileTokenStore:
+    DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".tweet_token")
+
+    def __init__(self, path=None, key=None):
+        self.path = path or os.environ.get("TWEET_TOKEN_FILE", self.DEFAULT_PATH)
+        key = key or os.environ.get("TWEET_TOKEN_KEY")
+        self.fernet = Fernet(key) if key else None
+
+    # Return the saved tokens, or None if there are none we can use
+    def load(self):
+        if self.fernet is None:
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                data = self.fernet.decrypt(f.read())
+        except FileNotFoundError:
+            return None
+        except InvalidToken:
+            # Written with another key, or damaged: log in again and overwrite it
+            print("Saved Twitter login could not be decrypted, ignoring it.")
+            return None
+        return json.loads(data)
+
+    # Save tokens (a dict with "oauth_token" and "oauth_token_secret")
+    def save(self, tokens):
+        if self.fernet is None:
+            print("Set TWEET_TOKEN_KEY to remember the Twitter login between runs.")
+            return
+        data = self.fernet.encrypt(json.dumps(tokens).encode())
+        folder = os.path.dirname(os.path.abspath(self.path))
+        # Write to a temporary file first, so a crash never leaves half a file behind
+        fd, temp_path = tempfile.mkstemp(dir=folder)  # Created readable by us only
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    # Forget the saved tokens, for example after Twitter rejects them
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
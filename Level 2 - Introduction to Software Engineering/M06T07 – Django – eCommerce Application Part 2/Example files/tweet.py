@@ -1,27 +1,94 @@
 import json  # For pretty-printing the response from Twitter
+import os  # To start afresh in each worker process a server forks
+import threading  # To stop two threads creating the Tweet object at the same time
+import time  # To measure how long Twitter takes to answer
+import requests  # For the errors raised when Twitter can't be reached in time
 from requests_oauthlib import OAuth1Session  # To handle secure connection with Twitter
 
+try:
+    from .resilience import CircuitBreaker, TweetError, TweetMetrics, check_breaker, record_answer, record_no_answer  # When used inside the Django app
+    from .token_store import FileTokenStore
+except ImportError:
+    from resilience import CircuitBreaker, TweetError, TweetMetrics, check_breaker, record_answer, record_no_answer  # When this file is run directly
+    from token_store import FileTokenStore
+
 # Define a class for posting tweets to Twitter
 class Tweet:
     _instance = None  # This is a class variable to make sure we only ever create one Tweet object (singleton pattern)
+    _lock = threading.Lock()  # Only one thread at a time may create the instance or log in again
+
+    # requests sessions are not promised to be safe to share between threads. Set this to True
+    # (for example under a threaded server) to give each thread its own session with the same login.
+    PER_THREAD_SESSIONS = False
 
     # These are the keys provided by Twitter when you register an app on their developer platform
     CONSUMER_KEY = 'your_key'
     CONSUMER_SECRET = 'your_secret'
 
+    API_BASE_URL = "https://api.twitter.com"  # Where Twitter's API lives (tests point this at a fake server)
+
+    # Remembers our login between runs, so starting up doesn't need Twitter at all (see token_store.py)
+    token_store = FileTokenStore()
+
+    # Seconds to wait for a connection to Twitter, and then for its answer, before giving up
+    CONNECT_TIMEOUT = 5
+    READ_TIMEOUT = 15
+
+    # Stops calling Twitter for 30 seconds after 5 failures in a row (see resilience.py).
+    # AsyncTweetClient.from_tweet shares this breaker and the metrics below.
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30)
+
+    # Counts every tweet's outcome and how long it took; replace it to send the numbers elsewhere
+    metrics = TweetMetrics()
+
     # This function creates a new object if one doesn't already exist
     def __new__(cls):
-        if cls._instance is None:
-            print('Creating the Tweet instance...')
-            cls._instance = super(Tweet, cls).__new__(cls)
-            cls._instance.oauth = None  # This will hold our login info
-            cls._instance.authenticate()  # Log in to Twitter
+        if cls._instance is None:  # Quick check, so the lock is only needed the first time
+            with cls._lock:
+                # Check again: another thread may have created it while we waited for the lock
+                if cls._instance is None:
+                    print('Creating the Tweet instance...')
+                    instance = super(Tweet, cls).__new__(cls)
+                    instance.oauth = None  # This will hold our login info
+                    instance.thread_sessions = threading.local()  # Each thread's own session, if PER_THREAD_SESSIONS
+                    instance.login()  # Log in to Twitter (or reuse the saved login)
+                    cls._instance = instance  # Only shared once it is ready to use
         return cls._instance  # Return the existing or new object
 
+    # Runs in the new process after a fork (for example each gunicorn worker).
+    # The child must not share the parent's connections, and a lock another thread held
+    # during the fork would never be released, so start again with nothing.
+    @classmethod
+    def forget_instance(cls):
+        cls._instance = None
+        cls._lock = threading.Lock()
+        # The breaker and the metrics have locks of their own (a replacement metrics object may not)
+        for shared in (cls.breaker, cls.metrics):
+            if hasattr(shared, "lock"):
+                shared.lock = threading.Lock()
+
+    # Reuse the saved tokens if there are any; only log in with Twitter if not
+    def login(self):
+        tokens = self.token_store.load()
+        if tokens:
+            self.oauth = self.session_for(tokens)  # No request to Twitter needed
+            print("Using the saved Twitter login.")
+        else:
+            self.authenticate()
+
+    # Build a session that signs requests with our access tokens
+    def session_for(self, tokens):
+        return OAuth1Session(
+            self.CONSUMER_KEY,
+            client_secret=self.CONSUMER_SECRET,
+            resource_owner_key=tokens["oauth_token"],
+            resource_owner_secret=tokens["oauth_token_secret"],
+        )
+
     # This method handles the login process with Twitter
     def authenticate(self):
         # This URL lets us request permission to post tweets
-        request_token_url = "https://api.twitter.com/oauth/request_token?oauth_callback=oob&x_auth_access_type=write"
+        request_token_url = f"{self.API_BASE_URL}/oauth/request_token?oauth_callback=oob&x_auth_access_type=write"
         oauth = OAuth1Session(self.CONSUMER_KEY, client_secret=self.CONSUMER_SECRET)
 
         # Try to get temporary login tokens from Twitter
@@ -37,7 +104,7 @@ class Tweet:
         print("Got request token.")
 
         # Build the link where the user must go to allow access
-        base_authorization_url = "https://api.twitter.com/oauth/authorize"
+        base_authorization_url = f"{self.API_BASE_URL}/oauth/authorize"
         authorization_url = oauth.authorization_url(base_authorization_url)
         print("🔗 Please go here and authorize: ", authorization_url)
 
@@ -54,45 +121,100 @@ class Tweet:
         )
 
         # Ask Twitter to give us final permission
-        access_token_url = "https://api.twitter.com/oauth/access_token"
+        access_token_url = f"{self.API_BASE_URL}/oauth/access_token"
         oauth_tokens = oauth.fetch_access_token(access_token_url)
 
-        # Save the tokens we'll use to tweet
-        access_token = oauth_tokens["oauth_token"]
-        access_token_secret = oauth_tokens["oauth_token_secret"]
+        # Save the tokens we'll use to tweet, so the next run can skip all of this
+        tokens = {
+            "oauth_token": oauth_tokens["oauth_token"],
+            "oauth_token_secret": oauth_tokens["oauth_token_secret"],
+        }
+        self.token_store.save(tokens)
 
         # Now we are fully authenticated and ready to tweet!
-        self.oauth = OAuth1Session(
-            self.CONSUMER_KEY,
-            client_secret=self.CONSUMER_SECRET,
-            resource_owner_key=access_token,
-            resource_owner_secret=access_token_secret,
-        )
+        self.oauth = self.session_for(tokens)
 
         print("Authentication complete.")
 
     # This function sends a tweet
     def make_tweet(self, tweet_text):
-        if not self.oauth:
+        oauth = self.oauth  # The login this tweet is sent with
+        if not oauth:
             raise ValueError('Authentication failed!')  # If we aren't logged in, raise an error
 
         # Try to post the tweet
-        response = self.oauth.post(
-            "https://api.twitter.com/1.1/statuses/update.json",
-            data={"status": tweet_text},  # The tweet content
-        )
+        response = self.send_status(tweet_text)
+
+        # 401 means Twitter no longer accepts our saved login, so log in again and retry once
+        if response.status_code == 401:
+            self.relogin(oauth)
+            response = self.send_status(tweet_text)
 
         # If the tweet fails, show the error
         if response.status_code != 200:
-            raise Exception(
-                f"Tweet failed: {response.status_code} — {response.text}"
-            )
+            raise TweetError(response.status_code, response.text)
 
         # Tweet went through successfully
         print("Tweet posted successfully!")
         json_response = response.json()  # Get details about the tweet
         print(json.dumps(json_response, indent=4, sort_keys=True))  # Print it nicely
 
+    # Log in again because Twitter refused the rejected login.
+    # Several threads may get a 401 at the same time, so only the first one to get the
+    # lock logs in; the others find a new login already there and just use it.
+    # self.oauth keeps the old session until the new one is ready, so it is never None.
+    def relogin(self, rejected):
+        with self._lock:
+            if self.oauth is rejected:  # Nobody has logged in again since this login failed
+                self.token_store.clear()
+                self.authenticate()  # Only replaces self.oauth if it works
+            if self.oauth is rejected:
+                raise ValueError('Authentication failed!')
+
+    # Post the tweet through the circuit breaker, timing it and counting the outcome
+    def send_status(self, tweet_text):
+        check_breaker(self.breaker, self.metrics)
+
+        start = time.perf_counter()
+        try:
+            response = self.post_status(tweet_text)
+        except Exception as error:  # No answer at all: count it against Twitter, then let the caller see it
+            if isinstance(error, requests.exceptions.Timeout):  # Checked first: a connect timeout is also a ConnectionError
+                outcome = "timeout"
+            elif isinstance(error, requests.exceptions.ConnectionError):
+                outcome = "connection_error"
+            else:
+                outcome = "error"
+            record_no_answer(self.breaker, self.metrics, outcome, time.perf_counter() - start)
+            raise
+
+        record_answer(self.breaker, self.metrics, response.status_code, time.perf_counter() - start)
+        return response
+
+    # The session to send requests with: the shared one, or this thread's own copy of it
+    def session(self):
+        if not self.PER_THREAD_SESSIONS:
+            return self.oauth
+        oauth = self.oauth  # Read it once: another thread may log in again while we're here
+        local = self.thread_sessions
+        # Make a new one if this thread has none yet, or we have logged in again since
+        if getattr(local, "source", None) is not oauth:
+            local.source = oauth
+            local.session = self.session_for(oauth.token)
+        return local.session
+
+    # Send the tweet to Twitter and return its response
+    def post_status(self, tweet_text):
+        return self.session().post(
+            f"{self.API_BASE_URL}/1.1/statuses/update.json",
+            data={"status": tweet_text},  # The tweet content
+            timeout=(self.CONNECT_TIMEOUT, self.READ_TIMEOUT),  # Never wait for Twitter forever
+        )
+
+# Windows can't fork, so there is nothing to register there
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=Tweet.forget_instance)
+
 # This section is only used when testing directly (not when used inside a Django project)
 if __name__ == "__main__":
     bot1 = Tweet()  # Create the first instance